@@ -3,8 +3,11 @@ from .models import (
     ConfiguracaoEscola, Curso, Disciplina, Escola, Inscricao, Professor, 
     Turma, Aluno, Pai, AnoAcademico, PerfilUsuario, Notificacao, Subscricao, 
     PagamentoSubscricao, RecuperacaoSenha, Documento, PrerequisitoDisciplina,
-    HistoricoAcademico, NotaDisciplina, PeriodoLectivo, ConfiguracaoAcademica, Sala
+    HistoricoAcademico, NotaDisciplina, PeriodoLectivo, ConfiguracaoAcademica, Sala, Tarefa,
+    ExecucaoAgendada
 )
+from django.utils import timezone
+from .tarefas import enfileirar
 
 @admin.register(Sala)
 class SalaAdmin(admin.ModelAdmin):
@@ -252,6 +255,26 @@ class PagamentoSubscricaoAdmin(admin.ModelAdmin):
     search_fields = ['subscricao__nome_escola']
     readonly_fields = ['data_submissao']
 
+    def save_model(self, request, obj, form, change):
+        if obj.status == 'aprovado':
+            obj.aprovado_por = obj.aprovado_por or request.user
+            obj.data_aprovacao = obj.data_aprovacao or timezone.now()
+        super().save_model(request, obj, form, change)
+        if obj.status == 'aprovado' and not obj.recibo_pdf:
+            # O recibo é gerado pelos workers (core.tarefas), fora do pedido
+            enfileirar('recibo_pagamento', criado_por=request.user, pagamento=obj.id)
+
+@admin.register(Tarefa)
+class TarefaAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tipo', 'estado', 'prioridade', 'tentativas', 'executar_apos', 'reservada_por', 'data_criacao', 'data_conclusao']
+    list_filter = ['estado', 'tipo']
+    readonly_fields = ['data_criacao', 'data_conclusao', 'reservada_por', 'reservada_em', 'resultado', 'erro']
+
+@admin.register(ExecucaoAgendada)
+class ExecucaoAgendadaAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'horario', 'proxima_execucao', 'ultima_execucao', 'ultima_duracao', 'bloqueado_por']
+    readonly_fields = ['horario', 'bloqueado_por', 'bloqueado_ate', 'ultima_execucao', 'ultima_duracao', 'ultimo_resultado', 'ultimo_erro']
+
 @admin.register(RecuperacaoSenha)
 class RecuperacaoSenhaAdmin(admin.ModelAdmin):
     list_display = ['user', 'tipo', 'usado', 'esta_expirado', 'data_criacao']
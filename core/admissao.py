@@ -0,0 +1,210 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .contadores import recalcular_contadores
+from .estatisticas import reconstruir_estatisticas
+from .models import ConfiguracaoAcademica, Curso, Inscricao
+
+# Critério de desempate -> expressões de ordenação aplicadas depois da nota
+CRITERIOS_DESEMPATE = {
+    'idade_desc': [F('data_nascimento').asc()],  # Mais velho (data menor)
+    'idade_asc': [F('data_nascimento').desc()],  # Mais novo (data maior)
+    'inscricao_asc': [F('data_inscricao').asc()],  # Ordem cronológica
+    'sexo_f': [F('sexo').asc()],  # 'F' vem antes de 'M'
+    'sexo_m': [F('sexo').desc()],
+    'sexo_f_novo': [F('sexo').asc(), F('data_nascimento').desc()],
+    'sexo_f_velho': [F('sexo').asc(), F('data_nascimento').asc()],
+}
+
+
+def ordenacao_ranking(criterio=None):
+    """Ordenação completa do ranking: nota, critério de desempate e, por fim, o id"""
+    ordem = [F('nota_teste').desc()]
+    ordem.extend(CRITERIOS_DESEMPATE.get(criterio, []))
+    ordem.append(F('id').asc())
+    return ordem
+
+
+def processar_aprovacoes(cursos=None, config=None):
+    """
+    Classifica os candidatos de vários cursos numa única passagem.
+
+    A posição de cada candidato com nota é calculada por uma função de janela
+    particionada por curso; são aprovados os que atingem a nota mínima e ficam
+    dentro do número de vagas. Tudo é gravado com um único bulk_update dentro
+    de uma transação.
+
+    Devolve um dicionário {curso_id: resumo} em que cada resumo contém o curso,
+    os totais e o ranking completo (uma entrada por candidato, incluindo os que
+    ainda não têm nota, com posição None).
+    """
+    if cursos is None:
+        cursos = Curso.objects.filter(ativo=True)
+    cursos = {c.id: c for c in cursos}
+    if not cursos:
+        return {}
+
+    if config is None:
+        config = ConfiguracaoAcademica.objects.first()
+    criterio = config.criterio_desempate if config else None
+
+    agora = timezone.now()
+    resultado = {
+        curso_id: {'curso': curso, 'classificados': 0, 'aprovados': 0, 'sem_nota': 0, 'ranking': []}
+        for curso_id, curso in cursos.items()
+    }
+
+    with transaction.atomic():
+        linhas = (
+            Inscricao.objects
+            .filter(curso_id__in=cursos.keys(), nota_teste__isnull=False)
+            .annotate(posicao=Window(
+                expression=RowNumber(),
+                partition_by=[F('curso_id')],
+                order_by=ordenacao_ranking(criterio),
+            ))
+            .order_by('curso_id', 'posicao')
+            .values_list('id', 'curso_id', 'numero_inscricao', 'nota_teste', 'posicao')
+        )
+
+        atualizacoes = []
+        for inscricao_id, curso_id, numero, nota, posicao in linhas:
+            curso = cursos[curso_id]
+            aprovado = nota >= curso.nota_minima and posicao <= curso.vagas
+            atualizacoes.append(Inscricao(
+                id=inscricao_id,
+                classificacao=posicao,
+                aprovado=aprovado,
+                data_resultado=agora,
+            ))
+            resumo = resultado[curso_id]
+            resumo['classificados'] += 1
+            resumo['aprovados'] += int(aprovado)
+            resumo['ranking'].append({
+                'id': inscricao_id,
+                'numero_inscricao': numero,
+                'nota_teste': nota,
+                'posicao': posicao,
+                'aprovado': aprovado,
+            })
+
+        sem_nota = (
+            Inscricao.objects
+            .filter(curso_id__in=cursos.keys(), nota_teste__isnull=True)
+            .values_list('id', 'curso_id', 'numero_inscricao')
+        )
+        for inscricao_id, curso_id, numero in sem_nota:
+            resumo = resultado[curso_id]
+            resumo['sem_nota'] += 1
+            resumo['ranking'].append({
+                'id': inscricao_id,
+                'numero_inscricao': numero,
+                'nota_teste': None,
+                'posicao': None,
+                'aprovado': False,
+            })
+
+        # Candidatos sem nota deixam de estar classificados
+        Inscricao.objects.filter(
+            curso_id__in=cursos.keys(), nota_teste__isnull=True
+        ).update(aprovado=False, classificacao=None)
+        Inscricao.objects.bulk_update(
+            atualizacoes, ['classificacao', 'aprovado', 'data_resultado'], batch_size=500
+        )
+        recalcular_contadores(cursos.values())
+        reconstruir_estatisticas(cursos.values())
+
+    return resultado
+
+
+def ler_nota(valor):
+    """
+    Converte uma nota (texto do formulário, com vírgula ou ponto, ou número) em
+    Decimal com 2 casas; None se vazia. ValueError se não for um número finito de 0 a 20.
+    """
+    if valor is None:
+        return None
+    texto = str(valor).strip().replace(',', '.')
+    if texto == '':
+        return None
+    try:
+        nota = Decimal(texto)
+        # NaN e infinito são Decimais válidos mas não podem ser comparados nem gravados
+        if not nota.is_finite():
+            raise ValueError(valor)
+        nota = nota.quantize(Decimal('0.01'))
+    except InvalidOperation:
+        raise ValueError(valor)
+    if not Decimal('0') <= nota <= Decimal('20'):
+        raise ValueError(valor)
+    return nota
+
+
+def lancar_notas_teste(dados, curso=None):
+    """
+    Grava as notas de teste submetidas no formulário de lançamento (campos nota_<id>).
+
+    Valida todo o formulário, compara com as notas guardadas e escreve apenas as
+    linhas alteradas com um bulk_update numa única transação. Limpar uma nota
+    retira também a aprovação e a classificação do candidato.
+
+    Devolve o resumo {'atualizadas', 'limpas', 'rejeitadas', 'inalteradas'}.
+    """
+    resumo = {'atualizadas': 0, 'limpas': 0, 'rejeitadas': 0, 'inalteradas': 0}
+
+    submetidas = {}
+    for chave, valor in dados.items():
+        if not chave.startswith('nota_'):
+            continue
+        try:
+            inscricao_id = int(chave[len('nota_'):])
+            submetidas[inscricao_id] = ler_nota(valor)
+        except ValueError:
+            resumo['rejeitadas'] += 1
+
+    if not submetidas:
+        return resumo
+
+    with transaction.atomic():
+        existentes = Inscricao.objects.filter(id__in=submetidas.keys())
+        if curso is not None:
+            existentes = existentes.filter(curso=curso)
+        atuais = {}
+        cursos_das_inscricoes = {}
+        for inscricao_id, nota_atual, curso_id in existentes.select_for_update().values_list('id', 'nota_teste', 'curso_id'):
+            atuais[inscricao_id] = nota_atual
+            cursos_das_inscricoes[inscricao_id] = curso_id
+
+        # Ids que não existem (ou não pertencem ao curso) são rejeitados
+        resumo['rejeitadas'] += len(submetidas.keys() - atuais.keys())
+
+        alteradas = []
+        limpas = []
+        for inscricao_id, nota_atual in atuais.items():
+            nota = submetidas[inscricao_id]
+            if nota == nota_atual:
+                resumo['inalteradas'] += 1
+            elif nota is None:
+                limpas.append(inscricao_id)
+            else:
+                alteradas.append(Inscricao(id=inscricao_id, nota_teste=nota))
+
+        if alteradas:
+            Inscricao.objects.bulk_update(alteradas, ['nota_teste'], batch_size=500)
+        if limpas:
+            cursos_afetados = set(Inscricao.objects.filter(id__in=limpas, aprovado=True).values_list('curso_id', flat=True))
+            Inscricao.objects.filter(id__in=limpas).update(nota_teste=None, aprovado=False, classificacao=None)
+            if cursos_afetados:
+                recalcular_contadores(Curso.objects.filter(id__in=cursos_afetados))
+        if alteradas or limpas:
+            # Notas alteradas mudam os totais de reprovados/aguardando nota
+            ids = [i.id for i in alteradas] + limpas
+            reconstruir_estatisticas(Curso.objects.filter(id__in={cursos_das_inscricoes[i] for i in ids}))
+
+    resumo['atualizadas'] = len(alteradas)
+    resumo['limpas'] = len(limpas)
+    return resumo
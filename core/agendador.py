@@ -0,0 +1,295 @@
+import os
+import socket
+import time
+import traceback
+from datetime import date, timedelta
+from importlib import import_module
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+# Tarefas periódicas de manutenção, executadas por `manage.py run_scheduler`
+# em vez de ficarem a cargo dos pedidos (expirar subscrições, limpar tokens de
+# recuperação e sessões expiradas, encerrar eventos do calendário que já
+# terminaram, apagar os ZIPs antigos de comprovativos em lote).
+#
+# Cada tarefa tem um horário em formato cron (minuto hora dia mês dia-da-semana,
+# na hora local de TIME_ZONE) e uma linha ExecucaoAgendada que guarda a próxima
+# execução e serve de bloqueio: com vários nós a correr o agendador, cada
+# ocorrência é reclamada por um UPDATE condicionado (próxima execução já
+# passada e bloqueio livre ou expirado) e só o nó que o consegue a executa. Um
+# nó que morra a meio perde o bloqueio ao fim de AGENDADOR_TEMPO_LIMITE segundos.
+#
+# As tarefas trabalham por blocos de AGENDADOR_BLOCO linhas (uma transação
+# curta por bloco), para não prender a base de dados com tabelas grandes.
+# Como QuerySet.update/delete não enviam sinais, as que alteram modelos em
+# cache (core.contexto) invalidam-no explicitamente.
+
+# Funções periódicas, por nome: (horário cron por omissão, função() -> resultado JSON)
+REGISTO = {}
+
+
+def agendada(nome, horario):
+    """Decorador que regista uma tarefa periódica (o horário pode ser alterado em AGENDADOR_HORARIOS)"""
+    def registar(funcao):
+        REGISTO[nome] = (horario, funcao)
+        return funcao
+    return registar
+
+
+def _definicao(nome, omissao):
+    return getattr(settings, nome, omissao)
+
+
+def horario(nome):
+    return _definicao('AGENDADOR_HORARIOS', {}).get(nome) or REGISTO[nome][0]
+
+
+# --- Horários cron ---
+
+def _campo(expressao, minimo, maximo):
+    valores = set()
+    for parte in expressao.split(','):
+        intervalo, _, passo = parte.partition('/')
+        passo = int(passo) if passo else 1
+        if intervalo == '*':
+            inicio, fim = minimo, maximo
+        elif '-' in intervalo:
+            inicio, fim = (int(v) for v in intervalo.split('-'))
+        else:
+            inicio = int(intervalo)
+            fim = maximo if passo > 1 else inicio
+        if passo < 1 or inicio < minimo or fim > maximo or inicio > fim:
+            raise ValueError(f"Campo cron inválido: {expressao}")
+        valores.update(range(inicio, fim + 1, passo))
+    return frozenset(valores)
+
+
+class Cron:
+    """Horário cron de 5 campos (*, a-b, a,b e /passo; domingo é 0 ou 7)"""
+
+    def __init__(self, expressao):
+        partes = expressao.split()
+        if len(partes) != 5:
+            raise ValueError(f"Horário cron inválido: {expressao}")
+        self.expressao = expressao
+        self.minutos = _campo(partes[0], 0, 59)
+        self.horas = _campo(partes[1], 0, 23)
+        self.dias = _campo(partes[2], 1, 31)
+        self.meses = _campo(partes[3], 1, 12)
+        self.dias_semana = frozenset(dia % 7 for dia in _campo(partes[4], 0, 7))
+        # Como no cron: se ambos os campos de dia forem restritos, basta um coincidir
+        self._dia_ou_semana = partes[2] != '*' and partes[4] != '*'
+
+    def _dia_valido(self, momento):
+        dia = momento.day in self.dias
+        semana = momento.isoweekday() % 7 in self.dias_semana
+        return dia or semana if self._dia_ou_semana else dia and semana
+
+    def proxima(self, apos):
+        """Primeiro instante do horário estritamente depois de `apos`"""
+        momento = timezone.localtime(apos).replace(tzinfo=None, second=0, microsecond=0) + timedelta(minutes=1)
+        limite = momento + timedelta(days=366 * 5)
+        while momento < limite:
+            if momento.month not in self.meses:
+                momento = (momento.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._dia_valido(momento):
+                momento = momento.replace(hour=0, minute=0) + timedelta(days=1)
+            elif momento.hour not in self.horas:
+                momento = momento.replace(minute=0) + timedelta(hours=1)
+            elif momento.minute not in self.minutos:
+                momento += timedelta(minutes=1)
+            else:
+                return timezone.make_aware(momento)
+        raise ValueError(f"Horário cron sem ocorrências: {self.expressao}")
+
+
+# --- Execução ---
+
+def nome_no():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _linha(nome, agora):
+    """Linha de bloqueio da tarefa, criada (sem execução imediata) na primeira vez"""
+    from .models import ExecucaoAgendada
+    expressao = horario(nome)
+    try:
+        execucao, _ = ExecucaoAgendada.objects.get_or_create(
+            nome=nome, defaults={'horario': expressao, 'proxima_execucao': Cron(expressao).proxima(agora)},
+        )
+    except IntegrityError:
+        # Outro nó criou-a ao mesmo tempo
+        execucao = ExecucaoAgendada.objects.get(nome=nome)
+    if execucao.horario != expressao:
+        execucao.horario = expressao
+        execucao.proxima_execucao = Cron(expressao).proxima(agora)
+        ExecucaoAgendada.objects.filter(pk=execucao.pk).update(
+            horario=expressao, proxima_execucao=execucao.proxima_execucao,
+        )
+    return execucao
+
+
+def reclamar(nome, no, agora=None, forcar=False):
+    """
+    Reclama a ocorrência devida da tarefa para o nó `no`: True só para um dos
+    nós que o tentem. Com forcar=True ignora a próxima execução (mas não o bloqueio).
+    """
+    from .models import ExecucaoAgendada
+    agora = agora or timezone.now()
+    _linha(nome, agora)
+    devidas = ExecucaoAgendada.objects.filter(nome=nome)
+    if not forcar:
+        devidas = devidas.filter(proxima_execucao__lte=agora)
+    livre = Q(bloqueado_ate__isnull=True) | Q(bloqueado_ate__lt=agora)
+    return bool(devidas.filter(livre).update(
+        bloqueado_por=no,
+        bloqueado_ate=agora + timedelta(seconds=_definicao('AGENDADOR_TEMPO_LIMITE', 1800)),
+    ))
+
+
+def executar(nome, no):
+    """Executa uma tarefa já reclamada por `no`, regista o resultado e marca a próxima ocorrência"""
+    from .models import ExecucaoAgendada
+    inicio = timezone.now()
+    erro = ''
+    resultado = None
+    try:
+        resultado = REGISTO[nome][1]()
+    except Exception:
+        erro = traceback.format_exc()
+    fim = timezone.now()
+    ExecucaoAgendada.objects.filter(nome=nome, bloqueado_por=no).update(
+        proxima_execucao=Cron(horario(nome)).proxima(fim),
+        bloqueado_por='',
+        bloqueado_ate=None,
+        ultima_execucao=inicio,
+        ultima_duracao=(fim - inicio).total_seconds(),
+        ultimo_resultado=resultado,
+        ultimo_erro=erro,
+    )
+    return not erro
+
+
+def executar_devidas(no=None, forcar=()):
+    """Executa as tarefas cuja hora chegou (e as de `forcar`); devolve {nome: sucesso}"""
+    no = no or nome_no()
+    executadas = {}
+    for nome in REGISTO:
+        close_old_connections()
+        try:
+            reclamada = reclamar(nome, no, forcar=nome in forcar)
+        except OperationalError:
+            # Base de dados ocupada (ex: SQLite bloqueado por outro escritor)
+            continue
+        if reclamada:
+            executadas[nome] = executar(nome, no)
+    return executadas
+
+
+def executar_agendador(parar=None, intervalo=None, ao_executar=None):
+    """Ciclo do agendador até `parar` (threading Event) ser assinalado"""
+    if intervalo is None:
+        intervalo = _definicao('AGENDADOR_INTERVALO', 30)
+    no = nome_no()
+    while not (parar and parar.is_set()):
+        executadas = executar_devidas(no)
+        if executadas and ao_executar:
+            ao_executar(executadas)
+        if parar:
+            parar.wait(intervalo)
+        else:
+            time.sleep(intervalo)
+    close_old_connections()
+
+
+# --- Tarefas de manutenção ---
+
+def em_blocos(queryset, acao, bloco=None):
+    """
+    Aplica acao(queryset) a blocos de `bloco` linhas de `queryset` até não
+    restar nenhuma; `acao` tem de as fazer sair do filtro (alterar ou apagar)
+    e devolver quantas tratou. Devolve o total.
+    """
+    bloco = bloco or _definicao('AGENDADOR_BLOCO', 500)
+    total = 0
+    while True:
+        ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:bloco])
+        if not ids:
+            return total
+        total += acao(queryset.filter(pk__in=ids))
+
+
+@agendada('expirar_subscricoes', '0 * * * *')
+def expirar_subscricoes():
+    """Passa a expirado as subscrições ativas cuja data de expiração já passou"""
+    from .contexto import modelo_alterado
+    from .models import Subscricao
+    expiradas = em_blocos(
+        Subscricao.objects.filter(estado__in=['ativo', 'teste'], data_expiracao__lt=date.today()),
+        lambda blocos: blocos.update(estado='expirado'),
+    )
+    if expiradas:
+        modelo_alterado('Subscricao')
+    return {'expiradas': expiradas}
+
+
+@agendada('limpar_recuperacoes_senha', '*/30 * * * *')
+def limpar_recuperacoes_senha():
+    """Apaga os tokens de recuperação de senha expirados"""
+    from .models import RecuperacaoSenha
+    apagados = em_blocos(
+        RecuperacaoSenha.objects.filter(data_expiracao__lt=timezone.now()),
+        lambda blocos: blocos.delete()[0],
+    )
+    return {'apagados': apagados}
+
+
+@agendada('limpar_sessoes', '15 * * * *')
+def limpar_sessoes():
+    """Apaga as sessões expiradas (equivalente a `manage.py clearsessions`, por blocos)"""
+    armazenamento = import_module(settings.SESSION_ENGINE).SessionStore
+    if not hasattr(armazenamento, 'get_model_class'):
+        # Backends sem tabela (cache, cookies) expiram sozinhos ou têm o seu próprio clear_expired
+        armazenamento.clear_expired()
+        return {'apagadas': None}
+    apagadas = em_blocos(
+        armazenamento.get_model_class().objects.filter(expire_date__lt=timezone.now()),
+        lambda blocos: blocos.delete()[0],
+    )
+    return {'apagadas': apagadas}
+
+
+@agendada('encerrar_eventos', '5 * * * *')
+def encerrar_eventos():
+    """Passa a ENCERRADO os eventos ativos do calendário cuja data de fim já passou"""
+    from .contexto import modelo_alterado
+    from .models import EventoCalendario
+    encerrados = em_blocos(
+        EventoCalendario.objects.filter(estado='ATIVO', data_fim__lt=date.today()),
+        lambda blocos: blocos.update(estado='ENCERRADO'),
+    )
+    if encerrados:
+        modelo_alterado('EventoCalendario')
+    return {'encerrados': encerrados}
+
+
+@agendada('limpar_comprovativos_lote', '45 * * * *')
+def limpar_comprovativos_lote():
+    """Apaga os ZIPs de comprovativos em lote mais antigos que COMPROVATIVOS_VALIDADE segundos"""
+    from .comprovativos import diretorio_lotes
+    diretorio = diretorio_lotes()
+    if not os.path.isdir(diretorio):
+        return {'apagados': 0}
+    limite = time.time() - _definicao('COMPROVATIVOS_VALIDADE', 24 * 3600)
+    apagados = 0
+    for entrada in os.scandir(diretorio):
+        try:
+            if entrada.is_file() and entrada.stat().st_mtime < limite:
+                os.unlink(entrada.path)
+                apagados += 1
+        except FileNotFoundError:
+            pass
+    return {'apagados': apagados}
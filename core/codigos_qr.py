@@ -0,0 +1,68 @@
+import functools
+
+from qrcode.main import QRCode
+from reportlab.platypus import Flowable
+
+# Códigos QR dos PDFs desenhados diretamente como retângulos vetoriais no
+# canvas do ReportLab: sem gerar uma imagem, codificá-la em PNG e voltar a
+# descodificá-la. A matriz de cada conteúdo é calculada uma vez por processo
+# (LRU) e partilhada por todos os documentos e vias que a usam.
+
+# Conteúdos diferentes guardados (uma matriz de versão 1-10 ocupa poucos KB)
+QR_CACHE_TAMANHO = 1024
+
+
+@functools.lru_cache(maxsize=QR_CACHE_TAMANHO)
+def matriz(dados, margem=1):
+    """Módulos do código QR de `dados` (inclui a margem), como tuplo de linhas de booleanos"""
+    qr = QRCode(version=1, border=margem)
+    qr.add_data(dados)
+    qr.make(fit=True)
+    return tuple(tuple(linha) for linha in qr.get_matrix())
+
+
+@functools.lru_cache(maxsize=QR_CACHE_TAMANHO)
+def _segmentos(dados, margem):
+    # Módulos escuros consecutivos de cada linha juntos num só retângulo:
+    # (linha, coluna inicial, comprimento)
+    segmentos = []
+    for y, linha in enumerate(matriz(dados, margem)):
+        x = 0
+        while x < len(linha):
+            if linha[x]:
+                inicio = x
+                while x < len(linha) and linha[x]:
+                    x += 1
+                segmentos.append((y, inicio, x - inicio))
+            else:
+                x += 1
+    return tuple(segmentos)
+
+
+class CodigoQR(Flowable):
+    """Flowable de um código QR quadrado com `lado` pontos, desenhado em vetorial"""
+
+    def __init__(self, dados, lado, margem=1, hAlign='CENTER'):
+        super().__init__()
+        self.dados = dados
+        self.lado = lado
+        self.margem = margem
+        self.hAlign = hAlign
+
+    def wrap(self, largura_disponivel, altura_disponivel):
+        return self.lado, self.lado
+
+    def draw(self):
+        modulos = len(matriz(self.dados, self.margem))
+        tamanho = self.lado / modulos
+        canvas = self.canv
+        canvas.saveState()
+        canvas.setFillColorRGB(1, 1, 1)
+        canvas.rect(0, 0, self.lado, self.lado, stroke=0, fill=1)
+        canvas.setFillColorRGB(0, 0, 0)
+        caminho = canvas.beginPath()
+        for y, x, comprimento in _segmentos(self.dados, self.margem):
+            # A linha 0 da matriz é o topo do código
+            caminho.rect(x * tamanho, self.lado - (y + 1) * tamanho, comprimento * tamanho, tamanho)
+        canvas.drawPath(caminho, stroke=0, fill=1)
+        canvas.restoreState()
@@ -0,0 +1,131 @@
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+# Coerência entre workers dos caches guardados em memória de cada processo.
+#
+# Cada espaço de cache (namespace) tem uma versão partilhada, guardada na tabela
+# VersaoCache ou, com CACHE_VERSOES_DIRETORIO, como contador num ficheiro por
+# espaço. Quem altera os dados publica uma nova versão; cada processo lê as
+# versões no máximo uma vez a cada CACHE_VERSOES_INTERVALO_MS e descarta os
+# espaços cuja versão mudou, chamando as funções registadas com registar().
+#
+# Em ambos os casos a nova versão só fica visível depois do commit: um worker
+# que recarregasse antes disso guardaria os dados antigos sem voltar a ver a
+# versão mudar.
+
+_versoes = {}
+_ouvintes = []
+_ultima_verificacao = None
+_lock = threading.Lock()
+
+
+def registar(ouvinte):
+    """Regista `ouvinte(namespaces)`, chamado quando outro processo publica novas versões"""
+    _ouvintes.append(ouvinte)
+    return ouvinte
+
+
+def _diretorio():
+    return getattr(settings, 'CACHE_VERSOES_DIRETORIO', None)
+
+
+def _intervalo():
+    return getattr(settings, 'CACHE_VERSOES_INTERVALO_MS', 1000) / 1000
+
+
+def _ler_versoes():
+    diretorio = _diretorio()
+    if diretorio:
+        versoes = {}
+        try:
+            with os.scandir(diretorio) as entradas:
+                for entrada in entradas:
+                    if entrada.is_file() and not entrada.name.startswith('.'):
+                        versoes[entrada.name] = _ler_contador(entrada.path)
+        except FileNotFoundError:
+            pass
+        return versoes
+
+    from .models import VersaoCache
+    return dict(VersaoCache.objects.values_list('namespace', 'versao'))
+
+
+def _ler_contador(caminho):
+    try:
+        with open(caminho) as ficheiro:
+            return int(ficheiro.read() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _publicar_ficheiros(diretorio, namespaces):
+    import fcntl
+    os.makedirs(diretorio, exist_ok=True)
+    # Um escritor de cada vez por diretório: ler, incrementar e substituir o
+    # ficheiro (os.replace é atómico, os leitores nunca veem um contador parcial)
+    with open(os.path.join(diretorio, '.bloqueio'), 'a') as bloqueio:
+        fcntl.flock(bloqueio, fcntl.LOCK_EX)
+        for namespace in namespaces:
+            caminho = os.path.join(diretorio, namespace)
+            descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix='.')
+            try:
+                with os.fdopen(descritor, 'w') as ficheiro:
+                    ficheiro.write(str(_ler_contador(caminho) + 1))
+                os.replace(temporario, caminho)
+            except BaseException:
+                os.unlink(temporario)
+                raise
+
+
+def publicar(*namespaces):
+    """
+    Marca os espaços indicados como alterados para todos os processos.
+
+    Com a tabela, o incremento faz parte da transação em curso; com ficheiros,
+    é feito em transaction.on_commit. Em ambos os casos os outros workers só
+    veem a nova versão (e recarregam) depois do commit.
+    """
+    diretorio = _diretorio()
+    if diretorio:
+        transaction.on_commit(lambda: _publicar_ficheiros(diretorio, namespaces))
+        return
+
+    from .models import VersaoCache
+    for namespace in namespaces:
+        if VersaoCache.objects.filter(namespace=namespace).update(versao=F('versao') + 1):
+            continue
+        try:
+            with transaction.atomic():
+                VersaoCache.objects.create(namespace=namespace, versao=1)
+        except IntegrityError:
+            VersaoCache.objects.filter(namespace=namespace).update(versao=F('versao') + 1)
+
+
+def verificar(forcar=False):
+    """
+    Compara as versões publicadas com as últimas vistas por este processo e
+    notifica os ouvintes dos espaços alterados. Devolve os espaços alterados.
+    """
+    global _ultima_verificacao
+    agora = time.monotonic()
+    with _lock:
+        if not forcar and _ultima_verificacao is not None and agora - _ultima_verificacao < _intervalo():
+            return set()
+        _ultima_verificacao = agora
+
+    versoes = _ler_versoes()
+    with _lock:
+        alterados = {ns for ns, versao in versoes.items() if _versoes.get(ns) != versao}
+        _versoes.clear()
+        _versoes.update(versoes)
+
+    if alterados:
+        for ouvinte in _ouvintes:
+            ouvinte(alterados)
+    return alterados
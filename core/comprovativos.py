@@ -0,0 +1,205 @@
+import os
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.units import cm
+from reportlab.platypus import Paragraph, Spacer, Table
+
+from .codigos_qr import CodigoQR
+from .pdfcache import versao_ficheiro
+from .recursos_pdf import CAMINHO_LOGO, ESTILOS, TABELAS, documento_pdf, imagem_logo
+
+# Comprovativos de inscrição.
+#
+# O gerador recebe só um dicionário com os dados que aparecem no documento
+# (dados_comprovativo): é o mesmo dicionário que serve de chave ao cache em
+# disco (core.pdfcache) e que é enviado aos processos da geração em lote, sem
+# acesso à base de dados fora do processo principal.
+#
+# A geração em lote (zip_comprovativos) distribui os comprovativos por um
+# ProcessPoolExecutor (o ReportLab ocupa o GIL) e escreve cada PDF no ZIP
+# assim que fica pronto: em memória só estão os PDFs em curso, nunca o lote.
+# Não corre nos processos web: a interface enfileira a tarefa
+# 'comprovativos_lote' (core.tarefas), que escreve o ZIP em
+# COMPROVATIVOS_DIRETORIO, e a linha de comando usa `manage.py gerar_comprovativos`.
+
+# Versão do layout dos comprovativos em cache: incrementar ao alterar o gerador
+VERSAO = 2
+
+VALOR_INSCRICAO = "5.000,00 Kz"  # Valor padrão ou buscar do modelo se existir
+
+
+def dados_comprovativo(inscricao, config, autenticado_por):
+    """Tudo o que aparece no comprovativo; a hora de autenticação é a da geração (uma por dia)"""
+    return {
+        'escola': config.nome_escola if config else None,
+        'numero': inscricao.numero_inscricao,
+        'nome': inscricao.nome_completo,
+        'curso': inscricao.curso.nome,
+        'data': inscricao.data_inscricao,
+        'bi': inscricao.bilhete_identidade,
+        'valor': VALOR_INSCRICAO,
+        'ano': str(inscricao.ano_academico) if inscricao.ano_academico_id else "2025/2026",
+        'autenticado_por': autenticado_por,
+        'dia': date.today(),
+        'logo': versao_ficheiro(CAMINHO_LOGO),
+    }
+
+
+def _qr_code(dados):
+    # Dados: RECIBO, CANDIDATURA, VALOR, ANO LECTIVO
+    qr_data = f"RECIBO: {dados['numero']}\nCANDIDATURA: {dados['nome']}\nVALOR: {dados['valor']}\nANO: {dados['ano']}"
+    return CodigoQR(qr_data, 3*cm, hAlign='RIGHT')
+
+
+def _parte(dados, titulo_adicional):
+    normal_style = ESTILOS['comprovativo_normal']
+    parte = []
+
+    # Logo
+    logotipo = imagem_logo(3*cm, 1.2*cm)
+    if logotipo:
+        parte.append(logotipo)
+
+    escola_nome = dados['escola'] or "Sistema Escolar"
+    parte.append(Paragraph(escola_nome.upper(), ESTILOS['comprovativo_titulo']))
+    parte.append(Paragraph(f"COMPROVATIVO DE INSCRIÇÃO {titulo_adicional}", ESTILOS['comprovativo_subtitulo']))
+    parte.append(Spacer(1, 0.3*cm))
+
+    # Tabela de dados
+    dados_tabela = [
+        [Paragraph(f"<b>Candidato:</b> {dados['nome']}", normal_style), _qr_code(dados)],
+        [Paragraph(f"<b>Curso:</b> {dados['curso']}", normal_style), ""],
+        [Paragraph(f"<b>Inscrição Nº:</b> {dados['numero']}", normal_style), ""],
+        [Paragraph(f"<b>Data:</b> {dados['data'].strftime('%d/%m/%Y')}", normal_style), ""],
+        [Paragraph(f"<b>BI:</b> {dados['bi']}", normal_style), ""],
+        [Paragraph(f"<b>Valor Pago:</b> {dados['valor']}", normal_style), ""],
+    ]
+    parte.append(Table(dados_tabela, colWidths=[12*cm, 4*cm], style=TABELAS['comprovativo']))
+
+    parte.append(Spacer(1, 0.5*cm))
+    parte.append(Paragraph("-" * 100, normal_style))
+    parte.append(Paragraph(f"<font size='8'>Autenticado por: {dados['autenticado_por']} em {datetime.now().strftime('%d/%m/%Y %H:%M')}</font>", normal_style))
+    return parte
+
+
+def desenhar_comprovativo(ficheiro, dados):
+    """Escreve em `ficheiro` o comprovativo (via instituição e via estudante) descrito por `dados`"""
+    # Margens reduzidas para caber duas partes
+    doc = documento_pdf(ficheiro, 'comprovativo')
+    story = []
+    # Parte 1: Instituição
+    story.extend(_parte(dados, "(VIA INSTITUIÇÃO)"))
+    story.append(Spacer(1, 1.5*cm))
+    story.append(Paragraph("-" * 80 + " CORTE AQUI " + "-" * 80, ESTILOS['corte']))
+    story.append(Spacer(1, 1.5*cm))
+    # Parte 2: Estudante
+    story.extend(_parte(dados, "(VIA ESTUDANTE)"))
+    doc.build(story)
+
+
+def _gerar_em_processo(dados):
+    """Executado nos processos do lote: devolve (nome do ficheiro, bytes do PDF)"""
+    buffer = BytesIO()
+    desenhar_comprovativo(buffer, dados)
+    return f"comprovativo_{dados['numero']}.pdf", buffer.getvalue()
+
+
+def _iniciar_processo():
+    # Com 'spawn' (ou 'forkserver') o processo começa sem o Django configurado
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'escola_sistema.settings')
+        django.setup()
+
+
+def gerar_em_lote(lista_dados, processos=None):
+    """
+    Gera os comprovativos de `lista_dados` (iterável de dados_comprovativo) em
+    paralelo e produz (nome, pdf) pela ordem em que ficam prontos.
+
+    Só há 2 trabalhos por processo em curso de cada vez: os dados são lidos do
+    iterável e os PDFs entregues à medida que o consumidor avança.
+    """
+    processos = processos or getattr(settings, 'COMPROVATIVOS_PROCESSOS', None) or os.cpu_count() or 1
+    lista_dados = iter(lista_dados)
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as executor:
+        pendentes = set()
+        try:
+            while True:
+                for dados in lista_dados:
+                    pendentes.add(executor.submit(_gerar_em_processo, dados))
+                    if len(pendentes) >= 2 * processos:
+                        break
+                if not pendentes:
+                    return
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    yield futuro.result()
+        finally:
+            # Consumidor interrompido (ex: cliente desligou-se): descarta o resto
+            for futuro in pendentes:
+                futuro.cancel()
+
+
+class _SaidaZip:
+    """Destino não pesquisável do ZipFile: acumula o que foi escrito até ser retirado"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(bytes(dados))
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def retirar(self):
+        dados = b''.join(self.partes)
+        self.partes.clear()
+        return dados
+
+
+def zip_comprovativos(inscricoes, config, autenticado_por, processos=None):
+    """
+    ZIP com o comprovativo de cada inscrição, produzido em blocos de bytes
+    (para StreamingHttpResponse ou para um ficheiro) à medida que os PDFs
+    ficam prontos. `inscricoes` deve ter select_related('curso', 'ano_academico').
+    """
+    lista_dados = (
+        dados_comprovativo(inscricao, config, autenticado_por)
+        for inscricao in inscricoes.iterator(chunk_size=100)
+    )
+    saida = _SaidaZip()
+    # Os PDFs já são comprimidos: guardados sem nova compressão
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_STORED) as arquivo:
+        for nome, pdf in gerar_em_lote(lista_dados, processos):
+            arquivo.writestr(nome, pdf)
+            yield saida.retirar()
+    yield saida.retirar()
+
+
+def diretorio_lotes():
+    diretorio = getattr(settings, 'COMPROVATIVOS_DIRETORIO', None)
+    return str(diretorio or os.path.join(settings.MEDIA_ROOT, 'comprovativos_lote'))
+
+
+def escrever_zip_comprovativos(caminho, inscricoes, config, autenticado_por, processos=None):
+    """Escreve em `caminho` o ZIP de zip_comprovativos (atomicamente: nunca fica um ZIP parcial)"""
+    diretorio = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(diretorio, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=diretorio, prefix='.', suffix='.zip')
+    try:
+        with os.fdopen(descritor, 'wb') as ficheiro:
+            for bloco in zip_comprovativos(inscricoes, config, autenticado_por, processos):
+                ficheiro.write(bloco)
+        os.replace(temporario, caminho)
+    except BaseException:
+        os.unlink(temporario)
+        raise
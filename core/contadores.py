@@ -0,0 +1,102 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+STATUS_MATRICULADO = 'Matriculado'
+
+# Contador em Curso para cada componente do estado de uma inscrição
+CAMPOS_CONTADORES = ('total_inscritos', 'total_aprovados', 'total_matriculados')
+
+
+class VagasEsgotadas(ValueError):
+    """Não há vagas disponíveis no curso para a operação pedida"""
+
+
+def _deltas(anterior, atual):
+    """Diferença entre dois estados (curso_id, aprovado, status) como {curso_id: {campo: delta}}"""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for estado, sinal in ((anterior, -1), (atual, 1)):
+        if estado is None:
+            continue
+        curso_id, aprovado, status = estado
+        aprovado, matriculado = bool(aprovado), status == STATUS_MATRICULADO
+        deltas[curso_id]['total_inscritos'] += sinal
+        deltas[curso_id]['total_aprovados'] += sinal * aprovado
+        deltas[curso_id]['total_matriculados'] += sinal * matriculado
+    return {
+        curso_id: {campo: valor for campo, valor in campos.items() if valor}
+        for curso_id, campos in deltas.items()
+    }
+
+
+def aplicar_transicao(anterior, atual, validar_vagas=False):
+    """
+    Atualiza os contadores dos cursos quando uma inscrição passa do estado
+    `anterior` para `atual`, ambos (curso_id, aprovado, status) ou None se a
+    inscrição não existe.
+
+    Cada curso é atualizado com um único UPDATE com expressões F(), pelo que
+    pedidos simultâneos não perdem incrementos. Com `validar_vagas`, os
+    incrementos de inscritos e matriculados só são aplicados se o curso ainda
+    tiver vagas (condição avaliada no próprio UPDATE); caso contrário é
+    lançada VagasEsgotadas e a transação do chamador deve ser revertida.
+    """
+    from .models import Curso
+
+    for curso_id, campos in _deltas(anterior, atual).items():
+        if not campos:
+            continue
+        filtro = Curso.objects.filter(pk=curso_id)
+        if validar_vagas:
+            for campo in ('total_inscritos', 'total_matriculados'):
+                if campos.get(campo, 0) > 0:
+                    filtro = filtro.filter(**{f'{campo}__lt': F('vagas')})
+        atualizados = filtro.update(**{campo: F(campo) + delta for campo, delta in campos.items()})
+        if not atualizados and validar_vagas:
+            raise VagasEsgotadas('Não há vagas disponíveis para este curso.')
+
+
+def recalcular_contadores(cursos=None):
+    """
+    Recalcula os contadores a partir da tabela de inscrições (uma consulta agrupada)
+    e corrige os cursos em que há divergência. Devolve a lista de cursos corrigidos
+    como (curso, {campo: (valor_guardado, valor_real)}).
+    """
+    from .models import Curso, Inscricao
+
+    if cursos is None:
+        cursos = Curso.objects.all()
+    cursos = list(cursos)
+    if not cursos:
+        return []
+
+    with transaction.atomic():
+        reais = {
+            linha['curso_id']: linha
+            for linha in Inscricao.objects.filter(curso__in=cursos).values('curso_id').annotate(
+                total_inscritos=Count('id'),
+                total_aprovados=Count('id', filter=Q(aprovado=True)),
+                total_matriculados=Count('id', filter=Q(status=STATUS_MATRICULADO)),
+            ).order_by()
+        }
+        guardados = {
+            c['id']: c for c in Curso.objects.select_for_update().filter(pk__in=[c.pk for c in cursos]).values('id', *CAMPOS_CONTADORES)
+        }
+
+        corrigidos = []
+        for curso in cursos:
+            real = reais.get(curso.pk, {})
+            guardado = guardados.get(curso.pk, {})
+            divergencias = {}
+            for campo in CAMPOS_CONTADORES:
+                valor_real = real.get(campo, 0)
+                if guardado.get(campo) != valor_real:
+                    divergencias[campo] = (guardado.get(campo), valor_real)
+                setattr(curso, campo, valor_real)
+            if divergencias:
+                corrigidos.append((curso, divergencias))
+
+        if corrigidos:
+            Curso.objects.bulk_update([c for c, _ in corrigidos], list(CAMPOS_CONTADORES))
+    return corrigidos
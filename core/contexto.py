@@ -0,0 +1,180 @@
+import threading
+
+from django.db import transaction
+from django.utils.functional import cached_property
+
+from . import coerencia
+
+# Cache por processo dos dados académicos quase estáticos usados em todas as
+# páginas (configuração da escola, ano e semestre atuais, ticker de eventos...).
+# As entradas são invalidadas pelos sinais post_save/post_delete dos modelos
+# correspondentes (ver core.signals) e, nos outros workers, através das
+# versões publicadas em core.coerencia (cada entrada é um namespace).
+_cache = {}
+_lock = threading.Lock()
+# Incrementado a cada invalidação: um valor carregado durante uma invalidação
+# concorrente não chega a ser guardado
+_geracao = 0
+
+# Entradas a invalidar quando um modelo é alterado
+DEPENDENCIAS = {
+    'ConfiguracaoEscola': ('config',),
+    'AnoAcademico': ('ano_atual', 'semestre_atual', 'eventos_ticker'),
+    'Semestre': ('semestre_atual',),
+    'EventoCalendario': ('eventos_ticker',),
+    'Subscricao': ('subscricao',),
+    'Notificacao': ('notificacoes_recentes', 'notificacoes_globais', 'notificacoes_publicas'),
+}
+
+
+def _obter(chave, carregar):
+    try:
+        return _cache[chave]
+    except KeyError:
+        pass
+    geracao = _geracao
+    valor = carregar()
+    with _lock:
+        if geracao == _geracao:
+            _cache[chave] = valor
+    return valor
+
+
+def invalidar(*chaves):
+    """Remove as entradas indicadas (ou todas) do cache deste processo"""
+    global _geracao
+    with _lock:
+        _geracao += 1
+        if not chaves:
+            _cache.clear()
+        for chave in chaves:
+            _cache.pop(chave, None)
+
+
+def invalidar_modelo(nome_modelo):
+    chaves = DEPENDENCIAS.get(nome_modelo)
+    if chaves:
+        invalidar(*chaves)
+
+
+def modelo_alterado(nome_modelo):
+    """Invalida as entradas dependentes do modelo neste processo e publica-as para os outros"""
+    chaves = DEPENDENCIAS.get(nome_modelo)
+    if not chaves:
+        return
+    # Invalida já (leituras seguintes neste pedido) e após o commit (pedidos
+    # concorrentes que entretanto tenham recarregado os valores antigos)
+    invalidar(*chaves)
+    coerencia.publicar(*chaves)
+    transaction.on_commit(lambda: invalidar(*chaves))
+
+
+# Versões alteradas por outros workers
+coerencia.registar(lambda namespaces: invalidar(*namespaces))
+
+
+def configuracao_escola():
+    from .models import ConfiguracaoEscola
+    return _obter('config', lambda: ConfiguracaoEscola.objects.first())
+
+
+def ano_atual():
+    from .models import AnoAcademico
+    return _obter('ano_atual', AnoAcademico.get_atual)
+
+
+def semestre_atual():
+    def carregar():
+        ano = ano_atual()
+        return ano.semestres.filter(ativo=True).first() if ano else None
+    return _obter('semestre_atual', carregar)
+
+
+def eventos_ticker():
+    from .models import EventoCalendario
+
+    def carregar():
+        ano = ano_atual()
+        if not ano:
+            return []
+        return list(EventoCalendario.objects.filter(ano_lectivo=ano, estado='ATIVO').order_by('data_inicio'))
+    return _obter('eventos_ticker', carregar)
+
+
+def subscricao_ativa():
+    from .models import Subscricao
+    return _obter('subscricao', lambda: Subscricao.objects.filter(estado__in=['ativo', 'teste']).first())
+
+
+def notificacoes_recentes():
+    from .models import Notificacao
+    return _obter('notificacoes_recentes', lambda: list(Notificacao.objects.filter(ativa=True).order_by('-data_criacao')[:5]))
+
+
+def notificacoes_globais():
+    """Ids (ordenados) das notificações globais ativas"""
+    from .models import Notificacao
+    return _obter('notificacoes_globais', lambda: list(
+        Notificacao.objects.filter(global_notificacao=True, ativa=True).order_by('id').values_list('id', flat=True)
+    ))
+
+
+def notificacoes_publicas():
+    """Regras (id, nivel_acesso, grupo, curso_id, turma_id) das notificações ativas dirigidas a um público"""
+    from .models import Notificacao
+    return _obter('notificacoes_publicas', lambda: list(
+        Notificacao.objects.filter(ativa=True, global_notificacao=False).exclude(publico_nivel_acesso='')
+        .order_by('id').values_list('id', 'publico_nivel_acesso', 'publico_grupo', 'publico_curso_id', 'publico_turma_id')
+    ))
+
+
+class ContextoAcademico:
+    """
+    Contexto académico de um pedido (disponível em request.academico).
+
+    Os valores partilhados vêm do cache do processo; o perfil do utilizador é
+    lido uma única vez por pedido. Os objetos são partilhados entre pedidos e
+    não devem ser alterados: para editar, obter uma instância nova da base de dados.
+    """
+
+    def __init__(self, request):
+        self.request = request
+
+    @property
+    def config(self):
+        return configuracao_escola()
+
+    @property
+    def ano_atual(self):
+        return ano_atual()
+
+    @property
+    def semestre_atual(self):
+        return semestre_atual()
+
+    @property
+    def eventos_ticker(self):
+        return eventos_ticker()
+
+    @property
+    def subscricao(self):
+        return subscricao_ativa()
+
+    @property
+    def notificacoes_recentes(self):
+        return notificacoes_recentes()
+
+    @cached_property
+    def perfil(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            return None
+        return getattr(user, 'perfil', None)
+
+
+def contexto_academico(request):
+    """Devolve o contexto académico do pedido, criando-o se o middleware não estiver ativo"""
+    contexto = getattr(request, 'academico', None)
+    if contexto is None:
+        contexto = request.academico = ContextoAcademico(request)
+    return contexto
@@ -0,0 +1,221 @@
+import re
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.utils.functional import cached_property
+
+# Motor dos modelos de Documento (Documento.conteudo com variáveis {nome}).
+#
+# Cada modelo é analisado uma vez e guardado como segmentos alternados
+# (texto literal, variável, texto literal, ...), numa cache por processo com
+# chave (id, data_atualizacao): editar o documento muda a chave e a versão
+# antiga deixa de ser usada. Renderizar é só preencher as posições das
+# variáveis e juntar os segmentos; renderizar_lote reaproveita a mesma lista
+# para milhares de conjuntos de dados.
+#
+# Só contam como variáveis chavetas com um identificador ({nome_completo}):
+# CSS ou outras chavetas no HTML do modelo ficam como texto.
+#
+# Os valores vêm do registo de variáveis (REGISTO): cada variável declara a
+# função que a carrega e as relações da inscrição de que precisa
+# (select_related). Só são carregadas as variáveis que o modelo usa, com uma
+# única consulta que junta as relações de todas elas; em lote, a mesma
+# consulta é feita por blocos para todas as inscrições.
+
+VARIAVEL = re.compile(r'\{([a-z_][a-z0-9_]*)\}')
+
+# Modelos compilados mantidos em memória por processo
+DOCUMENTOS_CACHE_TAMANHO = 128
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+
+
+class ModeloCompilado:
+    """Modelo de documento já analisado em segmentos"""
+
+    def __init__(self, conteudo):
+        # re.split com um grupo alterna literal / nome da variável / literal ...
+        self.segmentos = VARIAVEL.split(conteudo)
+        self.posicoes = tuple(range(1, len(self.segmentos), 2))
+        self.variaveis = frozenset(self.segmentos[i] for i in self.posicoes)
+
+    @cached_property
+    def plano(self):
+        """Variáveis registadas que o modelo usa e as relações da inscrição que exigem"""
+        variaveis = [REGISTO[nome] for nome in sorted(self.variaveis) if nome in REGISTO]
+        relacoes = sorted({relacao for variavel in variaveis for relacao in variavel.relacoes})
+        return variaveis, relacoes
+
+    def renderizar(self, dados):
+        """Texto do modelo com as variáveis de `dados`; as que faltam ficam como {nome}"""
+        partes = list(self.segmentos)
+        for i in self.posicoes:
+            nome = partes[i]
+            if nome in dados:
+                valor = dados[nome]
+                partes[i] = '' if valor is None else str(valor)
+            else:
+                partes[i] = '{' + nome + '}'
+        return ''.join(partes)
+
+    def renderizar_lote(self, lista_dados):
+        """Renderiza o modelo para cada dicionário de `lista_dados` (gerador)"""
+        for dados in lista_dados:
+            yield self.renderizar(dados)
+
+
+def variaveis_disponiveis():
+    """Nomes de todas as variáveis listadas em Documento.obter_variaveis_disponiveis"""
+    from .models import Documento
+    return frozenset(
+        VARIAVEL.fullmatch(variavel).group(1)
+        for variaveis in Documento.obter_variaveis_disponiveis().values()
+        for variavel in variaveis
+    )
+
+
+def validar_conteudo(conteudo):
+    """ValidationError se o modelo usar variáveis que não existem"""
+    desconhecidas = ModeloCompilado(conteudo or '').variaveis - variaveis_disponiveis()
+    if desconhecidas:
+        raise ValidationError(
+            'Variáveis desconhecidas no modelo: %(variaveis)s',
+            code='variavel_desconhecida',
+            params={'variaveis': ', '.join('{%s}' % nome for nome in sorted(desconhecidas))},
+        )
+
+
+def compilar(documento):
+    """Modelo compilado do documento (analisado uma vez por versão gravada)"""
+    if documento.pk is None:
+        return ModeloCompilado(documento.conteudo or '')
+    chave = (documento.pk, documento.data_atualizacao)
+    with _lock:
+        modelo = _cache.get(chave)
+        if modelo is not None:
+            _cache.move_to_end(chave)
+            return modelo
+    modelo = ModeloCompilado(documento.conteudo or '')
+    with _lock:
+        _cache[chave] = modelo
+        while len(_cache) > DOCUMENTOS_CACHE_TAMANHO:
+            _cache.popitem(last=False)
+    return modelo
+
+
+class ContextoDocumento:
+    """Dados que não dependem da inscrição: utilizador que gera o documento e configuração da escola"""
+
+    def __init__(self, utilizador=None):
+        self.utilizador = utilizador
+
+    @cached_property
+    def config(self):
+        from .contexto import configuracao_escola
+        return configuracao_escola()
+
+
+class Variavel:
+    def __init__(self, nome, carregar, relacoes, inscricao):
+        self.nome = nome
+        self.carregar = carregar
+        self.relacoes = relacoes
+        self.inscricao = inscricao
+
+
+# Variáveis com valor real, por nome (as restantes de obter_variaveis_disponiveis
+# ficam como {nome} no documento)
+REGISTO = {}
+
+
+def registar(nome, carregar, relacoes=(), inscricao=True):
+    """
+    Regista a variável `nome`: carregar(inscricao, contexto) devolve o valor;
+    `relacoes` são os caminhos select_related da Inscricao que usa; variáveis
+    com inscricao=False só dependem do contexto (e são carregadas uma vez por lote).
+    """
+    REGISTO[nome] = Variavel(nome, carregar, tuple(relacoes), inscricao)
+
+
+def _config(atributo, omissao=''):
+    return lambda inscricao, contexto: getattr(contexto.config, atributo) if contexto.config else omissao
+
+
+# Geral
+registar('escola_nome', _config('nome_escola', 'SIGA'), inscricao=False)
+registar('escola_decreto', _config('decreto_legalidade'), inscricao=False)
+registar('escola_endereco', _config('endereco'), inscricao=False)
+registar('escola_telefone', _config('telefone'), inscricao=False)
+registar('escola_email', _config('email'), inscricao=False)
+registar('data_atual', lambda inscricao, contexto: date.today().strftime('%d/%m/%Y'), inscricao=False)
+registar('usuario_logado', lambda inscricao, contexto: (
+    contexto.utilizador.get_full_name() or contexto.utilizador.username if contexto.utilizador else ''
+), inscricao=False)
+
+# Estudante
+registar('nome_completo', lambda inscricao, contexto: inscricao.nome_completo)
+registar('primeiro_nome', lambda inscricao, contexto: inscricao.primeiro_nome)
+registar('apelido', lambda inscricao, contexto: inscricao.apelido)
+registar('numero_inscricao', lambda inscricao, contexto: inscricao.numero_inscricao)
+registar('numero_processo', lambda inscricao, contexto: getattr(inscricao, 'numero_processo', '---'))
+registar('bilhete_identidade', lambda inscricao, contexto: inscricao.bilhete_identidade)
+registar('nacionalidade', lambda inscricao, contexto: inscricao.nacionalidade)
+registar('naturalidade', lambda inscricao, contexto: inscricao.local_nascimento)
+registar('data_nascimento', lambda inscricao, contexto: (
+    inscricao.data_nascimento.strftime('%d/%m/%Y') if inscricao.data_nascimento else ''
+))
+registar('sexo', lambda inscricao, contexto: inscricao.get_sexo_display())
+registar('endereco_estudante', lambda inscricao, contexto: inscricao.endereco)
+registar('telefone_estudante', lambda inscricao, contexto: inscricao.telefone)
+registar('email_estudante', lambda inscricao, contexto: inscricao.email)
+
+# Académico
+registar('curso_nome', lambda inscricao, contexto: inscricao.curso.nome, ['curso'])
+registar('curso_codigo', lambda inscricao, contexto: inscricao.curso.codigo, ['curso'])
+registar('grau_academico', lambda inscricao, contexto: inscricao.curso.grau.nome, ['curso__grau'])
+registar('turma_nome', lambda inscricao, contexto: getattr(inscricao, 'turma_nome', '---'))
+registar('ano_academico', lambda inscricao, contexto: str(inscricao.ano_academico), ['ano_academico'])
+registar('semestre_atual', lambda inscricao, contexto: '---', inscricao=False)
+registar('status_academico', lambda inscricao, contexto: 'Ativo' if inscricao.aprovado else 'Pendente')
+
+# Assinaturas
+registar('diretor_geral', _config('nome_responsavel_visto'), inscricao=False)
+registar('diretor_academico', _config('nome_responsavel_assinatura'), inscricao=False)
+
+
+def inscricoes_para(modelo, inscricoes=None):
+    """Queryset de inscrições com as relações (e só essas) de que as variáveis do modelo precisam"""
+    from .models import Inscricao
+    if inscricoes is None:
+        inscricoes = Inscricao.objects.all()
+    _, relacoes = modelo.plano
+    return inscricoes.select_related(*relacoes) if relacoes else inscricoes
+
+
+def _globais(modelo, contexto):
+    variaveis, _ = modelo.plano
+    return {v.nome: v.carregar(None, contexto) for v in variaveis if not v.inscricao}
+
+
+def dados_inscricao(modelo, inscricao, contexto, globais=None):
+    """Valores das variáveis do modelo para uma inscrição (obtida com inscricoes_para)"""
+    dados = _globais(modelo, contexto) if globais is None else dict(globais)
+    for variavel in modelo.plano[0]:
+        if variavel.inscricao:
+            dados[variavel.nome] = variavel.carregar(inscricao, contexto)
+    return dados
+
+
+def renderizar_inscricoes(documento, inscricoes, contexto, bloco=500):
+    """
+    Renderiza o documento para cada inscrição do queryset, produzindo
+    (inscricao, texto): as relações necessárias são lidas por blocos numa
+    só consulta e as variáveis que não dependem da inscrição uma única vez.
+    """
+    modelo = compilar(documento)
+    globais = _globais(modelo, contexto)
+    for inscricao in inscricoes_para(modelo, inscricoes).iterator(chunk_size=bloco):
+        yield inscricao, modelo.renderizar(dados_inscricao(modelo, inscricao, contexto, globais))
@@ -0,0 +1,198 @@
+import os
+import tempfile
+import textwrap
+import time
+
+from django.conf import settings
+
+# Recibos térmicos em ESC/POS.
+#
+# Alternativa ao PDF de 80mm (gerar_recibo_termico): o mesmo conteúdo enviado
+# como comandos da impressora (texto, negrito, centrado, código QR nativo e
+# corte), sem layout de PDF nem rasterização no browser. O trabalho é
+# descarregado como .bin ou colocado num diretório de spool
+# (ESCPOS_SPOOL_DIRETORIO) de onde um serviço local o envia para a impressora.
+#
+# decodificar() interpreta um trabalho de volta em linhas e é usado, com
+# ImpressoraFicheiro, como impressora de substituição nos testes.
+
+ESC = b'\x1b'
+GS = b'\x1d'
+LF = b'\n'
+
+# Caracteres por linha na fonte A de uma impressora de 80mm (576 pontos / 12)
+COLUNAS = 48
+# Página de código PC860 (português): ESC t 3
+PAGINA_CODIGO = 3
+CODIFICACAO = 'cp860'
+
+ALINHAMENTOS = {'esquerda': 0, 'centro': 1, 'direita': 2}
+
+
+class TrabalhoESCPOS:
+    """Construtor de um trabalho ESC/POS"""
+
+    def __init__(self, colunas=COLUNAS):
+        self.colunas = colunas
+        self.partes = [ESC + b'@', ESC + b't' + bytes([PAGINA_CODIGO])]
+        self._alinhamento = None
+        self._negrito = None
+        self._tamanho = None
+
+    def _estado(self, alinhamento, negrito, tamanho):
+        if alinhamento != self._alinhamento:
+            self.partes.append(ESC + b'a' + bytes([ALINHAMENTOS[alinhamento]]))
+            self._alinhamento = alinhamento
+        if negrito != self._negrito:
+            self.partes.append(ESC + b'E' + bytes([int(negrito)]))
+            self._negrito = negrito
+        if tamanho != self._tamanho:
+            # GS ! n: largura e altura (1-8) nos 4 bits altos / baixos
+            self.partes.append(GS + b'!' + bytes([(tamanho - 1) << 4 | (tamanho - 1)]))
+            self._tamanho = tamanho
+
+    def linha(self, texto='', alinhamento='esquerda', negrito=False, tamanho=1):
+        """Texto numa ou mais linhas (quebradas à largura do papel)"""
+        self._estado(alinhamento, negrito, tamanho)
+        for parte in textwrap.wrap(texto, self.colunas // tamanho) or ['']:
+            self.partes.append(parte.encode(CODIFICACAO, errors='replace') + LF)
+        return self
+
+    def separador(self, caracter='-'):
+        return self.linha(caracter * self.colunas)
+
+    def avancar(self, linhas=1):
+        self.partes.append(ESC + b'd' + bytes([linhas]))
+        return self
+
+    def qr(self, dados, modulo=6, alinhamento='centro'):
+        """Código QR gerado pela própria impressora (GS ( k, modelo 2, correção M)"""
+        self._estado(alinhamento, False, 1)
+        conteudo = dados.encode('utf-8')
+        tamanho = len(conteudo) + 3
+        self.partes += [
+            GS + b'(k' + bytes([4, 0, 49, 65, 50, 0]),                     # modelo 2
+            GS + b'(k' + bytes([3, 0, 49, 67, modulo]),                    # tamanho do módulo
+            GS + b'(k' + bytes([3, 0, 49, 69, 49]),                        # correção M
+            GS + b'(k' + bytes([tamanho % 256, tamanho // 256, 49, 80, 48]) + conteudo,
+            GS + b'(k' + bytes([3, 0, 49, 81, 48]),                        # imprimir
+            LF,
+        ]
+        return self
+
+    def cortar(self):
+        # GS V 66 n: avança n pontos e faz corte parcial
+        self.partes.append(GS + b'V' + bytes([66, 0]))
+        return self
+
+    def conteudo(self):
+        return b''.join(self.partes)
+
+
+def recibo_termico(dados):
+    """Recibo de inscrição em ESC/POS, a partir dos mesmos dados do recibo térmico em PDF"""
+    trabalho = TrabalhoESCPOS()
+    trabalho.linha((dados['escola'] or "SIGA - GESTÃO ACADÉMICA").upper(), 'centro', negrito=True)
+    trabalho.separador()
+    trabalho.linha("COMPROVATIVO DE INSCRIÇÃO", 'centro', negrito=True)
+    trabalho.linha(f"Nº: {dados['numero']}", 'centro', negrito=True, tamanho=2)
+    trabalho.separador()
+    trabalho.linha(f"CANDIDATO: {dados['nome'].upper()}")
+    trabalho.linha(f"CURSO: {dados['curso']}")
+    trabalho.linha(f"DATA: {dados['data'].strftime('%d/%m/%Y %H:%M')}")
+    trabalho.linha(f"DOC. ID: {dados['bi']}")
+    trabalho.separador()
+    if dados['atendente']:
+        trabalho.linha(f"Atendente: {dados['atendente']}")
+    trabalho.qr(f"RECIBO: {dados['numero']}\nCANDIDATURA: {dados['nome']}")
+    trabalho.linha("OBRIGADO PELA PREFERÊNCIA", 'centro', negrito=True)
+    trabalho.avancar(4)
+    trabalho.cortar()
+    return trabalho.conteudo()
+
+
+class ImpressoraFicheiro:
+    """
+    "Impressora" que escreve cada trabalho num ficheiro .bin de um diretório:
+    o spool local lido pelo serviço de impressão, ou um diretório temporário
+    nos testes. A escrita é atómica (o leitor nunca vê um trabalho incompleto).
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = str(diretorio)
+
+    def imprimir(self, nome, dados):
+        os.makedirs(self.diretorio, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as ficheiro:
+                ficheiro.write(dados)
+            caminho = os.path.join(self.diretorio, f"{time.time_ns()}_{nome}.bin")
+            os.replace(temporario, caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+        return caminho
+
+    def trabalhos(self):
+        """Caminhos dos trabalhos por ordem de chegada"""
+        return sorted(
+            os.path.join(self.diretorio, nome) for nome in os.listdir(self.diretorio) if nome.endswith('.bin')
+        ) if os.path.isdir(self.diretorio) else []
+
+
+def impressora_spool():
+    """Impressora do spool configurado em ESCPOS_SPOOL_DIRETORIO, ou None se não houver"""
+    diretorio = getattr(settings, 'ESCPOS_SPOOL_DIRETORIO', None)
+    return ImpressoraFicheiro(diretorio) if diretorio else None
+
+
+def decodificar(dados):
+    """
+    Interpreta um trabalho ESC/POS (os comandos usados por TrabalhoESCPOS):
+    lista de linhas {'texto', 'alinhamento', 'negrito', 'tamanho'}, {'qr': ...}
+    e {'corte': True}.
+    """
+    nomes_alinhamento = {v: k for k, v in ALINHAMENTOS.items()}
+    estado = {'alinhamento': 'esquerda', 'negrito': False, 'tamanho': 1}
+    resultado = []
+    texto = bytearray()
+    i = 0
+    while i < len(dados):
+        byte = dados[i:i + 1]
+        if byte == ESC:
+            comando = dados[i + 1:i + 2]
+            if comando == b'@':
+                i += 2
+                continue
+            argumento = dados[i + 2]
+            if comando == b'a':
+                estado['alinhamento'] = nomes_alinhamento[argumento]
+            elif comando == b'E':
+                estado['negrito'] = bool(argumento)
+            i += 3
+        elif byte == GS:
+            comando = dados[i + 1:i + 2]
+            if comando == b'!':
+                estado['tamanho'] = (dados[i + 2] & 0x0F) + 1
+                i += 3
+            elif comando == b'(':
+                tamanho = dados[i + 3] + dados[i + 4] * 256
+                # GS ( k pL pH cn fn m dados...
+                if dados[i + 6] == 80:
+                    resultado.append({'qr': dados[i + 8:i + 5 + tamanho].decode('utf-8')})
+                i += 5 + tamanho
+            elif comando == b'V':
+                resultado.append({'corte': True})
+                i += 4
+            else:
+                raise ValueError(f"Comando GS desconhecido: {comando!r}")
+        elif byte == LF:
+            if texto or not (resultado and 'qr' in resultado[-1]):
+                resultado.append({'texto': texto.decode(CODIFICACAO), **estado})
+            texto = bytearray()
+            i += 1
+        else:
+            texto += byte
+            i += 1
+    return resultado
@@ -0,0 +1,184 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, ExtractYear, TruncDate
+from django.utils import timezone
+
+from .contadores import STATUS_MATRICULADO
+from .models import AnoAcademico, Curso, EstatisticaInscricoes, Inscricao, PagamentoSubscricao
+
+
+# Métricas guardadas em cada linha de EstatisticaInscricoes
+METRICAS = ('inscritos', 'aprovados', 'reprovados', 'sem_nota', 'matriculados', 'ativos')
+
+# Inscrições matriculadas que contam como estudantes ativos
+STATUS_INSCRICAO_ATIVO = 'ativo'
+
+
+def _linha(estado):
+    """Chave (ano_academico_id, curso_id, dia) e métricas de uma inscrição no estado Inscricao.CAMPOS_ESTADO"""
+    curso_id, aprovado, status, ano_academico_id, nota_teste, data_inscricao, status_inscricao = estado
+    dia = timezone.localdate(data_inscricao) if data_inscricao else timezone.localdate()
+    return (ano_academico_id, curso_id, dia), {
+        'inscritos': 1,
+        'aprovados': int(bool(aprovado)),
+        'reprovados': int(not aprovado and nota_teste is not None),
+        'sem_nota': int(nota_teste is None),
+        'matriculados': int(status == STATUS_MATRICULADO),
+        'ativos': int(bool(aprovado) and status == STATUS_MATRICULADO and status_inscricao == STATUS_INSCRICAO_ATIVO),
+    }
+
+
+def registar_transicao(anterior, atual):
+    """
+    Atualiza as estatísticas pré-agregadas quando uma inscrição passa do estado
+    `anterior` para `atual` (tuplos Inscricao.CAMPOS_ESTADO, ou None se a
+    inscrição não existe). Cada linha afetada recebe um único UPDATE com F().
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+    for estado, sinal in ((anterior, -1), (atual, 1)):
+        if estado is None:
+            continue
+        chave, metricas = _linha(estado)
+        for metrica, valor in metricas.items():
+            deltas[chave][metrica] += sinal * valor
+
+    for chave, metricas in deltas.items():
+        _somar(chave, {metrica: valor for metrica, valor in metricas.items() if valor})
+
+
+def _somar(chave, metricas):
+    """Soma `metricas` à linha (ano_academico_id, curso_id, dia), criando-a se necessário"""
+    ano_academico_id, curso_id, dia = chave
+    if not metricas:
+        return
+    linha = EstatisticaInscricoes.objects.filter(ano_academico_id=ano_academico_id, curso_id=curso_id, dia=dia)
+    if linha.update(**{metrica: F(metrica) + valor for metrica, valor in metricas.items()}):
+        return
+    if not any(valor > 0 for valor in metricas.values()):
+        # Linha já removida (ex: curso apagado em cascata); nada a descontar
+        return
+    try:
+        with transaction.atomic():
+            EstatisticaInscricoes.objects.create(
+                ano_academico_id=ano_academico_id, curso_id=curso_id, dia=dia, **metricas
+            )
+    except IntegrityError:
+        # Outro pedido criou a linha entretanto
+        linha.update(**{metrica: F(metrica) + valor for metrica, valor in metricas.items()})
+
+
+def desassociar_ano(ano_academico):
+    """
+    Junta as linhas de um ano académico que vai ser apagado às linhas sem ano
+    (as inscrições ficam com ano_academico a NULL): sem isto o SET_NULL criaria
+    duas linhas sem ano para o mesmo curso e dia.
+    """
+    with transaction.atomic():
+        linhas = EstatisticaInscricoes.objects.filter(ano_academico=ano_academico)
+        somas = list(linhas.values_list('curso_id', 'dia', *METRICAS))
+        linhas.delete()
+        for curso_id, dia, *valores in somas:
+            _somar((None, curso_id, dia), dict(zip(METRICAS, valores)))
+
+
+def reconstruir_estatisticas(cursos=None):
+    """
+    Recalcula as estatísticas pré-agregadas a partir da tabela de inscrições
+    (de todos os cursos ou apenas dos indicados). Devolve o número de linhas criadas.
+    """
+    inscricoes = Inscricao.objects.all()
+    linhas = EstatisticaInscricoes.objects.all()
+    if cursos is not None:
+        inscricoes = inscricoes.filter(curso__in=cursos)
+        linhas = linhas.filter(curso__in=cursos)
+
+    agregados = inscricoes.annotate(dia=TruncDate('data_inscricao')).values(
+        'ano_academico_id', 'curso_id', 'dia'
+    ).annotate(
+        inscritos=Count('id'),
+        aprovados=Count('id', filter=Q(aprovado=True)),
+        reprovados=Count('id', filter=Q(aprovado=False, nota_teste__isnull=False)),
+        sem_nota=Count('id', filter=Q(nota_teste__isnull=True)),
+        matriculados=Count('id', filter=Q(status=STATUS_MATRICULADO)),
+        ativos=Count('id', filter=Q(aprovado=True, status=STATUS_MATRICULADO, status_inscricao=STATUS_INSCRICAO_ATIVO)),
+    ).order_by()
+
+    with transaction.atomic():
+        linhas.delete()
+        criadas = EstatisticaInscricoes.objects.bulk_create(
+            (EstatisticaInscricoes(**linha) for linha in agregados.iterator()), batch_size=500
+        )
+    return len(criadas)
+
+
+def totais_inscricoes():
+    """Totais globais de inscrições somados a partir das estatísticas pré-agregadas"""
+    return EstatisticaInscricoes.objects.aggregate(
+        **{metrica: Coalesce(Sum(metrica), 0) for metrica in METRICAS}
+    )
+
+
+def indicacoes_inscricoes():
+    """Inscrições online e presenciais (pelo método de pagamento)"""
+    return Inscricao.objects.aggregate(
+        online=Count('id', filter=Q(metodo_pagamento__icontains='online')),
+        presencial=Count('id', filter=Q(metodo_pagamento__icontains='presencial')),
+    )
+
+
+def estatisticas_por_curso():
+    """Cursos ativos anotados com os totais de inscrições (uma consulta agrupada)"""
+    return list(Curso.objects.filter(ativo=True).annotate(**{
+        f'n_{metrica}': Coalesce(Sum(f'estatisticas_inscricoes__{metrica}'), 0)
+        for metrica in METRICAS
+    }))
+
+
+def matriculas_por_ano(anos):
+    """Número de matriculados por ano académico, pela ordem de `anos`"""
+    por_ano = dict(
+        EstatisticaInscricoes.objects.filter(ano_academico__in=anos)
+        .values_list('ano_academico').annotate(total=Sum('matriculados')).order_by()
+    )
+    return [por_ano.get(a.id, 0) for a in anos]
+
+
+def inscricoes_por_dia(desde):
+    """Total de inscrições por dia a partir da data `desde`, do mais recente para o mais antigo"""
+    return EstatisticaInscricoes.objects.filter(dia__gte=desde).values('dia').annotate(
+        total=Sum('inscritos')
+    ).order_by('-dia')
+
+
+def receitas_por_ano():
+    """Soma dos pagamentos aprovados agrupada pelo ano do pagamento"""
+    linhas = (
+        PagamentoSubscricao.objects.filter(status='aprovado')
+        .annotate(ano=ExtractYear('data_pagamento'))
+        .values('ano').annotate(total=Sum('valor')).order_by('ano')
+    )
+    return {linha['ano']: float(linha['total']) for linha in linhas}
+
+
+def pagamentos_por_estado():
+    return dict(PagamentoSubscricao.objects.values_list('status').annotate(total=Count('id')).order_by())
+
+
+def estatisticas_painel():
+    """
+    Todas as estatísticas do painel principal com um número fixo de consultas,
+    independente do número de cursos e de anos académicos. Os totais de
+    inscrições são lidos das linhas pré-agregadas de EstatisticaInscricoes.
+    """
+    anos = list(AnoAcademico.objects.order_by('data_inicio'))
+    return {
+        'totais': totais_inscricoes(),
+        'indicacoes': indicacoes_inscricoes(),
+        'cursos': estatisticas_por_curso(),
+        'anos': anos,
+        'matriculas_por_ano': matriculas_por_ano(anos),
+        'receitas_por_ano': receitas_por_ano(),
+        'pagamentos_por_estado': pagamentos_por_estado(),
+    }
@@ -0,0 +1,146 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Max, Q, Sum
+
+# Difusão de contadores em tempo real (Server-Sent Events).
+#
+# Cada processo ASGI tem um único ciclo de deteção de alterações, independente
+# do número de browsers ligados: a cada EVENTOS_INTERVALO segundos lê o número
+# de perfis pendentes e uma "assinatura" das notificações (3 consultas); só
+# quando algo muda recalcula as não lidas dos utilizadores ligados e envia os
+# novos valores para as filas das ligações afetadas.
+
+
+def _intervalo():
+    return getattr(settings, 'EVENTOS_INTERVALO', 2)
+
+
+def evento_sse(tipo, dados):
+    return f"event: {tipo}\ndata: {json.dumps(dados)}\n\n"
+
+
+def _ler_estado(user_ids):
+    from . import coerencia
+    from .models import CaixaNotificacoes, Notificacao, PerfilUsuario
+    close_old_connections()
+    # As regras de notificação em cache podem ter sido alteradas noutro worker
+    coerencia.verificar()
+    pendentes = PerfilUsuario.objects.filter(nivel_acesso='pendente').count()
+    notificacoes = Notificacao.objects.aggregate(
+        ultima=Max('id'), ativas=Count('id', filter=Q(ativa=True))
+    )
+    # Leituras feitas pelos próprios utilizadores ligados (marcar como lida)
+    caixas = CaixaNotificacoes.objects.filter(user_id__in=user_ids).aggregate(
+        nao_lidas=Sum('nao_lidas'), lidas_ate=Sum('lidas_ate'), globais_lidas=Sum('globais_lidas')
+    )
+    return pendentes, tuple(notificacoes.values()) + tuple(caixas.values())
+
+
+def _nao_lidas(user_ids):
+    from django.contrib.auth.models import User
+    from .notificacoes import contar_nao_lidas
+    close_old_connections()
+    return {
+        user.pk: contar_nao_lidas(user)
+        for user in User.objects.filter(pk__in=user_ids).select_related('perfil')
+    }
+
+
+class Ligacao:
+    """Uma ligação SSE: a fila de eventos e o último valor enviado de cada contador"""
+
+    def __init__(self, user_id, staff):
+        self.user_id = user_id
+        self.staff = staff
+        self.fila = asyncio.Queue()
+        self.enviados = {}
+
+    def enviar(self, tipo, valor):
+        if self.enviados.get(tipo) != valor:
+            self.enviados[tipo] = valor
+            self.fila.put_nowait(evento_sse(tipo, {'count': valor}))
+
+
+class Difusor:
+    """Ciclo partilhado por todas as ligações SSE do processo (um por event loop)"""
+
+    def __init__(self):
+        self.ligacoes = set()
+        self.tarefa = None
+        self.pendentes = None
+        self.assinatura = None
+        self.nao_lidas = {}
+
+    async def ligar(self, user_id, staff):
+        ligacao = Ligacao(user_id, staff)
+        self.ligacoes.add(ligacao)
+        # Valores iniciais da nova ligação
+        if user_id not in self.nao_lidas:
+            self.nao_lidas.update(await sync_to_async(_nao_lidas)([user_id]))
+        ligacao.enviar('notificacoes', self.nao_lidas.get(user_id, 0))
+        if staff and self.pendentes is not None:
+            ligacao.enviar('perfis_pendentes', self.pendentes)
+        if self.tarefa is None or self.tarefa.done():
+            self.tarefa = asyncio.get_running_loop().create_task(self._ciclo())
+        return ligacao
+
+    def desligar(self, ligacao):
+        self.ligacoes.discard(ligacao)
+        if not any(l.user_id == ligacao.user_id for l in self.ligacoes):
+            self.nao_lidas.pop(ligacao.user_id, None)
+
+    async def _ciclo(self):
+        while self.ligacoes:
+            try:
+                await self.verificar()
+            except Exception:
+                # Falhas temporárias da base de dados não terminam o ciclo
+                pass
+            await asyncio.sleep(_intervalo())
+        self.tarefa = None
+        self.assinatura = None
+        self.pendentes = None
+
+    async def verificar(self):
+        user_ids = {ligacao.user_id for ligacao in self.ligacoes}
+        pendentes, assinatura = await sync_to_async(_ler_estado)(user_ids)
+        if pendentes != self.pendentes:
+            self.pendentes = pendentes
+            for ligacao in list(self.ligacoes):
+                if ligacao.staff:
+                    ligacao.enviar('perfis_pendentes', pendentes)
+        if assinatura != self.assinatura:
+            self.assinatura = assinatura
+            self.nao_lidas = await sync_to_async(_nao_lidas)(user_ids)
+            for ligacao in list(self.ligacoes):
+                ligacao.enviar('notificacoes', self.nao_lidas.get(ligacao.user_id, 0))
+
+
+_difusores = {}
+
+
+def difusor():
+    """Difusor do event loop atual (um por processo no servidor ASGI)"""
+    loop = asyncio.get_running_loop()
+    if loop not in _difusores:
+        _difusores[loop] = Difusor()
+    return _difusores[loop]
+
+
+async def transmitir(user_id, staff, ping=15):
+    """Gerador assíncrono com os eventos SSE de uma ligação"""
+    ligado = difusor()
+    ligacao = await ligado.ligar(user_id, staff)
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                yield await asyncio.wait_for(ligacao.fila.get(), timeout=ping)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+    finally:
+        ligado.desligar(ligacao)
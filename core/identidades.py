@@ -0,0 +1,113 @@
+import re
+
+from django.db import transaction
+from django.db.models import Case, Q, Value, When
+
+# Registo de identidades das inscrições (IdentidadeInscricao).
+#
+# Cada inscrição tem uma linha por (tipo, valor normalizado): BI, email e
+# telefone. As verificações de duplicados do formulário de
+# inscrição e da validação em tempo real são uma única consulta sobre o índice
+# (tipo, valor), em vez de comparações sobre colunas sem índice.
+#
+# O registo é sincronizado em Inscricao.save(); os caminhos em massa
+# (core.admissao) não alteram estes campos. reconstruir_identidades() refaz-o.
+
+TIPO_BI = 'bi'
+TIPO_EMAIL = 'email'
+TIPO_TELEFONE = 'telefone'
+
+# Campos da inscrição que alimentam o registo
+CAMPOS_IDENTIDADE = ('bilhete_identidade', 'email', 'telefone')
+
+
+def _telefone(valor):
+    digitos = re.sub(r'\D', '', valor)
+    # Números angolanos com indicativo (+244 / 00244) ficam só com os 9 dígitos
+    if len(digitos) > 9 and digitos.lstrip('0').startswith('244'):
+        digitos = digitos.lstrip('0')[3:]
+    return digitos
+
+
+NORMALIZADORES = {
+    TIPO_BI: lambda valor: re.sub(r'[\s\-.]', '', valor).upper(),
+    TIPO_EMAIL: lambda valor: valor.strip().lower(),
+    TIPO_TELEFONE: _telefone,
+}
+
+
+def normalizar(tipo, valor):
+    return NORMALIZADORES[tipo](valor or '')[:255]
+
+
+def identidades_de_valores(bilhete_identidade, email, telefone):
+    """Conjunto de (tipo, valor normalizado) a partir dos campos de CAMPOS_IDENTIDADE"""
+    pares = {
+        (TIPO_BI, normalizar(TIPO_BI, bilhete_identidade)),
+        (TIPO_EMAIL, normalizar(TIPO_EMAIL, email)),
+        (TIPO_TELEFONE, normalizar(TIPO_TELEFONE, telefone)),
+    }
+    return frozenset(par for par in pares if par[1])
+
+
+def sincronizar_identidades(inscricao, identidades, anteriores=None):
+    """Acerta as linhas do registo de uma inscrição com o conjunto `identidades`"""
+    from .models import IdentidadeInscricao
+    if anteriores is None:
+        anteriores = set(inscricao.identidades.values_list('tipo', 'valor'))
+    removidas = set(anteriores) - identidades
+    novas = identidades - set(anteriores)
+    with transaction.atomic():
+        for tipo, valor in removidas:
+            IdentidadeInscricao.objects.filter(inscricao=inscricao, tipo=tipo, valor=valor).delete()
+        if novas:
+            IdentidadeInscricao.objects.bulk_create(
+                [IdentidadeInscricao(inscricao=inscricao, tipo=tipo, valor=valor) for tipo, valor in novas],
+                ignore_conflicts=True,
+            )
+
+
+def procurar_duplicado(excluir=None, **valores):
+    """
+    Primeira identidade já registada entre os valores indicados (bi, email,
+    telefone), numa única consulta. Devolve (tipo, inscricao_id) ou None.
+    """
+    from .models import IdentidadeInscricao
+    filtro = Q()
+    for tipo, valor in valores.items():
+        valor = normalizar(tipo, valor)
+        if valor:
+            filtro |= Q(tipo=tipo, valor=valor)
+    if not filtro:
+        return None
+    encontradas = IdentidadeInscricao.objects.filter(filtro)
+    if excluir is not None:
+        encontradas = encontradas.exclude(inscricao_id=excluir)
+    # A ordem dos argumentos define qual duplicado é reportado primeiro
+    prioridade = Case(*[When(tipo=tipo, then=Value(i)) for i, tipo in enumerate(valores)])
+    return encontradas.order_by(prioridade).values_list('tipo', 'inscricao_id').first()
+
+
+def procurar_identidade(tipo, valor):
+    """Inscrição com a identidade indicada (uma consulta indexada)"""
+    from .models import IdentidadeInscricao
+    valor = normalizar(tipo, valor)
+    if not valor:
+        return None
+    encontradas = IdentidadeInscricao.objects.filter(tipo=tipo, valor=valor)
+    return encontradas.select_related('inscricao').only(
+        'inscricao', 'inscricao__id', 'inscricao__primeiro_nome', 'inscricao__nomes_meio', 'inscricao__apelido'
+    ).first()
+
+
+def reconstruir_identidades():
+    """Refaz o registo completo a partir das inscrições; devolve o número de linhas criadas"""
+    from .models import IdentidadeInscricao, Inscricao
+    linhas = [
+        IdentidadeInscricao(inscricao_id=pk, tipo=tipo, valor=valor)
+        for pk, *campos in Inscricao.objects.values_list('pk', *CAMPOS_IDENTIDADE).iterator()
+        for tipo, valor in identidades_de_valores(*campos)
+    ]
+    with transaction.atomic():
+        IdentidadeInscricao.objects.all().delete()
+        return len(IdentidadeInscricao.objects.bulk_create(linhas, batch_size=500))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.comprovativos import escrever_zip_comprovativos
+from core.contexto import configuracao_escola
+from core.models import Curso, Inscricao
+
+
+class Command(BaseCommand):
+    help = "Gera num ZIP os comprovativos de inscrição de todos os inscritos de um curso"
+
+    def add_arguments(self, parser):
+        parser.add_argument('curso', help="Código do curso")
+        parser.add_argument('saida', help="Caminho do ficheiro ZIP a criar")
+        parser.add_argument('--ano', type=int, help="ID do ano académico. Por omissão, todos.")
+        parser.add_argument('--processos', type=int, help="Processos em paralelo (por omissão COMPROVATIVOS_PROCESSOS ou um por CPU)")
+        parser.add_argument('--autenticado-por', default="Secretaria", help="Nome impresso como autenticador")
+
+    def handle(self, *args, **options):
+        curso = Curso.objects.filter(codigo=options['curso']).first()
+        if curso is None:
+            raise CommandError(f"Curso não encontrado: {options['curso']}")
+
+        inscricoes = Inscricao.objects.filter(curso=curso).select_related('curso', 'ano_academico').order_by('numero_inscricao')
+        if options['ano']:
+            inscricoes = inscricoes.filter(ano_academico_id=options['ano'])
+
+        total = inscricoes.count()
+        escrever_zip_comprovativos(
+            options['saida'], inscricoes, configuracao_escola(), options['autenticado_por'], options['processos'],
+        )
+
+        self.stdout.write(self.style.SUCCESS(f"{total} comprovativo(s) de {curso.codigo} escritos em {options['saida']}."))
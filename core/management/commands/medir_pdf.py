@@ -0,0 +1,98 @@
+import os
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm
+from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from core.recursos_pdf import CAMINHO_LOGO, ESTILOS, LOGO_LADO_MAXIMO_PX, TABELAS, documento_pdf, imagem_logo
+
+LINHAS = [
+    ("Candidato", "Maria da Conceição Fernandes"),
+    ("Curso", "Engenharia Informática"),
+    ("Inscrição Nº", "INS-2026-000123"),
+    ("Data", "18/10/2026"),
+    ("BI", "001234567LA041"),
+    ("Valor Pago", "5.000,00 Kz"),
+]
+
+
+def _logo_reduzido():
+    """O mesmo logótipo reduzido usado por core.recursos_pdf, como PNG (None se não existir)"""
+    if not os.path.exists(CAMINHO_LOGO):
+        return None
+    from PIL import Image as ImagemPIL
+    imagem = ImagemPIL.open(CAMINHO_LOGO)
+    imagem.thumbnail((LOGO_LADO_MAXIMO_PX, LOGO_LADO_MAXIMO_PX))
+    png = BytesIO()
+    imagem.save(png, 'PNG')
+    return png.getvalue()
+
+
+def _comprovativo_antigo(buffer, logo_png):
+    """
+    Construção anterior: estilos, estilo de tabela e logótipo recriados a cada
+    documento. O logótipo é a mesma imagem reduzida da outra variante, lida de
+    novo a cada uso: a diferença medida é só a partilha dos recursos.
+    """
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*cm, bottomMargin=1*cm, leftMargin=1.5*cm, rightMargin=1.5*cm)
+    styles = getSampleStyleSheet()
+    story = []
+    for _ in range(2):
+        title_style = ParagraphStyle('CustomTitle', parent=styles['Heading1'], fontSize=16, textColor='#1a1a1a', alignment=TA_CENTER)
+        heading_style = ParagraphStyle('CustomHeading', parent=styles['Heading2'], fontSize=12, textColor='#333333', alignment=TA_CENTER)
+        normal_style = ParagraphStyle('CustomNormal', parent=styles['Normal'], fontSize=10, textColor='#000000', alignment=TA_LEFT)
+        if logo_png:
+            story.append(Image(BytesIO(logo_png), width=3*cm, height=1.2*cm))
+        story.append(Paragraph("ESCOLA", title_style))
+        story.append(Paragraph("COMPROVATIVO DE INSCRIÇÃO", heading_style))
+        t = Table([[Paragraph(f"<b>{k}:</b> {v}", normal_style), ""] for k, v in LINHAS], colWidths=[12*cm, 4*cm])
+        t.setStyle(TableStyle([('VALIGN', (0, 0), (-1, -1), 'TOP'), ('SPAN', (1, 0), (1, 5)), ('ALIGN', (1, 0), (1, 5), 'RIGHT')]))
+        story.append(t)
+        story.append(Spacer(1, 1.5*cm))
+    doc.build(story)
+
+
+def _comprovativo_recursos(buffer):
+    """Construção com core.recursos_pdf: só as linhas de dados são criadas por documento"""
+    doc = documento_pdf(buffer, 'comprovativo')
+    story = []
+    for _ in range(2):
+        logotipo = imagem_logo(3*cm, 1.2*cm)
+        if logotipo:
+            story.append(logotipo)
+        story.append(Paragraph("ESCOLA", ESTILOS['comprovativo_titulo']))
+        story.append(Paragraph("COMPROVATIVO DE INSCRIÇÃO", ESTILOS['comprovativo_subtitulo']))
+        linhas = [[Paragraph(f"<b>{k}:</b> {v}", ESTILOS['comprovativo_normal']), ""] for k, v in LINHAS]
+        story.append(Table(linhas, colWidths=[12*cm, 4*cm], style=TABELAS['comprovativo']))
+        story.append(Spacer(1, 1.5*cm))
+    doc.build(story)
+
+
+class Command(BaseCommand):
+    help = "Mede o tempo por documento de um comprovativo gerado sem e com os recursos partilhados (core.recursos_pdf)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=50, help="Documentos gerados por variante (por omissão 50)")
+
+    def _medir(self, gerar, repeticoes):
+        gerar(BytesIO())  # aquecimento (imports, fontes, cache do logótipo)
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            gerar(BytesIO())
+        return (time.perf_counter() - inicio) / repeticoes * 1000
+
+    def handle(self, *args, **options):
+        repeticoes = options['repeticoes']
+        logo_png = _logo_reduzido()
+        antigo = self._medir(lambda buffer: _comprovativo_antigo(buffer, logo_png), repeticoes)
+        recursos = self._medir(_comprovativo_recursos, repeticoes)
+        self.stdout.write(f"Sem recursos partilhados: {antigo:.2f} ms/documento")
+        self.stdout.write(f"Com recursos partilhados: {recursos:.2f} ms/documento")
+        self.stdout.write(self.style.SUCCESS(
+            f"Poupança: {antigo - recursos:.2f} ms/documento ({(antigo - recursos) / antigo:.0%})"
+        ))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.admissao import processar_aprovacoes
+from core.models import Curso
+
+
+class Command(BaseCommand):
+    help = "Classifica os candidatos e aprova-os dentro das vagas de cada curso ativo"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--curso', action='append', dest='cursos', help="Código do curso (pode repetir). Por omissão, todos os cursos ativos.")
+        parser.add_argument('--ranking', action='store_true', help="Mostra a posição de cada candidato")
+
+    def handle(self, *args, **options):
+        cursos = None
+        if options['cursos']:
+            cursos = list(Curso.objects.filter(codigo__in=options['cursos']))
+            encontrados = {c.codigo for c in cursos}
+            em_falta = set(options['cursos']) - encontrados
+            if em_falta:
+                raise CommandError(f"Curso(s) não encontrado(s): {', '.join(sorted(em_falta))}")
+
+        resultado = processar_aprovacoes(cursos)
+
+        for resumo in resultado.values():
+            curso = resumo['curso']
+            self.stdout.write(
+                f"{curso.codigo} - {curso.nome}: {resumo['aprovados']}/{curso.vagas} vagas preenchidas, "
+                f"{resumo['classificados']} classificados, {resumo['sem_nota']} sem nota"
+            )
+            if options['ranking']:
+                for linha in resumo['ranking']:
+                    posicao = f"{linha['posicao']}º" if linha['posicao'] else '-'
+                    estado = 'APROVADO' if linha['aprovado'] else ''
+                    nota = linha['nota_teste'] if linha['nota_teste'] is not None else '-'
+                    self.stdout.write(f"  {posicao:>5} {linha['numero_inscricao']} {nota} {estado}")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(resultado)} curso(s) processado(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core.contadores import recalcular_contadores
+
+
+class Command(BaseCommand):
+    help = "Recalcula os contadores de inscritos, aprovados e matriculados de cada curso e corrige divergências"
+
+    def handle(self, *args, **options):
+        corrigidos = recalcular_contadores()
+        for curso, divergencias in corrigidos:
+            detalhes = ', '.join(f"{campo}: {antes} -> {depois}" for campo, (antes, depois) in divergencias.items())
+            self.stdout.write(f"{curso.codigo} - {curso.nome}: {detalhes}")
+        self.stdout.write(self.style.SUCCESS(f"{len(corrigidos)} curso(s) corrigido(s)."))
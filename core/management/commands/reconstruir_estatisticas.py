@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.estatisticas import reconstruir_estatisticas
+from core.models import Curso
+
+
+class Command(BaseCommand):
+    help = "Reconstrói do zero as estatísticas pré-agregadas de inscrições (por ano académico, curso e dia)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--curso', action='append', dest='cursos', help="Código do curso (pode repetir). Por omissão, todos os cursos.")
+
+    def handle(self, *args, **options):
+        cursos = None
+        if options['cursos']:
+            cursos = list(Curso.objects.filter(codigo__in=options['cursos']))
+            em_falta = set(options['cursos']) - {c.codigo for c in cursos}
+            if em_falta:
+                raise CommandError(f"Curso(s) não encontrado(s): {', '.join(sorted(em_falta))}")
+
+        criadas = reconstruir_estatisticas(cursos)
+        self.stdout.write(self.style.SUCCESS(f"{criadas} linha(s) de estatísticas criada(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.identidades import reconstruir_identidades
+
+
+class Command(BaseCommand):
+    help = "Reconstrói do zero o registo de identidades das inscrições (BI, email, telefone e nome normalizados)"
+
+    def handle(self, *args, **options):
+        criadas = reconstruir_identidades()
+        self.stdout.write(self.style.SUCCESS(f"{criadas} identidade(s) registada(s)."))
@@ -0,0 +1,48 @@
+import signal
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.agendador import REGISTO, executar_agendador, executar_devidas
+
+
+class Command(BaseCommand):
+    help = "Executa as tarefas periódicas de manutenção (core.agendador) até receber SIGINT/SIGTERM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=getattr(settings, 'AGENDADOR_INTERVALO', 30),
+                            help="Segundos entre verificações das tarefas devidas")
+        parser.add_argument('--uma-vez', action='store_true',
+                            help="Executa as tarefas devidas uma vez e termina (ex: cron, testes)")
+        parser.add_argument('--executar', nargs='+', metavar='TAREFA', choices=sorted(REGISTO),
+                            help="Executa já as tarefas indicadas, fora do horário, e termina")
+
+    def _relatar(self, executadas):
+        for nome, sucesso in executadas.items():
+            if sucesso:
+                self.stdout.write(self.style.SUCCESS(f"{nome}: concluída"))
+            else:
+                self.stdout.write(self.style.ERROR(f"{nome}: falhou (ver ExecucaoAgendada.ultimo_erro)"))
+
+    def handle(self, *args, **options):
+        if options['executar'] or options['uma_vez']:
+            forcar = options['executar'] or ()
+            executadas = executar_devidas(forcar=forcar)
+            self._relatar(executadas)
+            em_falta = set(forcar) - set(executadas)
+            if em_falta:
+                raise CommandError(f"Em execução noutro nó: {', '.join(sorted(em_falta))}")
+            return
+
+        parar = threading.Event()
+
+        def terminar(*_):
+            parar.set()
+        signal.signal(signal.SIGTERM, terminar)
+        signal.signal(signal.SIGINT, terminar)
+
+        self.stdout.write(f"Agendador iniciado ({', '.join(REGISTO)}).")
+        # A tarefa em curso termina antes de sair
+        executar_agendador(parar=parar, intervalo=options['intervalo'], ao_executar=self._relatar)
+        self.stdout.write(self.style.SUCCESS("Agendador terminado."))
@@ -0,0 +1,59 @@
+import multiprocessing
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.tarefas import executar_worker
+
+
+def _processo_worker(indice, parar, intervalo):
+    # Com 'spawn' o processo começa sem o Django configurado
+    import django
+    from django.apps import apps
+    if not apps.ready:
+        django.setup()
+    # Ctrl+C chega a todo o grupo de processos: quem decide parar é o processo principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    executar_worker(indice, parar=parar, intervalo=intervalo)
+
+
+class Command(BaseCommand):
+    help = "Executa as tarefas em segundo plano (core.tarefas) em N processos até receber SIGINT/SIGTERM"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processos', type=int, default=getattr(settings, 'TAREFAS_PROCESSOS', 2),
+                            help="Número de processos worker (por omissão TAREFAS_PROCESSOS)")
+        parser.add_argument('--intervalo', type=float, default=getattr(settings, 'TAREFAS_INTERVALO', 1),
+                            help="Segundos entre consultas quando a fila está vazia")
+        parser.add_argument('--ate-esvaziar', action='store_true',
+                            help="Executa as tarefas disponíveis neste processo e termina (ex: cron, testes)")
+
+    def handle(self, *args, **options):
+        if options['ate_esvaziar']:
+            executadas = executar_worker(intervalo=options['intervalo'], ate_esvaziar=True)
+            self.stdout.write(self.style.SUCCESS(f"{executadas} tarefa(s) executada(s)."))
+            return
+
+        # Os processos filhos abrem as suas próprias ligações
+        connections.close_all()
+        parar = multiprocessing.Event()
+        processos = [
+            multiprocessing.Process(target=_processo_worker, args=(i, parar, options['intervalo']), name=f"worker-{i}")
+            for i in range(options['processos'])
+        ]
+        for processo in processos:
+            processo.start()
+        self.stdout.write(f"{len(processos)} worker(s) iniciado(s).")
+
+        def terminar(*_):
+            parar.set()
+        signal.signal(signal.SIGTERM, terminar)
+        signal.signal(signal.SIGINT, terminar)
+
+        # Cada worker termina a tarefa em curso antes de sair
+        for processo in processos:
+            while processo.is_alive():
+                processo.join(timeout=1)
+        self.stdout.write(self.style.SUCCESS("Workers terminados."))
@@ -0,0 +1,30 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+
+from . import coerencia
+from .contexto import ContextoAcademico
+
+
+class ContextoAcademicoMiddleware:
+    """
+    Disponibiliza o contexto académico em cache em request.academico, depois de
+    descartar as entradas alteradas por outros workers (ver core.coerencia).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        coerencia.verificar()
+        request.academico = ContextoAcademico(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        await sync_to_async(coerencia.verificar)()
+        request.academico = ContextoAcademico(request)
+        return await self.get_response(request)
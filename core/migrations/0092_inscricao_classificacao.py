@@ -0,0 +1,23 @@
+# Generated by Django 5.2.10 on 2026-10-18 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0091_horarioaula_data_atualizacao_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inscricao',
+            name='classificacao',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Classificação no Curso'),
+        ),
+        migrations.AlterField(
+            model_name='eventocalendario',
+            name='tipo_evento',
+            field=models.CharField(choices=[('INSCRICAO', 'Inscrição'), ('LISTA_INSCRITOS', 'Publicação da Lista de Inscritos'), ('EXAME_ACESSO', 'Exame de Acesso/Admissão'), ('PROVAS_ADMISSAO', 'Realização das Provas de Admissão'), ('CONSULTA_INDIVIDUAL', 'Consultas da Lista Individual'), ('RESULTADOS_ADMISSAO', 'Publicação de Resultados (Admissão)'), ('MATRICULA', 'Matrícula'), ('PROVA_PARCELAR_1', '1ª Prova Parcelar'), ('PROVA_PARCELAR_2', '2ª Prova Parcelar'), ('EXAME', 'Exame'), ('RECURSO', 'Recurso'), ('EXAME_ESPECIAL', 'Exame Especial/Época Especial'), ('PUBLICACAO_LISTAS', 'Publicação de Inscrição das Listas dos Inscritos'), ('REALIZACAO_PROVAS', 'Realização das Provas de Admissão'), ('CONSULTA_LISTA', 'Consultas da Lista Individual'), ('PUBL_PAUTA', 'Publicação da Pauta dos Resultados'), ('FERIAS', 'Férias'), ('OUTRO', 'Outro')], max_length=20, verbose_name='Tipo de Evento'),
+        ),
+    ]
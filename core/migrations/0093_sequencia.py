@@ -0,0 +1,26 @@
+# Generated by Django 5.2.10 on 2026-10-18 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0092_inscricao_classificacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True, verbose_name='Sequência')),
+                ('valor', models.PositiveBigIntegerField(default=0, verbose_name='Último Número Atribuído')),
+            ],
+            options={
+                'verbose_name': 'Sequência',
+                'verbose_name_plural': 'Sequências',
+                'ordering': ['nome'],
+            },
+        ),
+    ]
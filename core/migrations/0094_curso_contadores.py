@@ -0,0 +1,42 @@
+# Generated by Django 5.2.10 on 2026-10-18 12:54
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def preencher_contadores(apps, schema_editor):
+    Curso = apps.get_model('core', 'Curso')
+    Inscricao = apps.get_model('core', 'Inscricao')
+    totais = Inscricao.objects.values('curso_id').annotate(
+        total_inscritos=Count('id'),
+        total_aprovados=Count('id', filter=Q(aprovado=True)),
+        total_matriculados=Count('id', filter=Q(status='Matriculado')),
+    ).order_by()
+    for linha in totais:
+        Curso.objects.filter(pk=linha.pop('curso_id')).update(**linha)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0093_sequencia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='curso',
+            name='total_aprovados',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Aprovados'),
+        ),
+        migrations.AddField(
+            model_name='curso',
+            name='total_inscritos',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Inscritos'),
+        ),
+        migrations.AddField(
+            model_name='curso',
+            name='total_matriculados',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Total de Matriculados'),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.10 on 2026-10-18 12:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def preencher_estatisticas(apps, schema_editor):
+    EstatisticaInscricoes = apps.get_model('core', 'EstatisticaInscricoes')
+    Inscricao = apps.get_model('core', 'Inscricao')
+    linhas = Inscricao.objects.annotate(dia=TruncDate('data_inscricao')).values(
+        'ano_academico_id', 'curso_id', 'dia'
+    ).annotate(
+        inscritos=Count('id'),
+        aprovados=Count('id', filter=Q(aprovado=True)),
+        reprovados=Count('id', filter=Q(aprovado=False, nota_teste__isnull=False)),
+        sem_nota=Count('id', filter=Q(nota_teste__isnull=True)),
+        matriculados=Count('id', filter=Q(status='Matriculado')),
+    ).order_by()
+    EstatisticaInscricoes.objects.bulk_create(
+        [EstatisticaInscricoes(**linha) for linha in linhas], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0094_curso_contadores'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstatisticaInscricoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dia', models.DateField(verbose_name='Dia')),
+                ('inscritos', models.IntegerField(default=0, verbose_name='Inscritos')),
+                ('aprovados', models.IntegerField(default=0, verbose_name='Aprovados')),
+                ('reprovados', models.IntegerField(default=0, verbose_name='Reprovados')),
+                ('sem_nota', models.IntegerField(default=0, verbose_name='Aguardando Nota')),
+                ('matriculados', models.IntegerField(default=0, verbose_name='Matriculados')),
+                ('ano_academico', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='estatisticas_inscricoes', to='core.anoacademico', verbose_name='Ano Académico')),
+                ('curso', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estatisticas_inscricoes', to='core.curso', verbose_name='Curso')),
+            ],
+            options={
+                'verbose_name': 'Estatística de Inscrições',
+                'verbose_name_plural': 'Estatísticas de Inscrições',
+                'ordering': ['-dia'],
+                'indexes': [models.Index(fields=['dia'], name='core_estati_dia_2b3957_idx')],
+                'unique_together': {('ano_academico', 'curso', 'dia')},
+            },
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
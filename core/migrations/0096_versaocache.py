@@ -0,0 +1,26 @@
+# Generated by Django 5.2.10 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0095_estatisticainscricoes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersaoCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=100, unique=True, verbose_name='Espaço de Cache')),
+                ('versao', models.PositiveBigIntegerField(default=0, verbose_name='Versão')),
+            ],
+            options={
+                'verbose_name': 'Versão de Cache',
+                'verbose_name_plural': 'Versões de Cache',
+                'ordering': ['namespace'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.10 on 2026-10-18 13:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0096_versaocache'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaixaNotificacoes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nao_lidas', models.PositiveIntegerField(default=0, verbose_name='Notificações Dirigidas Não Lidas')),
+                ('lidas_ate', models.PositiveBigIntegerField(default=0, verbose_name='Lidas Até (ID)')),
+                ('globais_lidas', models.PositiveIntegerField(default=0, verbose_name='Notificações Globais Lidas Acima da Marca')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='caixa_notificacoes', to=settings.AUTH_USER_MODEL, verbose_name='Utilizador')),
+            ],
+            options={
+                'verbose_name': 'Caixa de Notificações',
+                'verbose_name_plural': 'Caixas de Notificações',
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.10 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0097_caixanotificacoes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacao',
+            name='publico_curso',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to='core.curso', verbose_name='Público: Curso'),
+        ),
+        migrations.AddField(
+            model_name='notificacao',
+            name='publico_grupo',
+            field=models.CharField(blank=True, choices=[('todos', 'Todos'), ('inscritos', 'Inscritos (Candidatos)'), ('admitidos', 'Admitidos'), ('estudantes_antigos', 'Estudantes Antigos (Ativos)')], default='', max_length=20, verbose_name='Público: Estado da Inscrição'),
+        ),
+        migrations.AddField(
+            model_name='notificacao',
+            name='publico_nivel_acesso',
+            field=models.CharField(blank=True, default='', help_text='Se definido, a notificação é vista por todos os utilizadores com este nível de acesso que cumpram os restantes critérios', max_length=20, verbose_name='Público: Nível de Acesso'),
+        ),
+        migrations.AddField(
+            model_name='notificacao',
+            name='publico_turma',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificacoes', to='core.turma', verbose_name='Público: Turma'),
+        ),
+    ]
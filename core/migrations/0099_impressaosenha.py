@@ -0,0 +1,29 @@
+# Generated by Django 5.2.10 on 2026-10-18 13:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0098_notificacao_publico'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImpressaoSenha',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('impressao', models.CharField(db_index=True, max_length=64, verbose_name='Impressão da Senha')),
+                ('data_atualizacao', models.DateTimeField(auto_now=True, verbose_name='Data de Atualização')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='impressao_senha', to=settings.AUTH_USER_MODEL, verbose_name='Utilizador')),
+            ],
+            options={
+                'verbose_name': 'Impressão de Senha',
+                'verbose_name_plural': 'Impressões de Senhas',
+            },
+        ),
+    ]
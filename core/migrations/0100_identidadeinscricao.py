@@ -0,0 +1,64 @@
+# Generated by Django 5.2.10 on 2026-10-18 13:12
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Normalização copiada de core.identidades tal como estava quando a migração
+# foi criada: a migração não deve mudar se o módulo da aplicação mudar.
+
+
+def _telefone(valor):
+    digitos = re.sub(r'\D', '', valor)
+    if len(digitos) > 9 and digitos.lstrip('0').startswith('244'):
+        digitos = digitos.lstrip('0')[3:]
+    return digitos
+
+
+def _identidades(bilhete_identidade, email, telefone):
+    pares = {
+        ('bi', re.sub(r'[\s\-.]', '', bilhete_identidade or '').upper()[:255]),
+        ('email', (email or '').strip().lower()[:255]),
+        ('telefone', _telefone(telefone or '')[:255]),
+    }
+    return [par for par in pares if par[1]]
+
+
+def preencher_identidades(apps, schema_editor):
+    IdentidadeInscricao = apps.get_model('core', 'IdentidadeInscricao')
+    Inscricao = apps.get_model('core', 'Inscricao')
+    campos = ('bilhete_identidade', 'email', 'telefone')
+    IdentidadeInscricao.objects.bulk_create(
+        [
+            IdentidadeInscricao(inscricao_id=pk, tipo=tipo, valor=valor)
+            for pk, *valores in Inscricao.objects.values_list('pk', *campos).iterator()
+            for tipo, valor in _identidades(*valores)
+        ],
+        batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0099_impressaosenha'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdentidadeInscricao',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('bi', 'Bilhete de Identidade'), ('email', 'Email'), ('telefone', 'Telefone'), ('nome', 'Nome Completo')], max_length=10, verbose_name='Tipo')),
+                ('valor', models.CharField(max_length=255, verbose_name='Valor Normalizado')),
+                ('inscricao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='identidades', to='core.inscricao', verbose_name='Inscrição')),
+            ],
+            options={
+                'verbose_name': 'Identidade de Inscrição',
+                'verbose_name_plural': 'Identidades de Inscrições',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'valor', 'inscricao'), name='identidade_inscricao_unica')],
+            },
+        ),
+        migrations.RunPython(preencher_identidades, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.10 on 2026-10-18 13:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0100_identidadeinscricao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarefa',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=100, verbose_name='Tipo')),
+                ('argumentos', models.JSONField(blank=True, default=dict, verbose_name='Argumentos')),
+                ('estado', models.CharField(choices=[('pendente', 'Pendente'), ('em_execucao', 'Em Execução'), ('concluida', 'Concluída'), ('falhada', 'Falhada')], default='pendente', max_length=20, verbose_name='Estado')),
+                ('prioridade', models.IntegerField(default=0, verbose_name='Prioridade')),
+                ('tentativas', models.PositiveIntegerField(default=0, verbose_name='Tentativas')),
+                ('max_tentativas', models.PositiveIntegerField(default=3, verbose_name='Máximo de Tentativas')),
+                ('executar_apos', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Executar Após')),
+                ('reservada_por', models.CharField(blank=True, max_length=100, verbose_name='Worker')),
+                ('reservada_em', models.DateTimeField(blank=True, null=True, verbose_name='Reservada Em')),
+                ('resultado', models.JSONField(blank=True, null=True, verbose_name='Resultado')),
+                ('erro', models.TextField(blank=True, verbose_name='Último Erro')),
+                ('data_criacao', models.DateTimeField(auto_now_add=True, verbose_name='Data de Criação')),
+                ('data_conclusao', models.DateTimeField(blank=True, null=True, verbose_name='Data de Conclusão')),
+                ('criado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tarefas', to=settings.AUTH_USER_MODEL, verbose_name='Criada Por')),
+            ],
+            options={
+                'verbose_name': 'Tarefa em Segundo Plano',
+                'verbose_name_plural': 'Tarefas em Segundo Plano',
+                'ordering': ['-data_criacao'],
+                'indexes': [models.Index(fields=['estado', 'prioridade', 'executar_apos'], name='core_tarefa_estado_19dfff_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.10 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0101_tarefa'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExecucaoAgendada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True, verbose_name='Tarefa')),
+                ('horario', models.CharField(max_length=100, verbose_name='Horário (cron)')),
+                ('proxima_execucao', models.DateTimeField(verbose_name='Próxima Execução')),
+                ('bloqueado_por', models.CharField(blank=True, max_length=100, verbose_name='Em Execução Por')),
+                ('bloqueado_ate', models.DateTimeField(blank=True, null=True, verbose_name='Bloqueado Até')),
+                ('ultima_execucao', models.DateTimeField(blank=True, null=True, verbose_name='Última Execução')),
+                ('ultima_duracao', models.FloatField(blank=True, null=True, verbose_name='Duração (s)')),
+                ('ultimo_resultado', models.JSONField(blank=True, null=True, verbose_name='Último Resultado')),
+                ('ultimo_erro', models.TextField(blank=True, verbose_name='Último Erro')),
+            ],
+            options={
+                'verbose_name': 'Execução Agendada',
+                'verbose_name_plural': 'Execuções Agendadas',
+                'ordering': ['nome'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def preencher_ativos(apps, schema_editor):
+    EstatisticaInscricoes = apps.get_model('core', 'EstatisticaInscricoes')
+    Inscricao = apps.get_model('core', 'Inscricao')
+    linhas = Inscricao.objects.filter(
+        aprovado=True, status='Matriculado', status_inscricao='ativo'
+    ).annotate(dia=TruncDate('data_inscricao')).values(
+        'ano_academico_id', 'curso_id', 'dia'
+    ).annotate(ativos=Count('id')).order_by()
+    for linha in linhas:
+        EstatisticaInscricoes.objects.filter(
+            ano_academico_id=linha['ano_academico_id'], curso_id=linha['curso_id'], dia=linha['dia']
+        ).update(ativos=linha['ativos'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0102_execucaoagendada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estatisticainscricoes',
+            name='ativos',
+            field=models.IntegerField(default=0, verbose_name='Ativos'),
+        ),
+        migrations.RunPython(preencher_ativos, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.10 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+METRICAS = ('inscritos', 'aprovados', 'reprovados', 'sem_nota', 'matriculados', 'ativos')
+
+
+def juntar_linhas_sem_ano(apps, schema_editor):
+    """Junta numa só as linhas sem ano duplicadas (mesmo curso e dia) antes de criar a restrição"""
+    EstatisticaInscricoes = apps.get_model('core', 'EstatisticaInscricoes')
+    primeiras = {}
+    for linha in EstatisticaInscricoes.objects.filter(ano_academico__isnull=True).order_by('id'):
+        chave = (linha.curso_id, linha.dia)
+        primeira = primeiras.setdefault(chave, linha)
+        if primeira is linha:
+            continue
+        for metrica in METRICAS:
+            setattr(primeira, metrica, getattr(primeira, metrica) + getattr(linha, metrica))
+        primeira.save(update_fields=METRICAS)
+        linha.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0103_estatisticainscricoes_ativos'),
+    ]
+
+    operations = [
+        migrations.RunPython(juntar_linhas_sem_ano, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='estatisticainscricoes',
+            constraint=models.UniqueConstraint(condition=models.Q(('ano_academico__isnull', True)), fields=('curso', 'dia'), name='estatistica_inscricoes_sem_ano_unica'),
+        ),
+    ]
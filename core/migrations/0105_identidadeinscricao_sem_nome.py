@@ -0,0 +1,25 @@
+# Generated by Django 5.2.10 on 2026-10-18 14:11
+
+from django.db import migrations, models
+
+
+def apagar_nomes(apps, schema_editor):
+    # O nome deixou de fazer parte do registo de identidades (ninguém o consultava)
+    IdentidadeInscricao = apps.get_model('core', 'IdentidadeInscricao')
+    IdentidadeInscricao.objects.filter(tipo='nome').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0104_estatisticainscricoes_sem_ano_unica'),
+    ]
+
+    operations = [
+        migrations.RunPython(apagar_nomes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='identidadeinscricao',
+            name='tipo',
+            field=models.CharField(choices=[('bi', 'Bilhete de Identidade'), ('email', 'Email'), ('telefone', 'Telefone')], max_length=10, verbose_name='Tipo'),
+        ),
+    ]
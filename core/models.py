@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
@@ -224,6 +224,18 @@ class Notificacao(models.Model):
     lida_por = models.ManyToManyField(User, related_name='notificacoes_lidas', blank=True)
     ativa = models.BooleanField(default=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
+
+    # Público-alvo: resolvido no momento da leitura, sem uma linha por destinatário (ver core.notificacoes)
+    PUBLICO_GRUPO_CHOICES = [
+        ('todos', 'Todos'),
+        ('inscritos', 'Inscritos (Candidatos)'),
+        ('admitidos', 'Admitidos'),
+        ('estudantes_antigos', 'Estudantes Antigos (Ativos)'),
+    ]
+    publico_nivel_acesso = models.CharField(max_length=20, blank=True, default='', verbose_name="Público: Nível de Acesso", help_text="Se definido, a notificação é vista por todos os utilizadores com este nível de acesso que cumpram os restantes critérios")
+    publico_grupo = models.CharField(max_length=20, choices=PUBLICO_GRUPO_CHOICES, blank=True, default='', verbose_name="Público: Estado da Inscrição")
+    publico_curso = models.ForeignKey('Curso', on_delete=models.CASCADE, null=True, blank=True, related_name='notificacoes', verbose_name="Público: Curso")
+    publico_turma = models.ForeignKey('Turma', on_delete=models.CASCADE, null=True, blank=True, related_name='notificacoes', verbose_name="Público: Turma")
     
     class Meta:
         verbose_name = "Notificação"
@@ -233,6 +245,10 @@ class Notificacao(models.Model):
     def __str__(self):
         return self.titulo
 
+    def marcar_como_lida(self, user):
+        from .notificacoes import marcar_como_lida
+        return marcar_como_lida(self, user)
+
 class Subscricao(models.Model):
     ESTADO_CHOICES = [
         ('ativo', 'Ativo'),
@@ -352,6 +368,20 @@ class Documento(models.Model):
         # Implementação futura para controle de versões
         return []
     
+    def clean(self):
+        from .documentos import validar_conteudo
+        validar_conteudo(self.conteudo)
+    
+    def renderizar(self, dados):
+        """Conteúdo com as variáveis preenchidas a partir de `dados` (modelo compilado em cache)"""
+        from .documentos import compilar
+        return compilar(self).renderizar(dados)
+    
+    def renderizar_lote(self, lista_dados):
+        """Renderiza o modelo para cada dicionário de `lista_dados`, compilando-o uma só vez"""
+        from .documentos import compilar
+        return compilar(self).renderizar_lote(lista_dados)
+    
     @classmethod
     def obter_variaveis_disponiveis(cls, *args, **kwargs):
         return {
@@ -559,6 +589,11 @@ class Curso(models.Model):
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
     
+    # Contadores mantidos por Inscricao.save/delete (ver core.contadores)
+    total_inscritos = models.PositiveIntegerField(default=0, editable=False, verbose_name="Total de Inscritos")
+    total_aprovados = models.PositiveIntegerField(default=0, editable=False, verbose_name="Total de Aprovados")
+    total_matriculados = models.PositiveIntegerField(default=0, editable=False, verbose_name="Total de Matriculados")
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             from django.utils.text import slugify
@@ -580,14 +615,19 @@ class Curso(models.Model):
             self.slug = slugify(self.nome)
             if Curso.objects.filter(slug=self.slug).exists():
                 self.slug = f"{self.slug}-{uuid.uuid4().hex[:6]}"
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            # Os contadores são atualizados diretamente na base; não os sobrescrever
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in ('total_inscritos', 'total_aprovados', 'total_matriculados')
+            ]
         super().save(*args, **kwargs)
     
     def vagas_disponiveis(self):
-        aprovados = self.inscricoes.filter(aprovado=True).count()
-        return max(0, self.vagas - aprovados)
+        return max(0, self.vagas - self.total_aprovados)
     
     def total_inscricoes(self):
-        return self.inscricoes.count()
+        return self.total_inscritos
     
     def get_duracao_display_full(self):
         return f"{self.get_duracao_meses_display()}"
@@ -1013,6 +1053,7 @@ class Inscricao(models.Model):
     )
     
     aprovado = models.BooleanField(default=False, verbose_name="Aprovado")
+    classificacao = models.PositiveIntegerField(null=True, blank=True, verbose_name="Classificação no Curso")
     data_inscricao = models.DateTimeField(auto_now_add=True, verbose_name="Data de Inscrição")
     data_resultado = models.DateTimeField(null=True, blank=True, verbose_name="Data do Resultado")
     
@@ -1030,18 +1071,82 @@ class Inscricao(models.Model):
     def __str__(self):
         return f"{self.numero_inscricao} - {self.nome_completo}"
     
-    def save(self, *args, **kwargs):
-        if not self.numero_inscricao:
-            ultimo = Inscricao.objects.order_by('-id').first()
-            if ultimo:
-                try:
-                    numero = int(ultimo.numero_inscricao.split('-')[1]) + 1
-                except:
-                    numero = 1
+    # Campos que determinam os contadores do curso (ver core.contadores); os
+    # restantes definem a linha das estatísticas pré-agregadas (ver core.estatisticas)
+    CAMPOS_CONTADORES = ('curso_id', 'aprovado', 'status')
+    CAMPOS_ESTADO = CAMPOS_CONTADORES + ('ano_academico_id', 'nota_teste', 'data_inscricao', 'status_inscricao')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        from .identidades import CAMPOS_IDENTIDADE
+        instance = super().from_db(db, field_names, values)
+        instance._estado_original = instance._valores_estado()
+        if all(campo in instance.__dict__ for campo in CAMPOS_IDENTIDADE):
+            instance._identidades_originais = instance._identidades()
+        return instance
+
+    def _identidades(self):
+        from .identidades import CAMPOS_IDENTIDADE, identidades_de_valores
+        return identidades_de_valores(*(getattr(self, campo) for campo in CAMPOS_IDENTIDADE))
+
+    def _valores_estado(self, base=None, update_fields=None):
+        """Valores atuais dos campos de estado; os diferidos ou não gravados vêm de `base`"""
+        valores = []
+        for i, campo in enumerate(self.CAMPOS_ESTADO):
+            gravado = update_fields is None or campo in update_fields or campo.removesuffix('_id') in update_fields
+            if campo in self.__dict__ and gravado:
+                valores.append(self.__dict__[campo])
+            elif base is not None:
+                valores.append(base[i])
             else:
-                numero = 1
-            self.numero_inscricao = f"INS-{numero:06d}"
-        super().save(*args, **kwargs)
+                return None
+        return tuple(valores)
+
+    def save(self, *args, validar_vagas=False, **kwargs):
+        """Grava a inscrição e atualiza os contadores do curso e as estatísticas na mesma transação.
+
+        Com validar_vagas=True, lança VagasEsgotadas se a inscrição ou matrícula
+        exceder as vagas do curso. O registo de identidades (core.identidades)
+        é sincronizado quando BI, email ou telefone mudam.
+        """
+        from .contadores import aplicar_transicao
+        from .estatisticas import registar_transicao
+        from .identidades import CAMPOS_IDENTIDADE, identidades_de_valores, sincronizar_identidades
+        if not self.numero_inscricao:
+            from .sequencias import gerar_codigo
+            self.numero_inscricao = gerar_codigo('inscricao')
+        update_fields = kwargs.get('update_fields')
+        with transaction.atomic():
+            criada = self._state.adding
+            anterior = None
+            if not self._state.adding:
+                anterior = getattr(self, '_estado_original', None)
+                if anterior is None:
+                    anterior = Inscricao.objects.filter(pk=self.pk).values_list(*self.CAMPOS_ESTADO).first()
+            atual = self._valores_estado(base=anterior, update_fields=update_fields)
+            aplicar_transicao(
+                anterior and anterior[:len(self.CAMPOS_CONTADORES)],
+                atual[:len(self.CAMPOS_CONTADORES)],
+                validar_vagas=validar_vagas,
+            )
+            super().save(*args, **kwargs)
+            # data_inscricao só fica definida no INSERT (auto_now_add)
+            atual = self._valores_estado(base=anterior, update_fields=update_fields)
+            registar_transicao(anterior, atual)
+
+            if update_fields is None or not set(update_fields).isdisjoint(CAMPOS_IDENTIDADE):
+                if update_fields is None:
+                    identidades = self._identidades()
+                else:
+                    # Gravação parcial: os restantes campos em memória podem não coincidir com a base de dados
+                    identidades = identidades_de_valores(
+                        *Inscricao.objects.filter(pk=self.pk).values_list(*CAMPOS_IDENTIDADE).get()
+                    )
+                anteriores = frozenset() if criada else getattr(self, '_identidades_originais', None)
+                if identidades != anteriores:
+                    sincronizar_identidades(self, identidades, anteriores)
+                self._identidades_originais = identidades
+        self._estado_original = atual
     
     def calcular_idade(self):
         """Calcula a idade do estudante"""
@@ -1232,16 +1337,8 @@ class Professor(models.Model):
 
     def save(self, *args, **kwargs):
         if not self.codigo_professor:
-            ano = timezone.now().year
-            ultimo = Professor.objects.filter(codigo_professor__contains=f"PROF/{ano}/").order_by('-id').first()
-            if ultimo:
-                try:
-                    numero = int(ultimo.codigo_professor.split('/')[-1]) + 1
-                except:
-                    numero = 1
-            else:
-                numero = 1
-            self.codigo_professor = f"PROF/{ano}/{numero:04d}"
+            from .sequencias import gerar_codigo
+            self.codigo_professor = gerar_codigo('professor', ano=timezone.now().year)
         super().save(*args, **kwargs)
 
 class ProfessorDisciplina(models.Model):
@@ -1280,15 +1377,8 @@ class Aluno(models.Model):
     
     def save(self, *args, **kwargs):
         if not self.numero_estudante:
-            ultimo = Aluno.objects.order_by('-id').first()
-            if ultimo and ultimo.numero_estudante:
-                try:
-                    numero = int(ultimo.numero_estudante.split('-')[1]) + 1
-                except:
-                    numero = 1
-            else:
-                numero = 1
-            self.numero_estudante = f"ALU-{numero:06d}"
+            from .sequencias import gerar_codigo
+            self.numero_estudante = gerar_codigo('estudante')
         super().save(*args, **kwargs)
 
 class NotaEstudante(models.Model):
@@ -1322,3 +1412,181 @@ class Pai(models.Model):
     
     def __str__(self):
         return self.nome_completo
+
+class Sequencia(models.Model):
+    """Contador usado para gerar números sequenciais (inscrições, estudantes, professores)"""
+    nome = models.CharField(max_length=100, unique=True, verbose_name="Sequência")
+    valor = models.PositiveBigIntegerField(default=0, verbose_name="Último Número Atribuído")
+
+    class Meta:
+        verbose_name = "Sequência"
+        verbose_name_plural = "Sequências"
+        ordering = ['nome']
+
+    def __str__(self):
+        return f"{self.nome}: {self.valor}"
+
+
+class EstatisticaInscricoes(models.Model):
+    """Totais pré-agregados de inscrições por ano académico, curso e dia de inscrição (ver core.estatisticas)"""
+    ano_academico = models.ForeignKey(AnoAcademico, on_delete=models.SET_NULL, null=True, blank=True, related_name='estatisticas_inscricoes', verbose_name="Ano Académico")
+    curso = models.ForeignKey(Curso, on_delete=models.CASCADE, related_name='estatisticas_inscricoes', verbose_name="Curso")
+    dia = models.DateField(verbose_name="Dia")
+    inscritos = models.IntegerField(default=0, verbose_name="Inscritos")
+    aprovados = models.IntegerField(default=0, verbose_name="Aprovados")
+    reprovados = models.IntegerField(default=0, verbose_name="Reprovados")
+    sem_nota = models.IntegerField(default=0, verbose_name="Aguardando Nota")
+    matriculados = models.IntegerField(default=0, verbose_name="Matriculados")
+    ativos = models.IntegerField(default=0, verbose_name="Ativos")
+
+    class Meta:
+        verbose_name = "Estatística de Inscrições"
+        verbose_name_plural = "Estatísticas de Inscrições"
+        ordering = ['-dia']
+        unique_together = ['ano_academico', 'curso', 'dia']
+        # NULL nunca colide no unique_together: as linhas sem ano têm a sua própria restrição
+        constraints = [
+            models.UniqueConstraint(
+                fields=['curso', 'dia'], condition=models.Q(ano_academico__isnull=True),
+                name='estatistica_inscricoes_sem_ano_unica',
+            ),
+        ]
+        indexes = [models.Index(fields=['dia'])]
+
+    def __str__(self):
+        return f"{self.curso} - {self.dia}: {self.inscritos} inscritos"
+
+
+class VersaoCache(models.Model):
+    """Versão de um espaço de cache local; incrementada quando os dados mudam (ver core.coerencia)"""
+    namespace = models.CharField(max_length=100, unique=True, verbose_name="Espaço de Cache")
+    versao = models.PositiveBigIntegerField(default=0, verbose_name="Versão")
+
+    class Meta:
+        verbose_name = "Versão de Cache"
+        verbose_name_plural = "Versões de Cache"
+        ordering = ['namespace']
+
+    def __str__(self):
+        return f"{self.namespace}: {self.versao}"
+
+
+class CaixaNotificacoes(models.Model):
+    """
+    Estado de leitura das notificações de um utilizador (ver core.notificacoes).
+
+    Notificações com id <= lidas_ate estão todas lidas; acima dessa marca, as
+    lidas individualmente ficam em Notificacao.lida_por.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='caixa_notificacoes', verbose_name="Utilizador")
+    nao_lidas = models.PositiveIntegerField(default=0, verbose_name="Notificações Dirigidas Não Lidas")
+    lidas_ate = models.PositiveBigIntegerField(default=0, verbose_name="Lidas Até (ID)")
+    globais_lidas = models.PositiveIntegerField(default=0, verbose_name="Notificações Globais Lidas Acima da Marca")
+
+    class Meta:
+        verbose_name = "Caixa de Notificações"
+        verbose_name_plural = "Caixas de Notificações"
+
+    def __str__(self):
+        return f"{self.user.username}: {self.nao_lidas} não lidas"
+
+
+class ImpressaoSenha(models.Model):
+    """
+    Impressão digital (HMAC com chave do servidor) da senha atual de um
+    utilizador, para verificar reutilização de senhas numa única consulta
+    indexada (ver core.senhas).
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='impressao_senha', verbose_name="Utilizador")
+    impressao = models.CharField(max_length=64, db_index=True, verbose_name="Impressão da Senha")
+    data_atualizacao = models.DateTimeField(auto_now=True, verbose_name="Data de Atualização")
+
+    class Meta:
+        verbose_name = "Impressão de Senha"
+        verbose_name_plural = "Impressões de Senhas"
+
+    def __str__(self):
+        return f"Impressão de senha de {self.user.username}"
+
+
+class IdentidadeInscricao(models.Model):
+    """Identidade normalizada de uma inscrição (BI, email ou telefone), para deteção de duplicados (ver core.identidades)"""
+    TIPO_CHOICES = [
+        ('bi', 'Bilhete de Identidade'),
+        ('email', 'Email'),
+        ('telefone', 'Telefone'),
+    ]
+
+    inscricao = models.ForeignKey(Inscricao, on_delete=models.CASCADE, related_name='identidades', verbose_name="Inscrição")
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES, verbose_name="Tipo")
+    valor = models.CharField(max_length=255, verbose_name="Valor Normalizado")
+
+    class Meta:
+        verbose_name = "Identidade de Inscrição"
+        verbose_name_plural = "Identidades de Inscrições"
+        # O índice único (tipo, valor, inscricao) serve também as pesquisas por (tipo, valor)
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'valor', 'inscricao'], name='identidade_inscricao_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()}: {self.valor}"
+
+
+class Tarefa(models.Model):
+    """Trabalho em segundo plano executado pelos workers de `manage.py run_workers` (ver core.tarefas)"""
+    ESTADO_CHOICES = [
+        ('pendente', 'Pendente'),
+        ('em_execucao', 'Em Execução'),
+        ('concluida', 'Concluída'),
+        ('falhada', 'Falhada'),
+    ]
+
+    tipo = models.CharField(max_length=100, verbose_name="Tipo")
+    argumentos = models.JSONField(default=dict, blank=True, verbose_name="Argumentos")
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendente', verbose_name="Estado")
+    prioridade = models.IntegerField(default=0, verbose_name="Prioridade")
+    tentativas = models.PositiveIntegerField(default=0, verbose_name="Tentativas")
+    max_tentativas = models.PositiveIntegerField(default=3, verbose_name="Máximo de Tentativas")
+    executar_apos = models.DateTimeField(default=timezone.now, verbose_name="Executar Após")
+    reservada_por = models.CharField(max_length=100, blank=True, verbose_name="Worker")
+    reservada_em = models.DateTimeField(null=True, blank=True, verbose_name="Reservada Em")
+    resultado = models.JSONField(null=True, blank=True, verbose_name="Resultado")
+    erro = models.TextField(blank=True, verbose_name="Último Erro")
+    criado_por = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='tarefas', verbose_name="Criada Por")
+    data_criacao = models.DateTimeField(auto_now_add=True, verbose_name="Data de Criação")
+    data_conclusao = models.DateTimeField(null=True, blank=True, verbose_name="Data de Conclusão")
+
+    class Meta:
+        verbose_name = "Tarefa em Segundo Plano"
+        verbose_name_plural = "Tarefas em Segundo Plano"
+        ordering = ['-data_criacao']
+        # Fila: pendentes por prioridade e data de execução
+        indexes = [models.Index(fields=['estado', 'prioridade', 'executar_apos'])]
+
+    def __str__(self):
+        return f"{self.tipo} #{self.pk} ({self.get_estado_display()})"
+
+
+class ExecucaoAgendada(models.Model):
+    """
+    Estado e linha de bloqueio de uma tarefa periódica de `manage.py run_scheduler`
+    (ver core.agendador): só o nó que reclama a linha executa cada ocorrência.
+    """
+    nome = models.CharField(max_length=100, unique=True, verbose_name="Tarefa")
+    horario = models.CharField(max_length=100, verbose_name="Horário (cron)")
+    proxima_execucao = models.DateTimeField(verbose_name="Próxima Execução")
+    bloqueado_por = models.CharField(max_length=100, blank=True, verbose_name="Em Execução Por")
+    bloqueado_ate = models.DateTimeField(null=True, blank=True, verbose_name="Bloqueado Até")
+    ultima_execucao = models.DateTimeField(null=True, blank=True, verbose_name="Última Execução")
+    ultima_duracao = models.FloatField(null=True, blank=True, verbose_name="Duração (s)")
+    ultimo_resultado = models.JSONField(null=True, blank=True, verbose_name="Último Resultado")
+    ultimo_erro = models.TextField(blank=True, verbose_name="Último Erro")
+
+    class Meta:
+        verbose_name = "Execução Agendada"
+        verbose_name_plural = "Execuções Agendadas"
+        ordering = ['nome']
+
+    def __str__(self):
+        return f"{self.nome} ({self.horario})"
@@ -0,0 +1,218 @@
+from bisect import bisect_right
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Exists, F, Max, OuterRef, Q
+from django.db.models.functions import Greatest
+
+from .contexto import notificacoes_globais, notificacoes_publicas
+from .models import Aluno, CaixaNotificacoes, Inscricao, Notificacao
+
+# Estado de leitura por utilizador (CaixaNotificacoes):
+#  - nao_lidas: notificações dirigidas (não globais) ativas e ainda não lidas,
+#    incrementado quando o utilizador é adicionado aos destinatários;
+#  - lidas_ate: marca de leitura; tudo o que tem id <= lidas_ate está lido,
+#    pelo que "marcar todas como lidas" é uma única escrita;
+#  - globais_lidas: notificações globais ou de público acima da marca lidas individualmente.
+# As não lidas globais obtêm-se dos ids em cache (core.contexto), sem consultas.
+#
+# Notificações de público (publico_nivel_acesso preenchido) não têm destinatários:
+# as regras ativas estão em cache e são avaliadas para cada utilizador na leitura.
+
+# Estado das inscrições de cada grupo de público (os grupos do formulário de mensagens)
+GRUPOS_PUBLICO = {
+    'inscritos': Q(status_inscricao__in=['submetida', 'pendente']),
+    'admitidos': Q(aprovado=True),
+    'estudantes_antigos': Q(status_inscricao='ativo'),
+}
+
+
+def _grupos_inscricao(status_inscricao, aprovado):
+    grupos = set()
+    if status_inscricao in ('submetida', 'pendente'):
+        grupos.add('inscritos')
+    if aprovado:
+        grupos.add('admitidos')
+    if status_inscricao == 'ativo':
+        grupos.add('estudantes_antigos')
+    return grupos
+
+
+def _publico_de(user, regras):
+    """Nível de acesso, inscrições e turmas do utilizador (só consulta o necessário para as regras)"""
+    publico = getattr(user, '_publico_notificacoes', None)
+    if publico is not None:
+        return publico
+    perfil = getattr(user, 'perfil', None)
+    publico = {'nivel': perfil.nivel_acesso if perfil else None, 'inscricoes': [], 'turmas': set()}
+    relevantes = [r for r in regras if r[1] == publico['nivel']]
+    if any(grupo not in ('', 'todos') or curso_id for _, _, grupo, curso_id, _ in relevantes):
+        publico['inscricoes'] = [
+            (curso_id, _grupos_inscricao(status, aprovado))
+            for curso_id, status, aprovado in Inscricao.objects.filter(user=user).values_list('curso_id', 'status_inscricao', 'aprovado')
+        ]
+    if any(turma_id for *_, turma_id in relevantes):
+        publico['turmas'] = set(Aluno.objects.filter(user=user, turma__isnull=False).values_list('turma_id', flat=True))
+    user._publico_notificacoes = publico
+    return publico
+
+
+def _abrange(regra, publico):
+    _, nivel, grupo, curso_id, turma_id = regra
+    if nivel != publico['nivel']:
+        return False
+    if turma_id and turma_id not in publico['turmas']:
+        return False
+    if grupo in ('', 'todos') and not curso_id:
+        return True
+    return any(
+        (not curso_id or curso == curso_id) and (grupo in ('', 'todos') or grupo in grupos)
+        for curso, grupos in publico['inscricoes']
+    )
+
+
+def notificacoes_publicas_de(user):
+    """Ids das notificações de público ativas que abrangem o utilizador"""
+    regras = notificacoes_publicas()
+    if not regras:
+        return []
+    publico = _publico_de(user, regras)
+    return [regra[0] for regra in regras if _abrange(regra, publico)]
+
+
+def utilizadores_do_publico(notificacao):
+    """Utilizadores abrangidos por uma notificação de público (sem duplicados)"""
+    utilizadores = User.objects.filter(perfil__nivel_acesso=notificacao.publico_nivel_acesso)
+    grupo = notificacao.publico_grupo
+    if grupo not in ('', 'todos') or notificacao.publico_curso_id:
+        inscricoes = Inscricao.objects.filter(user=OuterRef('pk'))
+        if grupo in GRUPOS_PUBLICO:
+            inscricoes = inscricoes.filter(GRUPOS_PUBLICO[grupo])
+        if notificacao.publico_curso_id:
+            inscricoes = inscricoes.filter(curso_id=notificacao.publico_curso_id)
+        utilizadores = utilizadores.filter(Exists(inscricoes))
+    if notificacao.publico_turma_id:
+        utilizadores = utilizadores.filter(Exists(Aluno.objects.filter(user=OuterRef('pk'), turma_id=notificacao.publico_turma_id)))
+    return utilizadores
+
+
+def notificacoes_do_utilizador(user):
+    return Notificacao.objects.filter(
+        Q(global_notificacao=True) | Q(destinatarios=user) | Q(id__in=notificacoes_publicas_de(user)),
+        ativa=True
+    ).distinct().order_by('-data_criacao')
+
+
+def caixa_de(user):
+    caixa = getattr(user, '_caixa_notificacoes', None)
+    if caixa is None:
+        caixa, criada = CaixaNotificacoes.objects.get_or_create(user=user)
+        if criada:
+            recalcular_caixas([user.pk])
+            caixa.refresh_from_db()
+        user._caixa_notificacoes = caixa
+    return caixa
+
+
+def contar_nao_lidas(user):
+    """Número de notificações não lidas do utilizador (uma leitura da caixa, no máximo)"""
+    caixa = caixa_de(user)
+    globais = notificacoes_globais()
+    globais_novas = len(globais) - bisect_right(globais, caixa.lidas_ate)
+    globais_novas += sum(1 for i in notificacoes_publicas_de(user) if i > caixa.lidas_ate)
+    return caixa.nao_lidas + max(0, globais_novas - caixa.globais_lidas)
+
+
+def anotar_leitura(notificacoes, user):
+    """Define `esta_lida` em cada notificação da lista (uma consulta para as lidas acima da marca)"""
+    notificacoes = list(notificacoes)
+    caixa = caixa_de(user)
+    acima = [n.id for n in notificacoes if n.id > caixa.lidas_ate]
+    lidas = set(user.notificacoes_lidas.filter(id__in=acima).values_list('id', flat=True)) if acima else set()
+    for notificacao in notificacoes:
+        notificacao.esta_lida = notificacao.id <= caixa.lidas_ate or notificacao.id in lidas
+    return notificacoes
+
+
+def marcar_como_lida(notificacao, user):
+    """Marca uma notificação como lida; devolve False se já estava lida"""
+    caixa_de(user)
+    with transaction.atomic():
+        caixa = CaixaNotificacoes.objects.select_for_update().get(user=user)
+        if notificacao.id <= caixa.lidas_ate or notificacao.lida_por.filter(pk=user.pk).exists():
+            return False
+        notificacao.lida_por.add(user)
+        if notificacao.ativa:
+            caixas = CaixaNotificacoes.objects.filter(pk=caixa.pk)
+            if notificacao.global_notificacao or notificacao.publico_nivel_acesso:
+                caixas.update(globais_lidas=F('globais_lidas') + 1)
+            elif notificacao.destinatarios.filter(pk=user.pk).exists():
+                caixas.update(nao_lidas=Greatest(F('nao_lidas') - 1, 0))
+    user.__dict__.pop('_caixa_notificacoes', None)
+    return True
+
+
+def marcar_todas_como_lidas(user):
+    """Avança a marca de leitura até à notificação mais recente (uma única escrita)"""
+    ultima = Notificacao.objects.aggregate(ultima=Max('id'))['ultima'] or 0
+    CaixaNotificacoes.objects.update_or_create(
+        user=user, defaults={'nao_lidas': 0, 'lidas_ate': ultima, 'globais_lidas': 0}
+    )
+    user.__dict__.pop('_caixa_notificacoes', None)
+
+
+def registar_destinatarios(notificacao, user_ids):
+    """Incrementa as não lidas dos utilizadores adicionados aos destinatários de uma notificação"""
+    if notificacao.global_notificacao or notificacao.publico_nivel_acesso or not notificacao.ativa or not user_ids:
+        return
+    existentes = set(CaixaNotificacoes.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    CaixaNotificacoes.objects.filter(user_id__in=existentes, lidas_ate__lt=notificacao.id).update(
+        nao_lidas=F('nao_lidas') + 1
+    )
+    # Utilizadores sem caixa: cria-a com os contadores calculados de raiz
+    novos = set(user_ids) - existentes
+    if novos:
+        CaixaNotificacoes.objects.bulk_create(
+            [CaixaNotificacoes(user_id=user_id) for user_id in novos], ignore_conflicts=True
+        )
+        recalcular_caixas(novos)
+
+
+def recalcular_caixas(user_ids=None):
+    """
+    Recalcula os contadores das caixas a partir das notificações (consultas
+    agrupadas). Usado quando uma notificação é desativada, apagada ou muda de
+    destinatários, e para reparar divergências.
+    """
+    caixas = CaixaNotificacoes.objects.all()
+    if user_ids is not None:
+        caixas = caixas.filter(user_id__in=user_ids)
+
+    with transaction.atomic():
+        caixas = list(caixas.select_for_update())
+        if not caixas:
+            return 0
+        por_user = {c.user_id: c for c in caixas}
+        marcas = {c.user_id: c.lidas_ate for c in caixas}
+
+        dirigidas = Notificacao.destinatarios.through.objects.filter(
+            user_id__in=por_user, notificacao__ativa=True, notificacao__global_notificacao=False,
+            notificacao__publico_nivel_acesso=''
+        ).values_list('user_id', 'notificacao_id')
+        lidas = set(Notificacao.lida_por.through.objects.filter(
+            user_id__in=por_user, notificacao__ativa=True
+        ).values_list('user_id', 'notificacao_id'))
+        globais = set(notificacoes_globais()) | {regra[0] for regra in notificacoes_publicas()}
+
+        for caixa in caixas:
+            caixa.nao_lidas = 0
+            caixa.globais_lidas = 0
+        for user_id, notificacao_id in dirigidas:
+            if notificacao_id > marcas[user_id] and (user_id, notificacao_id) not in lidas:
+                por_user[user_id].nao_lidas += 1
+        for user_id, notificacao_id in lidas:
+            if notificacao_id > marcas[user_id] and notificacao_id in globais:
+                por_user[user_id].globais_lidas += 1
+
+        CaixaNotificacoes.objects.bulk_update(caixas, ['nao_lidas', 'globais_lidas'], batch_size=500)
+    return len(caixas)
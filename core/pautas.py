@@ -0,0 +1,131 @@
+from .admissao import ler_nota
+from .models import Aluno, Disciplina, NotaEstudante
+
+CAMPOS_UNICOS_NOTA = ['ano_academico', 'turma', 'disciplina', 'aluno']
+
+
+def disciplinas_da_turma(turma):
+    return Disciplina.objects.filter(curso_id=turma.curso_id).order_by('ano_curricular', 'semestre_curricular', 'nome')
+
+
+def carregar_matriz_notas(turma, ano_academico):
+    """
+    Devolve a pauta completa da turma (todos os alunos × todas as disciplinas).
+
+    As notas são lidas com uma única consulta e devolvidas numa matriz compacta:
+    `notas[i][j]` é a nota do aluno `alunos[i]` na disciplina `disciplinas[j]`
+    (None quando ainda não foi lançada).
+    """
+    disciplinas = list(disciplinas_da_turma(turma).values('id', 'nome', 'codigo'))
+    alunos = list(Aluno.objects.filter(turma=turma).order_by('nome_completo').values('id', 'numero_estudante', 'nome_completo'))
+
+    linha_aluno = {a['id']: i for i, a in enumerate(alunos)}
+    coluna_disciplina = {d['id']: j for j, d in enumerate(disciplinas)}
+    notas = [[None] * len(disciplinas) for _ in alunos]
+
+    lancadas = NotaEstudante.objects.filter(
+        turma=turma, ano_academico=ano_academico
+    ).values_list('aluno_id', 'disciplina_id', 'nota')
+    for aluno_id, disciplina_id, nota in lancadas:
+        i = linha_aluno.get(aluno_id)
+        j = coluna_disciplina.get(disciplina_id)
+        if i is not None and j is not None:
+            notas[i][j] = nota
+
+    return {
+        'turma': turma.id,
+        'ano_academico': ano_academico.id,
+        'disciplinas': disciplinas,
+        'alunos': alunos,
+        'notas': notas,
+    }
+
+
+def guardar_notas(turma, ano_academico, professor, celulas, atualizar_professor=False):
+    """
+    Grava as notas indicadas com um único INSERT ... ON CONFLICT.
+
+    `celulas` é um iterável de (aluno_id, disciplina_id, nota). Células de alunos
+    que não pertencem à turma, de disciplinas fora do curso ou com notas fora da
+    escala 0-20 são rejeitadas. Só são escritas as células que mudam a nota
+    guardada: uma célula vazia sem nota lançada não cria linha. `professor` fica
+    registado nas notas novas; as existentes mantêm o seu professor, exceto com
+    atualizar_professor=True (lançamento de uma só disciplina com o professor escolhido).
+    Devolve {'gravadas': n, 'inalteradas': n, 'rejeitadas': n}.
+    """
+    alunos_validos = set(Aluno.objects.filter(turma=turma).values_list('id', flat=True))
+    disciplinas_validas = set(disciplinas_da_turma(turma).values_list('id', flat=True))
+
+    submetidas = {}
+    rejeitadas = 0
+    for aluno_id, disciplina_id, valor in celulas:
+        try:
+            aluno_id, disciplina_id = int(aluno_id), int(disciplina_id)
+            nota = ler_nota(valor)
+        except (TypeError, ValueError):
+            rejeitadas += 1
+            continue
+        if aluno_id not in alunos_validos or disciplina_id not in disciplinas_validas:
+            rejeitadas += 1
+            continue
+        submetidas[(aluno_id, disciplina_id)] = nota
+
+    guardadas = {
+        (aluno_id, disciplina_id): (nota, professor_id)
+        for aluno_id, disciplina_id, nota, professor_id in NotaEstudante.objects.filter(
+            turma=turma, ano_academico=ano_academico,
+            aluno_id__in={a for a, _ in submetidas}, disciplina_id__in={d for _, d in submetidas},
+        ).values_list('aluno_id', 'disciplina_id', 'nota', 'professor_id')
+    }
+
+    def alterada(chave, nota):
+        if chave not in guardadas:
+            return nota is not None
+        nota_guardada, professor_guardado = guardadas[chave]
+        return nota_guardada != nota or (atualizar_professor and professor_guardado != professor.id)
+
+    registos = [
+        NotaEstudante(
+            ano_academico=ano_academico,
+            turma=turma,
+            disciplina_id=disciplina_id,
+            professor=professor,
+            aluno_id=aluno_id,
+            nota=nota,
+        )
+        for (aluno_id, disciplina_id), nota in submetidas.items()
+        if alterada((aluno_id, disciplina_id), nota)
+    ]
+
+    if registos:
+        # Em conflito (nota já existente ou criada entretanto) o professor só muda se pedido
+        NotaEstudante.objects.bulk_create(
+            registos,
+            update_conflicts=True,
+            unique_fields=CAMPOS_UNICOS_NOTA,
+            update_fields=['nota', 'professor'] if atualizar_professor else ['nota'],
+            batch_size=500,
+        )
+    return {'gravadas': len(registos), 'inalteradas': len(submetidas) - len(registos), 'rejeitadas': rejeitadas}
+
+
+def guardar_matriz_notas(turma, ano_academico, professor, matriz):
+    """
+    Grava uma pauta no mesmo formato devolvido por carregar_matriz_notas.
+    ValueError se `matriz` não tiver esse formato.
+    """
+    if not isinstance(matriz, dict):
+        raise ValueError("A pauta deve ser um objeto JSON")
+    disciplinas = matriz.get('disciplinas', [])
+    alunos = matriz.get('alunos', [])
+    notas = matriz.get('notas', [])
+    if not all(isinstance(lista, list) for lista in (disciplinas, alunos, notas)) \
+            or not all(isinstance(linha, list) for linha in notas):
+        raise ValueError("'disciplinas', 'alunos' e 'notas' devem ser listas")
+    disciplinas = [d.get('id') if isinstance(d, dict) else d for d in disciplinas]
+    alunos = [a.get('id') if isinstance(a, dict) else a for a in alunos]
+    celulas = []
+    for aluno_id, linha in zip(alunos, notas):
+        for disciplina_id, nota in zip(disciplinas, linha):
+            celulas.append((aluno_id, disciplina_id, nota))
+    return guardar_notas(turma, ano_academico, professor, celulas)
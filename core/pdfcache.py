@@ -0,0 +1,129 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import salted_hmac
+from django.utils.http import http_date, quote_etag
+
+# Cache em disco dos PDFs gerados (comprovativos, recibos, documentos).
+#
+# Cada PDF é guardado em PDF_CACHE_DIRETORIO com um nome derivado (HMAC com a
+# SECRET_KEY, para não ser adivinhável) de todos os dados que aparecem no
+# documento e da versão do modelo de cada gerador: qualquer alteração a uma
+# inscrição, à configuração ou ao layout produz uma nova chave, e as entradas
+# antigas deixam simplesmente de ser usadas até serem removidas.
+#
+# O mtime de cada ficheiro é a data de geração (Last-Modified); o atime é
+# atualizado explicitamente a cada utilização e serve para remover os menos
+# usados quando o diretório ultrapassa PDF_CACHE_TAMANHO_MAXIMO bytes.
+
+_lock = threading.Lock()
+
+
+def _diretorio():
+    diretorio = getattr(settings, 'PDF_CACHE_DIRETORIO', None)
+    return str(diretorio or os.path.join(settings.MEDIA_ROOT, 'cache_pdf'))
+
+
+def _tamanho_maximo():
+    return getattr(settings, 'PDF_CACHE_TAMANHO_MAXIMO', 200 * 1024 * 1024)
+
+
+def versao_ficheiro(caminho):
+    """Identifica a versão de um recurso usado no PDF (ex: o logótipo)"""
+    try:
+        estado = os.stat(caminho)
+    except OSError:
+        return None
+    return [estado.st_size, estado.st_mtime_ns]
+
+
+def chave(tipo, versao, dados):
+    """Chave do PDF: tipo de documento, versão do modelo e os dados que nele aparecem"""
+    conteudo = json.dumps([tipo, versao, dados], sort_keys=True, default=str)
+    return f"{tipo}-{salted_hmac('core.pdfcache', conteudo, algorithm='sha256').hexdigest()}"
+
+
+def obter(tipo, versao, dados, gerar):
+    """
+    Caminho do PDF em cache, gerando-o com `gerar(ficheiro)` se ainda não existir.
+    A escrita é feita num ficheiro temporário e movida no fim (pedidos
+    concorrentes nunca leem um PDF incompleto).
+    """
+    diretorio = _diretorio()
+    caminho = os.path.join(diretorio, chave(tipo, versao, dados) + '.pdf')
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        os.makedirs(diretorio, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=diretorio, suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as ficheiro:
+                gerar(ficheiro)
+            os.replace(temporario, caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+        limpar()
+    else:
+        # Marca a utilização (LRU) sem alterar a data de geração
+        os.utime(caminho, ns=(time.time_ns(), estado.st_mtime_ns))
+    return caminho
+
+
+def limpar(tamanho_maximo=None):
+    """Remove os PDFs usados há mais tempo até o diretório ficar abaixo de 90% do limite"""
+    if tamanho_maximo is None:
+        tamanho_maximo = _tamanho_maximo()
+    with _lock:
+        try:
+            with os.scandir(_diretorio()) as entradas:
+                ficheiros = [(e.stat().st_atime_ns, e.stat().st_size, e.path) for e in entradas if e.name.endswith('.pdf')]
+        except FileNotFoundError:
+            return 0
+        total = sum(tamanho for _, tamanho, _ in ficheiros)
+        if total <= tamanho_maximo:
+            return 0
+        removidos = 0
+        for _, tamanho, caminho in sorted(ficheiros):
+            if total <= tamanho_maximo * 0.9:
+                break
+            try:
+                os.unlink(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+            removidos += 1
+        return removidos
+
+
+def resposta_pdf(request, caminho, nome_ficheiro, anexo=False):
+    """FileResponse do PDF em cache com ETag/Last-Modified (304 se o browser já o tiver)"""
+    estado = os.stat(caminho)
+    etag = quote_etag(os.path.basename(caminho).removesuffix('.pdf'))
+    ultima_modificacao = int(estado.st_mtime)
+    resposta = get_conditional_response(request, etag=etag, last_modified=ultima_modificacao)
+    if resposta is None:
+        resposta = FileResponse(open(caminho, 'rb'), content_type='application/pdf', as_attachment=anexo, filename=nome_ficheiro)
+    resposta['ETag'] = etag
+    resposta['Last-Modified'] = http_date(ultima_modificacao)
+    resposta['Cache-Control'] = 'private, no-cache'
+    return resposta
+
+
+def servir(request, tipo, versao, dados, gerar, nome_ficheiro, anexo=False):
+    """Atalho para as views: obtém (ou gera) o PDF e devolve a resposta"""
+    # A ETag depende só dos dados: um browser com a versão atual recebe 304
+    # sem que o PDF seja gerado, mesmo que tenha sido removido do cache
+    etag = quote_etag(chave(tipo, versao, dados))
+    if request.headers.get('If-None-Match'):
+        resposta = get_conditional_response(request, etag=etag)
+        if resposta is not None:
+            resposta['ETag'] = etag
+            return resposta
+    return resposta_pdf(request, obter(tipo, versao, dados, gerar), nome_ficheiro, anexo=anexo)
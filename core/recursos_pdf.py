@@ -0,0 +1,236 @@
+import functools
+import os
+from collections import deque
+from itertools import islice
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import cm, mm
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable, LongTable, SimpleDocTemplate, TableStyle
+
+# Recursos partilhados pelos geradores de PDF (listas, comprovativos, recibos,
+# documentos): estilos de parágrafo e de tabela construídos uma única vez por
+# processo, o logótipo descodificado em memória e os modelos de página
+# (tamanho, margens e cabeçalho/rodapé desenhados em onPage). Cada gerador só
+# constrói as linhas de dados.
+#
+# Os estilos são partilhados entre pedidos: não devem ser alterados pelos
+# geradores (usar ParagraphStyle(parent=...) para variações pontuais).
+
+CAMINHO_LOGO = os.path.join(settings.BASE_DIR, 'core', 'static', 'core', 'images', 'siga-logo.png')
+
+_base = getSampleStyleSheet()
+
+
+def _estilo(nome, base, **atributos):
+    return ParagraphStyle(nome, parent=_base[base], **atributos)
+
+
+ESTILOS = {
+    'normal': _base['Normal'],
+    'titulo2': _base['Heading2'],
+    # Listas de inscritos / aprovados
+    'lista_titulo': _estilo('ListaTitulo', 'Heading1', fontSize=16, alignment=TA_CENTER, spaceAfter=20),
+    # Comprovativo de inscrição
+    'comprovativo_titulo': _estilo('ComprovativoTitulo', 'Heading1', fontSize=16, textColor='#1a1a1a', alignment=TA_CENTER),
+    'comprovativo_subtitulo': _estilo('ComprovativoSubtitulo', 'Heading2', fontSize=12, textColor='#333333', alignment=TA_CENTER),
+    'comprovativo_normal': _estilo('ComprovativoNormal', 'Normal', fontSize=10, textColor='#000000', alignment=TA_LEFT),
+    'corte': ParagraphStyle('Corte', alignment=TA_CENTER, fontSize=8),
+    # Recibo térmico (80mm)
+    'termico_cabecalho': _estilo('TermicoCabecalho', 'Normal', fontSize=10, alignment=TA_CENTER, leading=12, fontName='Helvetica-Bold'),
+    'termico_corpo': _estilo('TermicoCorpo', 'Normal', fontSize=8, alignment=TA_LEFT, leading=10),
+    # Documentos com modelo
+    'documento_normal': _estilo('DocumentoNormal', 'Normal', fontSize=11, textColor='#000000', spaceAfter=8, alignment=TA_LEFT),
+    # Recibo de pagamento da subscrição
+    'recibo_titulo': _estilo('ReciboTitulo', 'Heading1', fontSize=18, textColor=colors.HexColor('#1e3a8a'), spaceAfter=30, alignment=TA_CENTER),
+    'recibo_rodape': _estilo('ReciboRodape', 'Normal', fontSize=10, textColor=colors.grey, alignment=TA_CENTER),
+}
+
+
+def _tabela_lista(cor_cabecalho, *comandos):
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(cor_cabecalho)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        *comandos,
+    ])
+
+
+TABELAS = {
+    'aprovados': _tabela_lista('#059669'),
+    'inscritos': _tabela_lista(
+        '#1e3a8a',
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('LEFTPADDING', (0, 0), (-1, -1), 5),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+    ),
+    'comprovativo': TableStyle([
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('SPAN', (1, 0), (1, 5)),
+        ('ALIGN', (1, 0), (1, 5), 'RIGHT'),
+    ]),
+    'recibo_pagamento': TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e5e7eb')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('TOPPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+    ]),
+}
+
+
+# O logótipo nunca é desenhado com mais de 5cm; 600px dão ~300dpi a esse tamanho
+LOGO_LADO_MAXIMO_PX = 600
+
+
+@functools.lru_cache(maxsize=4)
+def _ler_imagem(caminho, versao):
+    from PIL import Image as ImagemPIL
+    imagem = ImagemPIL.open(caminho)
+    imagem.load()
+    # Reduzida uma vez: cada PDF comprime só os píxeis necessários
+    imagem.thumbnail((LOGO_LADO_MAXIMO_PX, LOGO_LADO_MAXIMO_PX))
+    return ImageReader(imagem)
+
+
+def logo():
+    """Logótipo descodificado e reduzido (ImageReader), relido só quando o ficheiro muda; None se não existir"""
+    try:
+        estado = os.stat(CAMINHO_LOGO)
+    except OSError:
+        return None
+    return _ler_imagem(CAMINHO_LOGO, (estado.st_size, estado.st_mtime_ns))
+
+
+class ImagemPartilhada(Flowable):
+    """Imagem desenhada a partir de um ImageReader já descodificado (sem reler o ficheiro)"""
+
+    def __init__(self, leitor, largura, altura, hAlign='CENTER'):
+        super().__init__()
+        self.leitor = leitor
+        self.largura = largura
+        self.altura = altura
+        self.hAlign = hAlign
+
+    def wrap(self, largura_disponivel, altura_disponivel):
+        return self.largura, self.altura
+
+    def draw(self):
+        self.canv.drawImage(self.leitor, 0, 0, self.largura, self.altura, mask='auto')
+
+
+def imagem_logo(largura, altura, hAlign='CENTER'):
+    """Flowable do logótipo, ou None se não houver logótipo"""
+    leitor = logo()
+    return ImagemPartilhada(leitor, largura, altura, hAlign) if leitor else None
+
+
+# Modelos de página: tamanho e margens de cada tipo de documento
+MODELOS = {
+    'lista': {'pagesize': A4, 'topMargin': 2*cm, 'bottomMargin': 2*cm, 'leftMargin': 2*cm, 'rightMargin': 2*cm},
+    'comprovativo': {'pagesize': A4, 'topMargin': 1*cm, 'bottomMargin': 1*cm, 'leftMargin': 1.5*cm, 'rightMargin': 1.5*cm},
+    'termico': {'pagesize': (80*mm, 150*mm), 'topMargin': 2*mm, 'bottomMargin': 2*mm, 'leftMargin': 2*mm, 'rightMargin': 2*mm},
+    'documento': {'pagesize': A4, 'topMargin': 2*cm, 'bottomMargin': 2*cm},
+    'recibo_pagamento': {'pagesize': A4},
+}
+
+
+def documento_pdf(ficheiro, modelo, **opcoes):
+    """SimpleDocTemplate com o tamanho e as margens do modelo indicado"""
+    return SimpleDocTemplate(ficheiro, **{**MODELOS[modelo], **opcoes})
+
+
+def rodape_paginas(canvas, doc):
+    """onPage: número da página no rodapé"""
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.setFillColor(colors.grey)
+    canvas.drawRightString(doc.pagesize[0] - doc.rightMargin, doc.bottomMargin / 2, f"Página {doc.page}")
+    canvas.restoreState()
+
+
+class TabelaContinua(Flowable):
+    """
+    Tabela alimentada por um iterador de linhas (ex: values_list(...).iterator()).
+
+    Em cada página só são lidas as linhas que lá cabem, desenhadas num
+    LongTable com o cabeçalho repetido: a memória usada é a de uma página,
+    qualquer que seja o número de linhas. As linhas devem ter uma única linha
+    de texto (altura constante, medida na primeira linha).
+    """
+
+    def __init__(self, cabecalho, linhas, colWidths, style, hAlign='CENTER'):
+        super().__init__()
+        self.cabecalho = cabecalho
+        self.linhas = iter(linhas)
+        self.pendentes = deque()
+        self.colWidths = colWidths
+        self.style = style
+        self.hAlign = hAlign
+        self.alturas = None
+        self.tabela = None
+
+    def _ler(self, quantidade):
+        if len(self.pendentes) < quantidade:
+            self.pendentes.extend(islice(self.linhas, quantidade - len(self.pendentes)))
+
+    def _medir(self):
+        if self.alturas is None:
+            self._ler(1)
+            amostra = LongTable([self.cabecalho, *list(self.pendentes)[:1]], colWidths=self.colWidths, style=self.style)
+            amostra.wrap(0, 0)
+            self.alturas = (amostra._rowHeights[0], amostra._rowHeights[-1])
+        return self.alturas
+
+    def _cabem(self, altura_disponivel):
+        cabecalho, linha = self._medir()
+        return max(0, int((altura_disponivel - cabecalho) // linha))
+
+    def _tabela(self, linhas):
+        cabecalho, linha = self._medir()
+        return LongTable(
+            [self.cabecalho, *linhas], colWidths=self.colWidths, style=self.style, repeatRows=1,
+            rowHeights=[cabecalho] + [linha] * len(linhas), hAlign=self.hAlign,
+        )
+
+    def wrap(self, largura_disponivel, altura_disponivel):
+        cabem = self._cabem(altura_disponivel)
+        self._ler(cabem + 1)
+        if len(self.pendentes) > cabem:
+            # Há mais linhas do que espaço: o frame chama split()
+            return sum(self.colWidths), altura_disponivel + 1
+        # Últimas linhas (o wrap pode ser repetido; só são consumidas em draw)
+        self.tabela = self._tabela(list(self.pendentes))
+        return self.tabela.wrap(largura_disponivel, altura_disponivel)
+
+    def split(self, largura_disponivel, altura_disponivel):
+        cabem = self._cabem(altura_disponivel)
+        if not cabem:
+            return []
+        self._ler(cabem + 1)
+        linhas = [self.pendentes.popleft() for _ in range(min(cabem, len(self.pendentes)))]
+        # Foi desenhada uma parte: a próxima falta de espaço não é um erro de layout
+        self.__dict__.pop('_postponed', None)
+        return [self._tabela(linhas), self]
+
+    def draw(self):
+        self.pendentes.clear()
+        self.tabela.drawOn(self.canv, 0, 0)
+
+
+def ficheiro_pdf_temporario():
+    """Destino de PDFs grandes: em memória até PDF_LIMITE_MEMORIA bytes, depois em disco"""
+    return SpooledTemporaryFile(max_size=getattr(settings, 'PDF_LIMITE_MEMORIA', 5 * 1024 * 1024))
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils.crypto import salted_hmac
+
+# Política "uma senha não pode ser usada por dois utilizadores".
+#
+# Em vez de correr check_password (PBKDF2) contra todos os utilizadores, guarda-se
+# por utilizador um HMAC-SHA256 da senha com uma chave do servidor
+# (SENHAS_CHAVE_IMPRESSAO, por omissão a SECRET_KEY): a verificação custa um
+# HMAC e uma consulta indexada, independentemente do número de utilizadores.
+#
+# As impressões são atualizadas quando uma senha é alterada com set_password
+# (validador ImpressaoSenhaValidator em AUTH_PASSWORD_VALIDATORS), registadas
+# explicitamente após create_user (que não passa por set_password) e
+# preenchidas no login para as contas anteriores a esta tabela. Contas que
+# ainda não entraram desde então não são detetadas. Mudar a chave invalida
+# todas as impressões.
+
+MENSAGEM_SENHA_EM_USO = 'Esta senha já está sendo usada por outro usuário. Por favor, escolha uma senha diferente.'
+
+
+def impressao(senha):
+    chave = getattr(settings, 'SENHAS_CHAVE_IMPRESSAO', None)
+    return salted_hmac('core.senhas.impressao', senha, secret=chave, algorithm='sha256').hexdigest()
+
+
+def senha_em_uso(senha, excluir_user=None):
+    """Indica se outro utilizador já usa esta senha (um HMAC e uma consulta)"""
+    from .models import ImpressaoSenha
+    impressoes = ImpressaoSenha.objects.filter(impressao=impressao(senha))
+    if excluir_user is not None and excluir_user.pk is not None:
+        impressoes = impressoes.exclude(user_id=excluir_user.pk)
+    return impressoes.exists()
+
+
+def registar_senha(user, senha):
+    """Guarda (ou substitui) a impressão da senha atual do utilizador"""
+    from .models import ImpressaoSenha
+    valor = impressao(senha)
+    if ImpressaoSenha.objects.filter(user_id=user.pk).update(impressao=valor):
+        return
+    try:
+        with transaction.atomic():
+            ImpressaoSenha.objects.create(user_id=user.pk, impressao=valor)
+    except IntegrityError:
+        ImpressaoSenha.objects.filter(user_id=user.pk).update(impressao=valor)
+
+
+def preencher_impressao(user, senha):
+    """No login: cria a impressão das contas que ainda não a têm"""
+    from .models import ImpressaoSenha
+    if not ImpressaoSenha.objects.filter(user_id=user.pk).exists():
+        registar_senha(user, senha)
+
+
+class ImpressaoSenhaValidator:
+    """
+    Validador de senhas: rejeita senhas de outros utilizadores e, através de
+    password_changed (chamado pelo Django ao gravar uma nova senha), mantém as
+    impressões atualizadas.
+    """
+
+    def validate(self, password, user=None):
+        if senha_em_uso(password, excluir_user=user):
+            raise ValidationError(MENSAGEM_SENHA_EM_USO, code='password_in_use')
+
+    def password_changed(self, password, user=None):
+        if user is not None and user.pk is not None:
+            registar_senha(user, password)
+
+    def get_help_text(self):
+        return 'A senha não pode ser igual à de outro utilizador.'
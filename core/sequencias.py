@@ -0,0 +1,115 @@
+import os
+import re
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+# Tipos de código gerados pelo sistema: modelo/campo onde são gravados e formato
+FORMATOS = {
+    'inscricao': {'modelo': 'core.Inscricao', 'campo': 'numero_inscricao', 'prefixo': 'INS-', 'digitos': 6},
+    'estudante': {'modelo': 'core.Aluno', 'campo': 'numero_estudante', 'prefixo': 'ALU-', 'digitos': 6},
+    'professor': {'modelo': 'core.Professor', 'campo': 'codigo_professor', 'prefixo': 'PROF/{ano}/', 'digitos': 4},
+}
+
+# Blocos reservados por processo: nome da sequência -> [próximo, último, pid]
+_blocos = {}
+_lock = threading.Lock()
+
+
+def _prefixo(tipo, ano=None):
+    prefixo = FORMATOS[tipo]['prefixo']
+    if '{ano}' in prefixo:
+        prefixo = prefixo.format(ano=ano or timezone.now().year)
+    return prefixo
+
+
+def _valor_inicial(tipo, prefixo):
+    """Maior número já usado com este prefixo (para semear o contador na primeira utilização)"""
+    formato = FORMATOS[tipo]
+    modelo = apps.get_model(formato['modelo'])
+    padrao = re.compile(rf"^{re.escape(prefixo)}(\d+)$")
+    maior = 0
+    for codigo in modelo.objects.filter(**{f"{formato['campo']}__startswith": prefixo}).values_list(formato['campo'], flat=True).iterator():
+        encontrado = padrao.match(codigo or '')
+        if encontrado:
+            maior = max(maior, int(encontrado.group(1)))
+    return maior
+
+
+def reservar(nome, quantidade=1, valor_inicial=None):
+    """
+    Reserva atomicamente `quantidade` números consecutivos da sequência `nome`.
+
+    O contador é incrementado com um único UPDATE, que bloqueia a linha até ao
+    fim da transação (PostgreSQL) ou obtém o lock de escrita da base (SQLite),
+    pelo que dois pedidos simultâneos nunca recebem o mesmo número.
+    Devolve um range com os números reservados.
+    """
+    from .models import Sequencia
+
+    if quantidade < 1:
+        raise ValueError('A quantidade a reservar deve ser positiva')
+
+    with transaction.atomic():
+        atualizados = Sequencia.objects.filter(nome=nome).update(valor=F('valor') + quantidade)
+        if not atualizados:
+            inicial = valor_inicial() if callable(valor_inicial) else (valor_inicial or 0)
+            try:
+                with transaction.atomic():
+                    Sequencia.objects.create(nome=nome, valor=inicial + quantidade)
+            except IntegrityError:
+                # Outro processo criou o contador entretanto
+                Sequencia.objects.filter(nome=nome).update(valor=F('valor') + quantidade)
+        ultimo = Sequencia.objects.filter(nome=nome).values_list('valor', flat=True).get()
+    return range(ultimo - quantidade + 1, ultimo + 1)
+
+
+def _tamanho_bloco(tipo):
+    return max(1, getattr(settings, 'SEQUENCIAS_TAMANHO_BLOCO', {}).get(tipo, 1))
+
+
+def _guardar_bloco(nome, restante):
+    with _lock:
+        _blocos[nome] = restante
+
+
+def _proximo(tipo, nome, prefixo):
+    bloco = _tamanho_bloco(tipo)
+    if bloco == 1:
+        return reservar(nome, valor_inicial=lambda: _valor_inicial(tipo, prefixo))[0]
+
+    # Pré-reserva por processo: só vai à base de dados quando o bloco se esgota.
+    # Os números não usados de um bloco perdem-se quando o processo termina.
+    with _lock:
+        atual = _blocos.get(nome)
+        if atual and atual[2] == os.getpid() and atual[0] <= atual[1]:
+            numero = atual[0]
+            atual[0] += 1
+            return numero
+
+    numeros = reservar(nome, bloco, valor_inicial=lambda: _valor_inicial(tipo, prefixo))
+    # O UPDATE do contador pertence à transação de quem pede o código: o resto do
+    # bloco só fica disponível quando ela for confirmada. Se for revertida, o
+    # contador volta atrás e estes números voltam a ser reservados da base de
+    # dados, pelo que não podem ficar também em cache.
+    transaction.on_commit(lambda: _guardar_bloco(nome, [numeros[1], numeros[-1], os.getpid()]))
+    return numeros[0]
+
+
+def gerar_codigo(tipo, ano=None):
+    """Gera o próximo código do tipo indicado (ex: 'INS-000123', 'PROF/2025/0007')"""
+    prefixo = _prefixo(tipo, ano)
+    numero = _proximo(tipo, f"{tipo}:{prefixo}", prefixo)
+    return f"{prefixo}{numero:0{FORMATOS[tipo]['digitos']}d}"
+
+
+def gerar_codigos(tipo, quantidade, ano=None):
+    """Gera `quantidade` códigos consecutivos de uma só vez (importações em massa)"""
+    prefixo = _prefixo(tipo, ano)
+    numeros = reservar(f"{tipo}:{prefixo}", quantidade, valor_inicial=lambda: _valor_inicial(tipo, prefixo))
+    digitos = FORMATOS[tipo]['digitos']
+    return [f"{prefixo}{n:0{digitos}d}" for n in numeros]
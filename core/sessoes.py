@@ -0,0 +1,45 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+# Backend de sessões (SESSION_ENGINE = 'core.sessoes') que evita reescrever a
+# linha de django_session em todos os pedidos.
+#
+# Com SESSION_SAVE_EVERY_REQUEST a sessão é gravada em cada resposta só para
+# empurrar a data de expiração. Aqui, uma sessão não modificada só é regravada
+# quando resta menos de SESSION_RENOVAR_FRACAO de SESSION_COOKIE_AGE; o tempo
+# de inatividade efetivo fica assim entre (1 - fração) e 100% do SESSION_COOKIE_AGE.
+#
+# Baseia-se no backend db (e não em cached_db) porque o cache por omissão é
+# local a cada processo e serviria sessões desatualizadas entre workers.
+
+CHAVE_EXPIRACAO = '_expira_em'
+
+
+def _fracao():
+    return getattr(settings, 'SESSION_RENOVAR_FRACAO', 0.5)
+
+
+class SessionStore(DBStore):
+
+    def _renovacao_dispensavel(self):
+        expira_em = self._session.get(CHAVE_EXPIRACAO)
+        if expira_em is None:
+            return False
+        return expira_em - time.time() > _fracao() * self.get_expiry_age()
+
+    def segundos_restantes(self):
+        """Segundos até a sessão expirar, contando com a renovação (ou não) no fim deste pedido"""
+        expira_em = self._session.get(CHAVE_EXPIRACAO)
+        sera_gravada = self.modified or (settings.SESSION_SAVE_EVERY_REQUEST and not self._renovacao_dispensavel())
+        if sera_gravada or expira_em is None:
+            return self.get_expiry_age()
+        return max(0, int(expira_em - time.time()))
+
+    def save(self, must_create=False):
+        if not must_create and not self.modified and self._renovacao_dispensavel():
+            return
+        # Alterar o dicionário diretamente não marca a sessão como modificada
+        self._session[CHAVE_EXPIRACAO] = int(time.time()) + self.get_expiry_age()
+        super().save(must_create=must_create)
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, m2m_changed
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import PerfilUsuario
+from .models import (
+    PerfilUsuario, Inscricao, ConfiguracaoEscola, AnoAcademico, Semestre,
+    EventoCalendario, Subscricao, Notificacao,
+)
 
 @receiver(post_save, sender=User)
 def criar_perfil_usuario(sender, instance, created, **kwargs):
@@ -15,3 +18,65 @@ def salvar_perfil_usuario(sender, instance, **kwargs):
         # No entanto, o problema pode ser mais profundo se o perfil.save() disparar algo que limpe a foto.
         # Vamos garantir que não estamos limpando campos acidentalmente.
         instance.perfil.save()
+
+@receiver(post_delete, sender=Inscricao)
+def atualizar_contadores_curso(sender, instance, **kwargs):
+    from .contadores import aplicar_transicao
+    from .estatisticas import registar_transicao
+    anterior = getattr(instance, '_estado_original', None) or instance._valores_estado()
+    aplicar_transicao(anterior[:len(Inscricao.CAMPOS_CONTADORES)], None)
+    registar_transicao(anterior, None)
+
+
+@receiver(pre_delete, sender=AnoAcademico)
+def desassociar_estatisticas_ano(sender, instance, **kwargs):
+    from .estatisticas import desassociar_ano
+    desassociar_ano(instance)
+
+
+@receiver([post_save, post_delete], sender=ConfiguracaoEscola)
+@receiver([post_save, post_delete], sender=AnoAcademico)
+@receiver([post_save, post_delete], sender=Semestre)
+@receiver([post_save, post_delete], sender=EventoCalendario)
+@receiver([post_save, post_delete], sender=Subscricao)
+@receiver([post_save, post_delete], sender=Notificacao)
+def invalidar_contexto_academico(sender, **kwargs):
+    from .contexto import modelo_alterado
+    modelo_alterado(sender.__name__)
+
+
+def _leitores(notificacao):
+    """Utilizadores cujo estado de leitura depende da notificação"""
+    return set(notificacao.destinatarios.values_list('id', flat=True)) | set(notificacao.lida_por.values_list('id', flat=True))
+
+
+@receiver(m2m_changed, sender=Notificacao.destinatarios.through)
+def atualizar_caixas_destinatarios(sender, instance, action, reverse, pk_set, **kwargs):
+    from .notificacoes import registar_destinatarios, recalcular_caixas
+    if action == 'pre_clear':
+        instance._destinatarios_removidos = [instance.pk] if reverse else list(instance.destinatarios.values_list('id', flat=True))
+    elif action == 'post_add' and not reverse:
+        registar_destinatarios(instance, pk_set)
+    elif action in ('post_add', 'post_remove'):
+        recalcular_caixas([instance.pk] if reverse else pk_set)
+    elif action == 'post_clear':
+        recalcular_caixas(getattr(instance, '_destinatarios_removidos', []))
+
+
+@receiver(post_save, sender=Notificacao)
+def atualizar_caixas_notificacao(sender, instance, created, **kwargs):
+    # Desativar ou tornar global muda as não lidas de quem a recebeu
+    if not created:
+        from .notificacoes import recalcular_caixas
+        recalcular_caixas(_leitores(instance))
+
+
+@receiver(pre_delete, sender=Notificacao)
+def guardar_leitores_notificacao(sender, instance, **kwargs):
+    instance._leitores = _leitores(instance)
+
+
+@receiver(post_delete, sender=Notificacao)
+def atualizar_caixas_notificacao_apagada(sender, instance, **kwargs):
+    from .notificacoes import recalcular_caixas
+    recalcular_caixas(getattr(instance, '_leitores', set()))
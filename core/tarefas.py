@@ -0,0 +1,208 @@
+import os
+import socket
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+# Fila de tarefas em segundo plano, guardada na base de dados (modelo Tarefa),
+# sem broker externo. As views enfileiram o trabalho pesado com enfileirar()
+# e respondem logo com o URL de estado da tarefa (tarefa_estado), que a
+# interface consulta periodicamente; os processos de `manage.py run_workers`
+# executam-nas.
+#
+# Reserva: cada worker escolhe as tarefas disponíveis mais prioritárias e
+# reclama uma com um UPDATE condicionado ao estado lido. O UPDATE é atómico
+# em SQLite (também em modo WAL, que só admite um escritor de cada vez) e em
+# PostgreSQL, onde a leitura usa ainda SELECT ... FOR UPDATE SKIP LOCKED para
+# que workers concorrentes não disputem as mesmas linhas: uma tarefa nunca é
+# entregue a dois workers.
+#
+# Falhas: a tarefa volta a pendente com espera exponencial
+# (TAREFAS_ESPERA_BASE * 2^(tentativas-1), até TAREFAS_ESPERA_MAXIMA) até
+# max_tentativas, e fica falhada depois disso. Uma tarefa em execução há mais
+# de TAREFAS_TEMPO_LIMITE segundos (worker que morreu) volta a ser reservável.
+
+# Funções executáveis, por tipo: função(**argumentos) -> resultado (JSON)
+REGISTO = {}
+
+
+def tarefa(tipo):
+    """Decorador que regista a função que executa as tarefas do tipo indicado"""
+    def registar(funcao):
+        REGISTO[tipo] = funcao
+        return funcao
+    return registar
+
+
+def _definicao(nome, omissao):
+    return getattr(settings, nome, omissao)
+
+
+def enfileirar(tipo, prioridade=0, criado_por=None, executar_apos=None, max_tentativas=3, **argumentos):
+    """Cria uma tarefa pendente (visível aos workers quando a transação atual terminar)"""
+    from .models import Tarefa
+    if tipo not in REGISTO:
+        raise ValueError(f"Tipo de tarefa desconhecido: {tipo}")
+    return Tarefa.objects.create(
+        tipo=tipo,
+        argumentos=argumentos,
+        prioridade=prioridade,
+        criado_por=criado_por,
+        executar_apos=executar_apos or timezone.now(),
+        max_tentativas=max_tentativas,
+    )
+
+
+def _disponiveis(agora):
+    limite = agora - timedelta(seconds=_definicao('TAREFAS_TEMPO_LIMITE', 1800))
+    return (
+        Q(estado='pendente', executar_apos__lte=agora)
+        | Q(estado='em_execucao', reservada_em__lt=limite)
+    )
+
+
+def reservar_tarefa(worker, candidatas=10):
+    """Reclama a próxima tarefa disponível para `worker`; None se a fila estiver vazia"""
+    from .models import Tarefa
+    agora = timezone.now()
+    disponiveis = _disponiveis(agora)
+    with transaction.atomic():
+        fila = Tarefa.objects.filter(disponiveis).order_by('-prioridade', 'executar_apos', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            fila = fila.select_for_update(skip_locked=True)
+        for pk in fila.values_list('pk', flat=True)[:candidatas]:
+            # Só um worker consegue passar a tarefa para em_execucao
+            reclamada = Tarefa.objects.filter(disponiveis, pk=pk).update(
+                estado='em_execucao',
+                reservada_por=worker,
+                reservada_em=agora,
+                tentativas=F('tentativas') + 1,
+            )
+            if reclamada:
+                return Tarefa.objects.get(pk=pk)
+    return None
+
+
+def executar(tarefa):
+    """Executa uma tarefa reservada e regista o resultado (ou a falha e a próxima tentativa)"""
+    from .models import Tarefa
+    minha = Tarefa.objects.filter(pk=tarefa.pk, estado='em_execucao', reservada_por=tarefa.reservada_por)
+    try:
+        funcao = REGISTO[tarefa.tipo]
+        resultado = funcao(**tarefa.argumentos)
+    except Exception:
+        erro = traceback.format_exc()
+        if tarefa.tentativas < tarefa.max_tentativas:
+            espera = min(
+                _definicao('TAREFAS_ESPERA_BASE', 30) * 2 ** (tarefa.tentativas - 1),
+                _definicao('TAREFAS_ESPERA_MAXIMA', 3600),
+            )
+            minha.update(estado='pendente', erro=erro, reservada_por='', reservada_em=None,
+                         executar_apos=timezone.now() + timedelta(seconds=espera))
+        else:
+            minha.update(estado='falhada', erro=erro, data_conclusao=timezone.now())
+        return False
+    minha.update(estado='concluida', resultado=resultado, erro='', data_conclusao=timezone.now())
+    return True
+
+
+def nome_worker(indice=0):
+    return f"{socket.gethostname()}:{os.getpid()}:{indice}"
+
+
+def executar_worker(indice=0, parar=None, intervalo=None, ate_esvaziar=False):
+    """
+    Ciclo de um worker: reserva e executa tarefas até `parar` (threading ou
+    multiprocessing Event) ser assinalado, ou até a fila ficar vazia com
+    ate_esvaziar=True. Devolve o número de tarefas executadas.
+    """
+    if intervalo is None:
+        intervalo = _definicao('TAREFAS_INTERVALO', 1)
+    worker = nome_worker(indice)
+    executadas = 0
+    while not (parar and parar.is_set()):
+        close_old_connections()
+        try:
+            tarefa = reservar_tarefa(worker)
+        except OperationalError:
+            # Base de dados ocupada (ex: SQLite bloqueado por outro escritor)
+            tarefa = None
+        if tarefa is None:
+            if ate_esvaziar:
+                break
+            if parar:
+                parar.wait(intervalo)
+            else:
+                time.sleep(intervalo)
+            continue
+        executar(tarefa)
+        executadas += 1
+    close_old_connections()
+    return executadas
+
+
+def estado(tarefa):
+    """Representação JSON do estado de uma tarefa (para a interface)"""
+    return {
+        'id': tarefa.pk,
+        'tipo': tarefa.tipo,
+        'estado': tarefa.estado,
+        'estado_display': tarefa.get_estado_display(),
+        'tentativas': tarefa.tentativas,
+        'resultado': tarefa.resultado,
+        'concluida': tarefa.estado in ('concluida', 'falhada'),
+        'data_criacao': tarefa.data_criacao.isoformat(),
+        'data_conclusao': tarefa.data_conclusao.isoformat() if tarefa.data_conclusao else None,
+    }
+
+
+# --- Tarefas ---
+
+@tarefa('processar_aprovacoes')
+def _processar_aprovacoes(cursos=None):
+    """Classificação e aprovação de candidatos (todos os cursos ativos se `cursos` for None)"""
+    from .admissao import processar_aprovacoes
+    from .models import Curso
+    resultado = processar_aprovacoes(Curso.objects.filter(id__in=cursos) if cursos is not None else None)
+    return {
+        str(curso_id): {
+            'curso': resumo['curso'].nome,
+            'aprovados': resumo['aprovados'],
+            'classificados': resumo['classificados'],
+            'sem_nota': resumo['sem_nota'],
+        }
+        for curso_id, resumo in resultado.items()
+    }
+
+
+@tarefa('recibo_pagamento')
+def _recibo_pagamento(pagamento):
+    """Gera e guarda o recibo PDF de um pagamento de subscrição aprovado"""
+    from .models import PagamentoSubscricao
+    from .utils import gerar_recibo_pagamento
+    pagamento = PagamentoSubscricao.objects.select_related('subscricao', 'aprovado_por').get(pk=pagamento)
+    if not pagamento.recibo_pdf:
+        gerar_recibo_pagamento(pagamento)
+        pagamento.save(update_fields=['recibo_pdf'])
+    return {'recibo': pagamento.recibo_pdf.url}
+
+
+@tarefa('comprovativos_lote')
+def _comprovativos_lote(curso, autenticado_por, ano=None):
+    """ZIP com os comprovativos dos inscritos de um curso, guardado para descarregar (descarregar_comprovativos_lote)"""
+    import uuid
+    from .comprovativos import diretorio_lotes, escrever_zip_comprovativos
+    from .contexto import configuracao_escola
+    from .models import Curso, Inscricao
+    curso = Curso.objects.get(pk=curso)
+    inscricoes = Inscricao.objects.filter(curso=curso).select_related('curso', 'ano_academico').order_by('numero_inscricao')
+    if ano is not None:
+        inscricoes = inscricoes.filter(ano_academico_id=ano)
+    ficheiro = f"{uuid.uuid4().hex}.zip"
+    escrever_zip_comprovativos(os.path.join(diretorio_lotes(), ficheiro), inscricoes, configuracao_escola(), autenticado_por)
+    return {'ficheiro': ficheiro, 'curso': curso.codigo, 'total': inscricoes.count()}
@@ -1,3 +1,507 @@
-from django.test import TestCase
+import json
+import os
+import time
+import shutil
+import tempfile
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import agendador, coerencia, sequencias, tarefas
+from .admissao import lancar_notas_teste, ler_nota
+from .estatisticas import reconstruir_estatisticas, totais_inscricoes
+from .identidades import procurar_duplicado, procurar_identidade
+from .models import (
+    Aluno, AnoAcademico, Curso, Disciplina, EstatisticaInscricoes, Inscricao, NivelAcademico, NotaEstudante,
+    Notificacao, Professor, Sequencia, Tarefa, Turma,
+)
+from .pautas import carregar_matriz_notas, guardar_matriz_notas
+from .tarefas import enfileirar, executar_worker, reservar_tarefa
+
+
+def criar_curso(codigo='INF'):
+    grau, _ = NivelAcademico.objects.get_or_create(nome='Licenciatura')
+    return Curso.objects.create(codigo=codigo, nome=f"Curso {codigo}", grau=grau, vagas=10, duracao_meses=48)
+
+
+def criar_professor(n):
+    return Professor.objects.create(
+        nome_completo=f"Professor {n}", data_nascimento=date(1980, 1, 1), bilhete_identidade=f"BI-P{n}",
+        telefone=f"92{n:07d}", email=f"professor{n}@escola.ao", endereco='Luanda',
+    )
+
+
+def criar_inscricao(curso, bi, **campos):
+    return Inscricao.objects.create(
+        curso=curso, primeiro_nome='Ana', apelido='Silva', data_nascimento=date(2000, 1, 1),
+        bilhete_identidade=bi, sexo='F', endereco='Luanda', telefone='923000000', **campos,
+    )
+
+
+class LerNotaTest(SimpleTestCase):
+
+    def test_valores_validos(self):
+        self.assertEqual(ler_nota('12,5'), Decimal('12.50'))
+        self.assertEqual(ler_nota(' 14.25 '), Decimal('14.25'))
+        self.assertEqual(ler_nota('0'), Decimal('0.00'))
+        self.assertEqual(ler_nota(20), Decimal('20.00'))
+        self.assertEqual(ler_nota(9.5), Decimal('9.50'))
+
+    def test_vazia(self):
+        self.assertIsNone(ler_nota(None))
+        self.assertIsNone(ler_nota(''))
+        self.assertIsNone(ler_nota('   '))
+
+    def test_fora_da_escala(self):
+        for valor in ['20,01', '-1', '21', 25]:
+            with self.subTest(valor=valor), self.assertRaises(ValueError):
+                ler_nota(valor)
+
+    def test_nao_numericas(self):
+        for valor in ['nan', 'NaN', 'sNaN', 'inf', '-Infinity', float('nan'), '1e999999', 'abc', '1,2,3']:
+            with self.subTest(valor=valor), self.assertRaises(ValueError):
+                ler_nota(valor)
+
+
+class LancarNotasTesteTest(TestCase):
+
+    def test_rejeita_nan_sem_gravar(self):
+        inscricao = criar_inscricao(criar_curso(), '000111222LA001')
+        resumo = lancar_notas_teste({f'nota_{inscricao.id}': 'nan'})
+        self.assertEqual(resumo['rejeitadas'], 1)
+        inscricao.refresh_from_db()
+        self.assertIsNone(inscricao.nota_teste)
+
+    def test_grava_virgula_decimal(self):
+        inscricao = criar_inscricao(criar_curso(), '000111222LA002')
+        resumo = lancar_notas_teste({f'nota_{inscricao.id}': '15,75'})
+        self.assertEqual(resumo['atualizadas'], 1)
+        inscricao.refresh_from_db()
+        self.assertEqual(inscricao.nota_teste, Decimal('15.75'))
+
+
+class MatrizNotasTest(TestCase):
+
+    def setUp(self):
+        curso = criar_curso()
+        self.ano = AnoAcademico.objects.create(codigo='2025/2026')
+        self.turma = Turma.objects.create(nome='T1', curso=curso)
+        self.disciplinas = [Disciplina.objects.create(curso=curso, nome=nome) for nome in ('Álgebra', 'Física')]
+        self.alunos = [
+            Aluno.objects.create(
+                nome_completo=f"Aluno {i}", numero_estudante=f"E{i}", bilhete_identidade=f"BI-A{i}",
+                data_nascimento=date(2004, 1, 1), sexo='M', telefone='923000000',
+                email=f"aluno{i}@escola.ao", endereco='Luanda', turma=self.turma,
+            )
+            for i in range(2)
+        ]
+        self.professor = criar_professor(1)
+        self.outro_professor = criar_professor(2)
+
+    def matriz(self, notas):
+        matriz = carregar_matriz_notas(self.turma, self.ano)
+        matriz['notas'] = notas
+        return matriz
+
+    def test_celulas_vazias_nao_criam_linhas(self):
+        resumo = guardar_matriz_notas(self.turma, self.ano, self.professor, self.matriz([['12,5', None], ['', '']]))
+        self.assertEqual(resumo, {'gravadas': 1, 'inalteradas': 3, 'rejeitadas': 0})
+        self.assertEqual(NotaEstudante.objects.count(), 1)
+        self.assertEqual(carregar_matriz_notas(self.turma, self.ano)['notas'], [[Decimal('12.50'), None], [None, None]])
+
+    def test_professor_mantido_nas_notas_existentes(self):
+        guardar_matriz_notas(self.turma, self.ano, self.professor, self.matriz([['10', '11'], [None, None]]))
+        resumo = guardar_matriz_notas(self.turma, self.ano, self.outro_professor, self.matriz([['10', '15'], ['9', None]]))
+        self.assertEqual(resumo['gravadas'], 2)
+        professores = dict(NotaEstudante.objects.values_list('nota', 'professor_id'))
+        self.assertEqual(professores[Decimal('10.00')], self.professor.id)
+        self.assertEqual(professores[Decimal('15.00')], self.professor.id)
+        self.assertEqual(professores[Decimal('9.00')], self.outro_professor.id)
+
+    def test_limpar_nota_existente(self):
+        guardar_matriz_notas(self.turma, self.ano, self.professor, self.matriz([['10', None], [None, None]]))
+        resumo = guardar_matriz_notas(self.turma, self.ano, self.professor, self.matriz([[None, None], [None, None]]))
+        self.assertEqual(resumo['gravadas'], 1)
+        self.assertIsNone(NotaEstudante.objects.get().nota)
+
+    def test_rejeita_nan(self):
+        resumo = guardar_matriz_notas(self.turma, self.ano, self.professor, self.matriz([['nan', '21'], [None, None]]))
+        self.assertEqual(resumo['rejeitadas'], 2)
+        self.assertFalse(NotaEstudante.objects.exists())
+
+    def test_formato_invalido(self):
+        for matriz in ([], {'notas': 3}, {'alunos': [1], 'disciplinas': [1], 'notas': [5]}):
+            with self.subTest(matriz=matriz), self.assertRaises(ValueError):
+                guardar_matriz_notas(self.turma, self.ano, self.professor, matriz)
+
+    def test_view_responde_400_a_dados_invalidos(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@escola.ao', 'senha'))
+        url = reverse('matriz_notas_turma', args=[self.turma.id])
+        for corpo in ([1, 2], {'ano_academico': 'abc'}, {'ano_academico': self.ano.id, 'professor': 'x'},
+                      {'ano_academico': self.ano.id, 'professor': self.professor.id, 'notas': 'x'}):
+            with self.subTest(corpo=corpo):
+                resposta = self.client.post(url, json.dumps(corpo), content_type='application/json')
+                self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(self.client.get(url, {'ano': 'abc'}).status_code, 400)
+
+
+class EstatisticasTest(TestCase):
+
+    def test_ativos_separados_dos_matriculados(self):
+        curso = criar_curso()
+        criar_inscricao(curso, 'BI-1', aprovado=True, status='Matriculado')
+        criar_inscricao(curso, 'BI-2', aprovado=True, status='Matriculado', status_inscricao='ativo')
+        inscricao = criar_inscricao(curso, 'BI-3', aprovado=True)
+        inscricao.status, inscricao.status_inscricao = 'Matriculado', 'ativo'
+        inscricao.save()
+        totais = totais_inscricoes()
+        self.assertEqual((totais['matriculados'], totais['ativos']), (3, 2))
+        # Os totais mantidos a cada gravação coincidem com os recalculados
+        reconstruir_estatisticas()
+        self.assertEqual(totais_inscricoes(), totais)
+
+    def test_linhas_sem_ano_unicas(self):
+        curso = criar_curso()
+        ano = AnoAcademico.objects.create(codigo='2025/2026')
+        criar_inscricao(curso, 'BI-1')
+        criar_inscricao(curso, 'BI-2')
+        criar_inscricao(curso, 'BI-3', ano_academico=ano)
+        self.assertEqual(EstatisticaInscricoes.objects.filter(ano_academico__isnull=True).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            linha = EstatisticaInscricoes.objects.get(ano_academico__isnull=True)
+            EstatisticaInscricoes.objects.create(curso=curso, dia=linha.dia)
+        # Apagar o ano junta as suas linhas às linhas sem ano
+        ano.delete()
+        linha = EstatisticaInscricoes.objects.get()
+        self.assertIsNone(linha.ano_academico_id)
+        self.assertEqual(linha.inscritos, 3)
+
+
+class CoerenciaTest(TestCase):
+
+    def publicar_e_confirmar(self, *namespaces):
+        with self.captureOnCommitCallbacks(execute=True):
+            coerencia.publicar(*namespaces)
+            # Antes do commit os outros workers ainda não podem ver a nova versão
+            self.assertEqual(coerencia.verificar(forcar=True), set())
+        return coerencia.verificar(forcar=True)
+
+    def test_tabela(self):
+        coerencia.verificar(forcar=True)
+        # O incremento faz parte da transação (só esta ligação o vê antes do commit)
+        coerencia.publicar('config')
+        self.assertEqual(coerencia.verificar(forcar=True), {'config'})
+        coerencia.publicar('config', 'ano_atual')
+        self.assertEqual(coerencia.verificar(forcar=True), {'config', 'ano_atual'})
+
+    def test_ficheiros(self):
+        diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, diretorio)
+        with override_settings(CACHE_VERSOES_DIRETORIO=diretorio):
+            coerencia.verificar(forcar=True)
+            self.assertEqual(self.publicar_e_confirmar('config'), {'config'})
+            # Publicações seguidas (no mesmo tique do relógio) são todas detetadas
+            for _ in range(3):
+                self.assertEqual(self.publicar_e_confirmar('config'), {'config'})
+            self.assertEqual(coerencia.verificar(forcar=True), set())
+
+
+class MensagemGeralTest(TestCase):
+
+    def test_curso_e_turma_invalidos(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@escola.ao', 'senha'))
+        url = reverse('enviar_mensagem_geral')
+        for extra in ({'curso_id': 'abc'}, {'curso_id': '999'}, {'turma_id': '1; drop'}):
+            with self.subTest(extra=extra):
+                resposta = self.client.post(url, {'titulo': 'Aviso', 'mensagem': 'Texto', 'destinatario_grupo': 'todos', **extra})
+                self.assertEqual(resposta.status_code, 302)
+        self.assertFalse(Notificacao.objects.exists())
+
+        curso = criar_curso()
+        self.client.post(url, {'titulo': 'Aviso', 'mensagem': 'Texto', 'destinatario_grupo': 'todos', 'curso_id': str(curso.id)})
+        self.assertEqual(Notificacao.objects.get().publico_curso, curso)
+
+
+class HeartbeatSessaoTest(TestCase):
+
+    def test_tempo_restante(self):
+        from .sessoes import CHAVE_EXPIRACAO, SessionStore
+        self.client.force_login(User.objects.create_user('utilizador', password='senha'))
+        url = reverse('manter_sessao')
+
+        def expirar_em(segundos):
+            # Escrito diretamente na tabela: save() voltaria a pôr a expiração completa
+            sessao = SessionStore(self.client.session.session_key)
+            dados = sessao.load()
+            dados[CHAVE_EXPIRACAO] = int(time.time()) + segundos
+            Session.objects.filter(session_key=sessao.session_key).update(session_data=sessao.encode(dados))
+
+        # Mais de metade do tempo por gastar: a sessão não é regravada e expira quando estava previsto
+        expirar_em(1200)
+        self.assertAlmostEqual(self.client.get(url).json()['expira_em'], 1200, delta=2)
+        # Menos de metade: a sessão é renovada neste pedido
+        expirar_em(300)
+        self.assertEqual(self.client.get(url).json()['expira_em'], 1800)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 401)
+
+
+class ComprovativosLoteTest(TestCase):
+
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+        self.curso = criar_curso()
+        criar_inscricao(self.curso, '000111222LA010')
+        criar_inscricao(self.curso, '000111222LA011')
+        self.utilizador = User.objects.create_superuser('admin', 'admin@escola.ao', 'senha')
+        self.client.force_login(self.utilizador)
+
+    def test_ano_invalido_nao_enfileira(self):
+        for ano in ['abc', '999']:
+            with self.subTest(ano=ano):
+                resposta = self.client.post(reverse('gerar_comprovativos_lote'), {'curso': self.curso.id, 'ano': ano})
+                self.assertEqual(resposta.status_code, 302)
+        self.assertFalse(Tarefa.objects.exists())
+
+    def test_get_nao_permitido(self):
+        resposta = self.client.get(reverse('gerar_comprovativos_lote'), {'curso': self.curso.id})
+        self.assertEqual(resposta.status_code, 405)
+        self.assertFalse(Tarefa.objects.exists())
+
+    def test_gerado_pelo_worker_e_descarregado(self):
+        with self.settings(COMPROVATIVOS_DIRETORIO=self.diretorio, COMPROVATIVOS_PROCESSOS=1):
+            self.client.post(reverse('gerar_comprovativos_lote'), {'curso': self.curso.id})
+            tarefa = Tarefa.objects.get(tipo='comprovativos_lote')
+            self.assertEqual(executar_worker(ate_esvaziar=True), 1)
+
+            estado = self.client.get(reverse('tarefa_estado', args=[tarefa.id])).json()
+            self.assertEqual(estado['estado'], 'concluida')
+            self.assertEqual(estado['resultado']['total'], 2)
+            resposta = self.client.get(estado['descarregar_url'])
+            self.assertEqual(resposta.status_code, 200)
+            with zipfile.ZipFile(BytesIO(b''.join(resposta.streaming_content))) as arquivo:
+                self.assertEqual(len(arquivo.namelist()), 2)
+
+            self.client.force_login(User.objects.create_user('outro', password='senha'))
+            self.assertEqual(self.client.get(estado['descarregar_url']).status_code, 403)
+
+
+class ReciboTermicoSpoolTest(TestCase):
+
+    def setUp(self):
+        self.spool = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.spool)
+        self.inscricao = criar_inscricao(criar_curso(), '000111222LA020')
+        self.url = reverse('imprimir_recibo_termico', args=[self.inscricao.numero_inscricao])
+
+    def trabalhos(self):
+        return [nome for nome in os.listdir(self.spool) if nome.endswith('.bin')]
+
+    def test_get_so_descarrega(self):
+        with self.settings(ESCPOS_SPOOL_DIRETORIO=self.spool):
+            resposta = self.client.get(
+                reverse('gerar_recibo_termico', args=[self.inscricao.numero_inscricao]),
+                {'formato': 'escpos', 'destino': 'spool'},
+            )
+            self.assertEqual(resposta['Content-Type'], 'application/octet-stream')
+            self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.assertEqual(self.trabalhos(), [])
+
+    def test_pdf(self):
+        self.inscricao.criado_por = User.objects.create_user('atendente', first_name='Rosa', password='senha')
+        self.inscricao.save()
+        with self.settings(PDF_CACHE_DIRETORIO=self.spool):
+            resposta = self.client.get(reverse('gerar_recibo_termico', args=[self.inscricao.numero_inscricao]))
+            self.assertEqual(resposta.status_code, 200)
+            self.assertEqual(resposta['Content-Type'], 'application/pdf')
+            self.assertTrue(b''.join(resposta.streaming_content if resposta.streaming else [resposta.content]).startswith(b'%PDF'))
+
+    def test_post_exige_sessao_e_csrf(self):
+        with self.settings(ESCPOS_SPOOL_DIRETORIO=self.spool):
+            self.client.post(self.url)
+            self.assertEqual(self.trabalhos(), [])
+
+            cliente = self.client_class(enforce_csrf_checks=True)
+            cliente.force_login(User.objects.create_user('secretaria', password='senha'))
+            self.assertEqual(cliente.post(self.url).status_code, 403)
+            self.assertEqual(self.trabalhos(), [])
+
+            self.client.force_login(User.objects.get(username='secretaria'))
+            self.assertEqual(self.client.post(self.url).status_code, 302)
+        self.assertEqual(len(self.trabalhos()), 1)
+
+
+class ReservaTarefasTest(TestCase):
+
+    def setUp(self):
+        self.execucoes = []
+        tarefas.REGISTO['teste_contar'] = lambda n: self.execucoes.append(n) or n
+        self.addCleanup(tarefas.REGISTO.pop, 'teste_contar')
+
+    def test_uma_reserva_por_tarefa(self):
+        tarefa = enfileirar('teste_contar', n=1)
+        reservada = reservar_tarefa('worker-a')
+        self.assertEqual(reservada.pk, tarefa.pk)
+        self.assertEqual(reservada.reservada_por, 'worker-a')
+        self.assertEqual(reservada.tentativas, 1)
+        self.assertIsNone(reservar_tarefa('worker-b'))
+        self.assertIsNone(reservar_tarefa('worker-a'))
+
+    def test_cada_tarefa_executada_uma_vez(self):
+        for n in range(5):
+            enfileirar('teste_contar', n=n)
+        executadas = [executar_worker(indice, ate_esvaziar=True) for indice in range(3)]
+        self.assertEqual(executadas, [5, 0, 0])
+        self.assertEqual(sorted(self.execucoes), list(range(5)))
+        self.assertEqual(Tarefa.objects.filter(estado='concluida', tentativas=1).count(), 5)
+
+    def test_prioridade(self):
+        enfileirar('teste_contar', n=1)
+        urgente = enfileirar('teste_contar', prioridade=10, n=2)
+        self.assertEqual(reservar_tarefa('worker-a').pk, urgente.pk)
+
+    def test_abandonada_volta_a_fila_so_depois_do_limite(self):
+        enfileirar('teste_contar', n=1)
+        abandonada = reservar_tarefa('worker-a')
+        with self.settings(TAREFAS_TEMPO_LIMITE=60):
+            self.assertIsNone(reservar_tarefa('worker-b'))
+            Tarefa.objects.filter(pk=abandonada.pk).update(reservada_em=timezone.now() - timedelta(seconds=61))
+            retomada = reservar_tarefa('worker-b')
+        self.assertEqual(retomada.pk, abandonada.pk)
+        self.assertEqual(retomada.tentativas, 2)
+        # O worker antigo já não consegue registar o resultado por cima do novo
+        tarefas.executar(abandonada)
+        abandonada.refresh_from_db()
+        self.assertEqual((abandonada.estado, abandonada.reservada_por), ('em_execucao', 'worker-b'))
+
+
+def local(*partes):
+    return timezone.make_aware(datetime(*partes))
+
+
+class CronTest(SimpleTestCase):
+
+    def proxima(self, expressao, *apos):
+        return agendador.Cron(expressao).proxima(local(*apos))
+
+    def test_estritamente_depois(self):
+        self.assertEqual(self.proxima('0 * * * *', 2026, 10, 18, 9, 0), local(2026, 10, 18, 10, 0))
+        self.assertEqual(self.proxima('*/15 * * * *', 2026, 10, 18, 9, 14, 59), local(2026, 10, 18, 9, 15))
+
+    def test_mudanca_de_mes_e_de_ano(self):
+        self.assertEqual(self.proxima('0 0 1 * *', 2026, 10, 18, 10, 0), local(2026, 11, 1, 0, 0))
+        self.assertEqual(self.proxima('0 0 1 * *', 2026, 12, 15), local(2027, 1, 1, 0, 0))
+        self.assertEqual(self.proxima('59 23 31 12 *', 2026, 12, 31, 23, 59), local(2027, 12, 31, 23, 59))
+
+    def test_salta_meses_sem_o_dia(self):
+        self.assertEqual(self.proxima('0 0 31 * *', 2026, 4, 1), local(2026, 5, 31, 0, 0))
+        self.assertEqual(self.proxima('0 0 29 2 *', 2026, 3, 1), local(2028, 2, 29, 0, 0))
+
+    def test_dia_do_mes_ou_dia_da_semana(self):
+        # Dia 1 OU domingo: o domingo 25 chega antes do dia 1
+        self.assertEqual(self.proxima('0 12 1 * 7', 2026, 10, 18, 12, 0), local(2026, 10, 25, 12, 0))
+        self.assertEqual(self.proxima('0 12 1 * 0', 2026, 10, 18, 12, 0), local(2026, 10, 25, 12, 0))
+        # Só com um dos campos restrito, aplica-se esse
+        self.assertEqual(self.proxima('0 12 * * 3', 2026, 10, 18), local(2026, 10, 21, 12, 0))
+        self.assertEqual(self.proxima('30 9 * * 1-5', 2026, 10, 23, 10, 0), local(2026, 10, 26, 9, 30))
+
+    def test_invalidos(self):
+        for expressao in ['* * *', '60 * * * *', '* 24 * * *', '0 0 0 * *', '5-1 * * * *', '*/0 * * * *']:
+            with self.subTest(expressao=expressao), self.assertRaises(ValueError):
+                agendador.Cron(expressao)
+        with self.assertRaises(ValueError):
+            agendador.Cron('0 0 30 2 *').proxima(local(2026, 1, 1))
+
+
+class ReclamarAgendadaTest(TestCase):
+    NOME = 'encerrar_eventos'
+
+    def test_um_no_por_ocorrencia(self):
+        agora = timezone.now()
+        # A primeira vez só cria a linha, com a próxima ocorrência no futuro
+        self.assertFalse(agendador.reclamar(self.NOME, 'no-a', agora=agora))
+        devida = agora + timedelta(hours=1)
+        self.assertTrue(agendador.reclamar(self.NOME, 'no-a', agora=devida))
+        self.assertFalse(agendador.reclamar(self.NOME, 'no-b', agora=devida))
+        self.assertFalse(agendador.reclamar(self.NOME, 'no-a', agora=devida))
+        # forcar ignora o horário, mas não o bloqueio
+        self.assertFalse(agendador.reclamar(self.NOME, 'no-b', agora=devida, forcar=True))
+
+    def test_executada_marca_proxima_ocorrencia(self):
+        agora = timezone.now()
+        agendador.reclamar(self.NOME, 'no-a', agora=agora)
+        self.assertTrue(agendador.reclamar(self.NOME, 'no-a', agora=agora + timedelta(hours=1)))
+        self.assertTrue(agendador.executar(self.NOME, 'no-a'))
+        self.assertFalse(agendador.reclamar(self.NOME, 'no-b', agora=timezone.now()))
+        self.assertTrue(agendador.reclamar(self.NOME, 'no-b', agora=timezone.now(), forcar=True))
+
+    def test_bloqueio_de_no_que_morreu_expira(self):
+        agora = timezone.now()
+        agendador.reclamar(self.NOME, 'no-a', agora=agora)
+        devida = agora + timedelta(hours=1)
+        with self.settings(AGENDADOR_TEMPO_LIMITE=60):
+            self.assertTrue(agendador.reclamar(self.NOME, 'no-a', agora=devida))
+            self.assertFalse(agendador.reclamar(self.NOME, 'no-b', agora=devida + timedelta(seconds=30)))
+            self.assertTrue(agendador.reclamar(self.NOME, 'no-b', agora=devida + timedelta(seconds=61)))
+
+
+@override_settings(SEQUENCIAS_TAMANHO_BLOCO={'estudante': 5})
+class SequenciasBlocoTest(TestCase):
+
+    def setUp(self):
+        sequencias._blocos.clear()
+        self.addCleanup(sequencias._blocos.clear)
+
+    def contador(self):
+        return Sequencia.objects.filter(nome='estudante:ALU-').values_list('valor', flat=True).first()
+
+    def test_bloco_usado_depois_do_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sequencias.gerar_codigo('estudante'), 'ALU-000001')
+        self.assertEqual(
+            [sequencias.gerar_codigo('estudante') for _ in range(4)],
+            ['ALU-000002', 'ALU-000003', 'ALU-000004', 'ALU-000005'],
+        )
+        self.assertEqual(self.contador(), 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sequencias.gerar_codigo('estudante'), 'ALU-000006')
+        self.assertEqual(self.contador(), 10)
+
+    def test_bloco_revertido_nao_fica_em_cache(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(IntegrityError), transaction.atomic():
+                self.assertEqual(sequencias.gerar_codigo('estudante'), 'ALU-000001')
+                raise IntegrityError
+        self.assertNotIn('estudante:ALU-', sequencias._blocos)
+        self.assertIn(self.contador(), (None, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sequencias.gerar_codigo('estudante'), 'ALU-000001')
+        self.assertEqual(sequencias.gerar_codigo('estudante'), 'ALU-000002')
+
+
+class IdentidadesTest(TestCase):
+
+    def test_registo_sem_nome(self):
+        inscricao = criar_inscricao(criar_curso(), '000111222LA030', email='Ana@Escola.ao')
+        self.assertEqual(
+            set(inscricao.identidades.values_list('tipo', 'valor')),
+            {('bi', '000111222LA030'), ('email', 'ana@escola.ao'), ('telefone', '923000000')},
+        )
+        self.assertEqual(procurar_duplicado(bi='000111222-LA030', telefone='+244 923 000 000'), ('bi', inscricao.id))
+        self.assertEqual(procurar_identidade('telefone', '00244923000000').inscricao_id, inscricao.id)
+
+    def test_mudar_nome_nao_toca_no_registo(self):
+        inscricao = criar_inscricao(criar_curso(), '000111222LA031')
+        antes = list(inscricao.identidades.values_list('pk', flat=True))
+        inscricao.apelido = 'Costa'
+        inscricao.save()
+        self.assertEqual(list(inscricao.identidades.values_list('pk', flat=True)), antes)
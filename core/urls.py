@@ -46,6 +46,7 @@ urlpatterns = [
     path('candidatos/lista/', views.lista_inscritos, name='lista_inscritos'),
     path('candidatos/lancamento-notas/', views.lancamento_notas, name='lancamento_notas'),
     path('notas-matriculados/', views.notas_matriculados, name='notas_matriculados'),
+    path('notas-matriculados/turma/<int:turma_id>/matriz/', views.matriz_notas_turma, name='matriz_notas_turma'),
     path('candidatos/processar-aprovacao/', views.processar_aprovacao_vagas, name='processar_aprovacao_vagas'),
     path('consultar-aprovacao/', views.consultar_aprovacao, name='consultar_aprovacao'),
     path('admissao-estudantes/', views.admissao_estudantes, name='admissao_estudantes'),
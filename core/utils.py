@@ -1,48 +1,29 @@
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
 from reportlab.lib.units import cm
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_RIGHT
+from reportlab.platypus import Table, Paragraph, Spacer
 from django.core.files.base import ContentFile
 from io import BytesIO
 from datetime import datetime
-import os
+
+from .recursos_pdf import ESTILOS, TABELAS, documento_pdf, imagem_logo
 
 def gerar_recibo_pagamento(pagamento):
     """Gera um recibo PDF para um pagamento aprovado"""
-    from .models import ConfiguracaoEscola
-    from django.conf import settings
-    
     buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4)
+    doc = documento_pdf(buffer, 'recibo_pagamento')
     elements = []
-    styles = getSampleStyleSheet()
     
-    config = ConfiguracaoEscola.objects.first()
-    
-    logo_path = os.path.join(settings.BASE_DIR, 'core', 'static', 'core', 'images', 'siga-logo.png')
-    if os.path.exists(logo_path):
-        img = Image(logo_path, width=4*cm, height=1.5*cm)
-        elements.append(img)
+    logotipo = imagem_logo(4*cm, 1.5*cm)
+    if logotipo:
+        elements.append(logotipo)
         elements.append(Spacer(1, 0.5*cm))
     
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=30,
-        alignment=TA_CENTER
-    )
-    
-    elements.append(Paragraph(f"RECIBO DE PAGAMENTO", title_style))
-    elements.append(Paragraph(f"Nº {pagamento.id:06d}", styles['Normal']))
+    elements.append(Paragraph(f"RECIBO DE PAGAMENTO", ESTILOS['recibo_titulo']))
+    elements.append(Paragraph(f"Nº {pagamento.id:06d}", ESTILOS['normal']))
     elements.append(Spacer(1, 0.5*cm))
     
     data = [
         ['Escola:', pagamento.subscricao.nome_escola],
-        ['Plano:', pagamento.get_plano_escolhido_display()],
+        ['Plano:', dict(pagamento.subscricao.PLANO_CHOICES).get(pagamento.plano_escolhido, pagamento.plano_escolhido)],
         ['Valor Pago:', f"{pagamento.valor:,.2f} Kz"],
         ['Data do Pagamento:', pagamento.data_pagamento.strftime('%d/%m/%Y')],
         ['Referência:', pagamento.numero_referencia or 'N/A'],
@@ -51,35 +32,18 @@ def gerar_recibo_pagamento(pagamento):
         ['Nova Data de Expiração:', pagamento.subscricao.data_expiracao.strftime('%d/%m/%Y')],
     ]
     
-    table = Table(data, colWidths=[6*cm, 12*cm])
-    table.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e5e7eb')),
-        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, -1), 12),
-        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-        ('TOPPADDING', (0, 0), (-1, -1), 12),
-        ('GRID', (0, 0), (-1, -1), 1, colors.grey)
-    ]))
+    table = Table(data, colWidths=[6*cm, 12*cm], style=TABELAS['recibo_pagamento'])
     
     elements.append(table)
     elements.append(Spacer(1, 1*cm))
     
-    elements.append(Paragraph("Este recibo confirma o pagamento e renovação da subscrição do SIGA.", styles['Normal']))
+    elements.append(Paragraph("Este recibo confirma o pagamento e renovação da subscrição do SIGA.", ESTILOS['normal']))
     elements.append(Spacer(1, 0.5*cm))
-    elements.append(Paragraph(f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", styles['Normal']))
+    elements.append(Paragraph(f"Gerado em: {datetime.now().strftime('%d/%m/%Y às %H:%M')}", ESTILOS['normal']))
     
-    footer_style = ParagraphStyle(
-        'Footer',
-        parent=styles['Normal'],
-        fontSize=10,
-        textColor=colors.grey,
-        alignment=TA_CENTER
-    )
     elements.append(Spacer(1, 1*cm))
-    elements.append(Paragraph("SIGA v1.0.0 - Sistema Integral de Gestão Académica", footer_style))
-    elements.append(Paragraph("Desenvolvido por Eng. Osvaldo Queta", footer_style))
+    elements.append(Paragraph("SIGA v1.0.0 - Sistema Integral de Gestão Académica", ESTILOS['recibo_rodape']))
+    elements.append(Paragraph("Desenvolvido por Eng. Osvaldo Queta", ESTILOS['recibo_rodape']))
     
     doc.build(elements)
     
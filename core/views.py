@@ -1,4 +1,5 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse, FileResponse
 from django.utils import timezone
@@ -24,7 +25,7 @@ def registrar_horario(request):
     if ano_id:
         ano_sessao = get_object_or_404(AnoAcademico, id=ano_id)
     else:
-        ano_sessao = AnoAcademico.get_atual()
+        ano_sessao = request.academico.ano_atual
 
     periodo_ativo = PeriodoLectivo.objects.filter(ano_lectivo=ano_sessao, ativo=True).first()
     periodos = PeriodoLectivo.objects.filter(ano_lectivo=ano_sessao)
@@ -113,7 +114,7 @@ def configuracoes_globais(request):
     if not config_academica:
         config_academica = ConfiguracaoAcademica.objects.create()
     
-    config_escola = ConfiguracaoEscola.objects.first()
+    config_escola = request.academico.config
     
     if request.method == 'POST':
         config_academica.percentagem_prova_continua = request.POST.get('pc', 40)
@@ -152,7 +153,12 @@ from django.contrib.auth import authenticate, login as auth_login, logout as aut
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.db.models import Q
-from django.db import IntegrityError
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from .contadores import VagasEsgotadas
+from .notificacoes import utilizadores_do_publico
+from .senhas import MENSAGEM_SENHA_EM_USO, preencher_impressao, registar_senha, senha_em_uso
+from .identidades import procurar_duplicado, procurar_identidade
 import json
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -187,7 +193,7 @@ def notas_matriculados(request):
     # Busca o ano acadêmico ativo se não for passado via GET
     ano_sel = request.GET.get('ano')
     if not ano_sel or ano_sel == '':
-        ano_ativo = AnoAcademico.get_atual()
+        ano_ativo = request.academico.ano_atual
         if ano_ativo:
             ano_sel = str(ano_ativo.id)
     
@@ -229,21 +235,21 @@ def notas_matriculados(request):
         if not all([ano_sel, turma_sel, disciplina_sel, professor_sel]):
             messages.error(request, "Selecione todos os filtros antes de salvar.")
         else:
-            for key, value in request.POST.items():
-                if key.startswith('nota_'):
-                    aluno_id = key.split('_')[1]
-                    try:
-                        nota_val = float(value.replace(',', '.')) if value else None
-                        NotaEstudante.objects.update_or_create(
-                            ano_academico_id=ano_id_int,
-                            turma_id=turma_sel,
-                            disciplina_id=disciplina_sel,
-                            aluno_id=aluno_id,
-                            defaults={'professor_id': professor_sel, 'nota': nota_val}
-                        )
-                    except ValueError:
-                        pass
+            from .pautas import guardar_notas
+            celulas = [
+                (key.split('_')[1], disciplina_sel, value)
+                for key, value in request.POST.items() if key.startswith('nota_')
+            ]
+            resumo = guardar_notas(
+                get_object_or_404(Turma, id=turma_sel),
+                get_object_or_404(AnoAcademico, id=ano_id_int),
+                get_object_or_404(Professor, id=professor_sel),
+                celulas,
+                atualizar_professor=True,
+            )
             messages.success(request, "Notas salvas com sucesso!")
+            if resumo['rejeitadas']:
+                messages.warning(request, f"{resumo['rejeitadas']} nota(s) ignorada(s) por serem inválidas.")
             
     # Carregar notas existentes
     notas_existentes = {}
@@ -270,22 +276,59 @@ def notas_matriculados(request):
         'notas_existentes': notas_existentes
     })
 
+@login_required
+def matriz_notas_turma(request, turma_id):
+    """Pauta da turma (alunos × disciplinas) em JSON; POST grava a pauta inteira de uma vez"""
+    from .models import Turma, Professor
+    from .pautas import carregar_matriz_notas, guardar_matriz_notas
+
+    turma = get_object_or_404(Turma, id=turma_id)
+
+    if request.method == 'POST':
+        try:
+            dados = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'JSON inválido'}, status=400)
+        if not isinstance(dados, dict):
+            return JsonResponse({'success': False, 'error': 'A pauta deve ser um objeto JSON'}, status=400)
+        ano_id = dados.get('ano_academico')
+    else:
+        dados = {}
+        ano_id = request.GET.get('ano')
+
+    if ano_id:
+        try:
+            ano = get_object_or_404(AnoAcademico, id=int(ano_id))
+        except (TypeError, ValueError):
+            return JsonResponse({'success': False, 'error': 'Ano académico inválido'}, status=400)
+    else:
+        ano = turma.ano_lectivo or request.academico.ano_atual
+    if not ano:
+        return JsonResponse({'success': False, 'error': 'Ano académico não definido'}, status=400)
+
+    if request.method == 'POST':
+        if request.user.perfil.nivel_acesso == 'professor':
+            professor = Professor.objects.filter(user=request.user).first()
+        else:
+            try:
+                professor_id = int(dados['professor']) if dados.get('professor') else None
+            except (TypeError, ValueError):
+                return JsonResponse({'success': False, 'error': 'Professor inválido'}, status=400)
+            professor = Professor.objects.filter(id=professor_id).first() if professor_id else None
+        if not professor:
+            return JsonResponse({'success': False, 'error': 'Professor não definido'}, status=400)
+        try:
+            resumo = guardar_matriz_notas(turma, ano, professor, dados)
+        except ValueError as erro:
+            return JsonResponse({'success': False, 'error': str(erro)}, status=400)
+        return JsonResponse({'success': True, **resumo})
+
+    return JsonResponse(carregar_matriz_notas(turma, ano))
+
 def processar_aprovacoes_curso(curso_id):
+    from .admissao import processar_aprovacoes
     curso = Curso.objects.get(id=curso_id)
-    inscricoes_com_nota = curso.inscricoes.filter(nota_teste__isnull=False, nota_teste__gte=curso.nota_minima).order_by('-nota_teste')
-    
-    for inscricao in curso.inscricoes.all():
-        inscricao.aprovado = False
-        inscricao.save()
-    
-    vagas_disponiveis = curso.vagas
-    for i, inscricao in enumerate(inscricoes_com_nota):
-        if i < vagas_disponiveis:
-            inscricao.aprovado = True
-            inscricao.data_resultado = timezone.now()
-            inscricao.save()
-    
-    messages.success(None, 'Processo de aprovação concluído com sucesso!')
+    return processar_aprovacoes([curso])[curso.id]
 
 def index_redirect(request):
     """Redireciona para login se não autenticado, caso contrário para painel principal"""
@@ -300,13 +343,13 @@ def index(request):
 @login_required
 def painel_principal(request):
     from .models import AnoAcademico, Curso, Inscricao, Reclamacao, EventoCalendario
-    ano_atual = AnoAcademico.objects.filter(ano_atual=True).first()
+    ano_atual = request.academico.ano_atual
     semestre_atual = None
     if ano_atual:
         semestre_atual = ano_atual.semestres.filter(ativo=True).first()
     
     cursos = Curso.objects.filter(ativo=True)
-    config = ConfiguracaoEscola.objects.first()
+    config = request.academico.config
     anos_academicos = AnoAcademico.objects.all()
     
     # Eventos para o Painel
@@ -358,6 +401,13 @@ def painel_principal(request):
         'eventos_ticker': eventos_ticker,
     })
 
+# Tipo de identidade duplicada -> (mensagem, passo do formulário, campo com erro)
+DUPLICADOS_INSCRICAO = {
+    'bi': ('Este Bilhete de Identidade já está registrado no sistema!', 1, 'bilhete_identidade'),
+    'email': ('Este email já está sendo usado em outra inscrição!', 2, 'email_recuperacao'),
+    'telefone': ('Este telefone já está sendo usado em outra inscrição!', 2, 'telefone'),
+}
+
 @login_required
 def inscricao_create(request):
     """View para criar inscrição. O curso deve ser selecionado no formulário."""
@@ -366,7 +416,7 @@ def inscricao_create(request):
     periodos_lectivos = PeriodoLectivo.objects.all()
     
     # Verificar calendário
-    ano_atual = AnoAcademico.objects.filter(ano_atual=True).first()
+    ano_atual = request.academico.ano_atual
     if not ano_atual or not ano_atual.inscricoes_abertas():
         messages.error(request, "As inscrições não estão abertas no momento.")
         return redirect('index')
@@ -396,31 +446,22 @@ def inscricao_create(request):
             messages.error(request, f'O curso "{curso.nome}" está indisponível.')
             return render(request, 'core/inscricao_form.html', context)
             
-        # Verificar vagas
-        if curso.vagas <= curso.inscricoes.count():
+        # Verificar vagas (contador do curso; a reserva definitiva é feita ao gravar a inscrição)
+        if curso.total_inscritos >= curso.vagas:
             messages.error(request, f'Lamentamos, mas não há mais vagas disponíveis para o curso "{curso.nome}".')
             return render(request, 'core/inscricao_form.html', context)
 
-        # ... (validações BI, email, telefone permanecem iguais)
-        bilhete_identidade = request.POST.get('bilhete_identidade')
-        if bilhete_identidade and Inscricao.objects.filter(bilhete_identidade=bilhete_identidade).exists():
-            messages.error(request, 'Este Bilhete de Identidade já está registrado no sistema!')
-            context['current_step'] = 1
-            context['error_field'] = 'bilhete_identidade'
-            return render(request, 'core/inscricao_form.html', context)
-        
-        email_check = request.POST.get('email_recuperacao') or request.POST.get('email')
-        if email_check and Inscricao.objects.filter(email=email_check).exists():
-            messages.error(request, 'Este email já está sendo usado em outra inscrição!')
-            context['current_step'] = 2
-            context['error_field'] = 'email_recuperacao'
-            return render(request, 'core/inscricao_form.html', context)
-        
-        telefone = request.POST.get('telefone')
-        if telefone and Inscricao.objects.filter(telefone=telefone).exists():
-            messages.error(request, 'Este telefone já está sendo usado em outra inscrição!')
-            context['current_step'] = 2
-            context['error_field'] = 'telefone'
+        # BI, email e telefone já registados (uma consulta ao registo de identidades)
+        duplicado = procurar_duplicado(
+            bi=request.POST.get('bilhete_identidade'),
+            email=request.POST.get('email_recuperacao') or request.POST.get('email'),
+            telefone=request.POST.get('telefone'),
+        )
+        if duplicado:
+            mensagem, passo, campo = DUPLICADOS_INSCRICAO[duplicado[0]]
+            messages.error(request, mensagem)
+            context['current_step'] = passo
+            context['error_field'] = campo
             return render(request, 'core/inscricao_form.html', context)
 
         # 1. Informações Pessoais
@@ -452,73 +493,76 @@ def inscricao_create(request):
                 context['error_field'] = 'email_recuperacao'
                 return render(request, 'core/inscricao_form.html', context)
             
-            user = User.objects.create_user(
-                username=username,
-                email=email,
-                password=password,
-                first_name=request.POST['primeiro_nome'],
-                last_name=request.POST['apelido']
-            )
+            # Utilizador e inscrição são criados juntos: se as vagas esgotarem entretanto, nada fica gravado
+            with transaction.atomic():
+                user = User.objects.create_user(
+                    username=username,
+                    email=email,
+                    password=password,
+                    first_name=request.POST['primeiro_nome'],
+                    last_name=request.POST['apelido']
+                )
+                registar_senha(user, password)
             
-            # Criar perfil para o usuário
-            perfil, created = PerfilUsuario.objects.get_or_create(user=user)
-            perfil.nivel_acesso = 'estudante'
-            perfil.telefone = request.POST['telefone']
-            perfil.save()
-
-            # Obter ano académico da sessão ou padrão
-            ano_id = request.session.get('ano_academico_id')
-            if ano_id:
-                ano_referencia = get_object_or_404(AnoAcademico, id=ano_id)
-            else:
-                ano_referencia = AnoAcademico.get_atual()
+                # Criar perfil para o usuário
+                perfil, created = PerfilUsuario.objects.get_or_create(user=user)
+                perfil.nivel_acesso = 'estudante'
+                perfil.telefone = request.POST['telefone']
+                perfil.save()
 
-            inscricao = Inscricao(
-                user=user,  # Associar a inscrição ao usuário criado
-                curso=curso,
-                ano_academico=ano_referencia,
-                primeiro_nome=request.POST.get('primeiro_nome'),
-                nomes_meio=request.POST.get('nomes_meio', ''),
-                apelido=request.POST.get('apelido'),
-                data_nascimento=request.POST.get('data_nascimento'),
-                local_nascimento=request.POST.get('local_nascimento'),
-                nacionalidade=request.POST.get('nacionalidade'),
-                bilhete_identidade=request.POST.get('bilhete_identidade'),
-                data_validade_bi=request.POST.get('data_validade_bi') or None,
-                sexo=request.POST.get('sexo'),
-                estado_civil=request.POST.get('estado_civil', 'S'),
-                endereco=request.POST.get('endereco', 'N/A'),
-                telefone=request.POST.get('telefone'),
-                email=request.POST.get('email_recuperacao') or request.POST.get('email'),
-                criado_por=request.user if request.user.is_authenticated else None,
-                # Foto e Documentos
-                foto=request.FILES.get('foto'),
-                arquivo_bi=request.FILES.get('arquivo_bi'),
-                arquivo_certificado=request.FILES.get('arquivo_certificado'),
-                status_inscricao='submetida',
-                # 2. Informações Académicas
-                escola=escola,
-                ano_conclusao=request.POST.get('ano_conclusao', 2024),
-                certificados_obtidos=request.POST.get('certificados_obtidos', ''),
-                historico_escolar=request.POST.get('historico_escolar', ''),
-                turno_preferencial=request.POST.get('turno', 'Manhã'),
-                # 3. Informações Financeiras
-                metodo_pagamento=request.POST.get('metodo_pagamento', 'multicaixa'),
-                comprovativo_pagamento=request.FILES.get('comprovativo_pagamento'),
-                numero_comprovante=request.POST.get('numero_comprovante', ''),
-                responsavel_financeiro_nome=request.POST.get('responsavel_financeiro_nome', ''),
-                responsavel_financeiro_telefone=request.POST.get('responsavel_financeiro_telefone', ''),
-                responsavel_financeiro_relacao=request.POST.get('responsavel_financeiro_relacao', ''),
-                # 4. Responsáveis
-                responsavel_legal_nome=request.POST.get('responsavel_legal_nome', ''),
-                responsavel_legal_vinculo=request.POST.get('responsavel_legal_vinculo', ''),
-                responsavel_legal_telefone=request.POST.get('responsavel_legal_telefone', ''),
-                responsavel_pedagogico_nome=request.POST.get('responsavel_pedagogico_nome', ''),
-                responsavel_pedagogico_vinculo=request.POST.get('responsavel_pedagogico_vinculo', ''),
-                responsavel_pedagogico_telefone=request.POST.get('responsavel_pedagogico_telefone', ''),
-            )
+                # Obter ano académico da sessão ou padrão
+                ano_id = request.session.get('ano_academico_id')
+                if ano_id:
+                    ano_referencia = get_object_or_404(AnoAcademico, id=ano_id)
+                else:
+                    ano_referencia = request.academico.ano_atual
+
+                inscricao = Inscricao(
+                    user=user,  # Associar a inscrição ao usuário criado
+                    curso=curso,
+                    ano_academico=ano_referencia,
+                    primeiro_nome=request.POST.get('primeiro_nome'),
+                    nomes_meio=request.POST.get('nomes_meio', ''),
+                    apelido=request.POST.get('apelido'),
+                    data_nascimento=request.POST.get('data_nascimento'),
+                    local_nascimento=request.POST.get('local_nascimento'),
+                    nacionalidade=request.POST.get('nacionalidade'),
+                    bilhete_identidade=request.POST.get('bilhete_identidade'),
+                    data_validade_bi=request.POST.get('data_validade_bi') or None,
+                    sexo=request.POST.get('sexo'),
+                    estado_civil=request.POST.get('estado_civil', 'S'),
+                    endereco=request.POST.get('endereco', 'N/A'),
+                    telefone=request.POST.get('telefone'),
+                    email=request.POST.get('email_recuperacao') or request.POST.get('email'),
+                    criado_por=request.user if request.user.is_authenticated else None,
+                    # Foto e Documentos
+                    foto=request.FILES.get('foto'),
+                    arquivo_bi=request.FILES.get('arquivo_bi'),
+                    arquivo_certificado=request.FILES.get('arquivo_certificado'),
+                    status_inscricao='submetida',
+                    # 2. Informações Académicas
+                    escola=escola,
+                    ano_conclusao=request.POST.get('ano_conclusao', 2024),
+                    certificados_obtidos=request.POST.get('certificados_obtidos', ''),
+                    historico_escolar=request.POST.get('historico_escolar', ''),
+                    turno_preferencial=request.POST.get('turno', 'Manhã'),
+                    # 3. Informações Financeiras
+                    metodo_pagamento=request.POST.get('metodo_pagamento', 'multicaixa'),
+                    comprovativo_pagamento=request.FILES.get('comprovativo_pagamento'),
+                    numero_comprovante=request.POST.get('numero_comprovante', ''),
+                    responsavel_financeiro_nome=request.POST.get('responsavel_financeiro_nome', ''),
+                    responsavel_financeiro_telefone=request.POST.get('responsavel_financeiro_telefone', ''),
+                    responsavel_financeiro_relacao=request.POST.get('responsavel_financeiro_relacao', ''),
+                    # 4. Responsáveis
+                    responsavel_legal_nome=request.POST.get('responsavel_legal_nome', ''),
+                    responsavel_legal_vinculo=request.POST.get('responsavel_legal_vinculo', ''),
+                    responsavel_legal_telefone=request.POST.get('responsavel_legal_telefone', ''),
+                    responsavel_pedagogico_nome=request.POST.get('responsavel_pedagogico_nome', ''),
+                    responsavel_pedagogico_vinculo=request.POST.get('responsavel_pedagogico_vinculo', ''),
+                    responsavel_pedagogico_telefone=request.POST.get('responsavel_pedagogico_telefone', ''),
+                )
             
-            inscricao.save()
+                inscricao.save(validar_vagas=True)
 
             # Se houver foto em base64 (capturada pela webcam), salvar agora
             foto_base64 = request.POST.get('foto_base64')
@@ -534,6 +578,9 @@ def inscricao_create(request):
                 except Exception as e:
                     print(f"Erro ao salvar foto base64: {e}")
 
+        except VagasEsgotadas:
+            messages.error(request, f'Lamentamos, mas não há mais vagas disponíveis para o curso "{curso.nome}".')
+            return render(request, 'core/inscricao_form.html', context)
         except Exception as e:
             messages.error(request, f'Erro ao processar inscrição: {str(e)}')
             return render(request, 'core/inscricao_form.html', context)
@@ -564,7 +611,10 @@ def inscricao_create(request):
 
 def inscricao_consulta(request, numero):
     inscricao = get_object_or_404(Inscricao, numero_inscricao=numero)
-    return render(request, 'core/inscricao_espelho.html', {'inscricao': inscricao})
+    return render(request, 'core/inscricao_espelho.html', {
+        'inscricao': inscricao,
+        'spool_termico': impressora_spool() is not None,
+    })
 
 def inscricao_buscar(request):
     if request.method == 'POST':
@@ -580,6 +630,21 @@ def inscricao_buscar(request):
 
 import qrcode
 from django.core.files.base import ContentFile
+from .comprovativos import VERSAO as VERSAO_PDF_COMPROVATIVO, dados_comprovativo, desenhar_comprovativo
+from .escpos import impressora_spool, recibo_termico as recibo_termico_escpos
+from .documentos import ContextoDocumento, compilar as compilar_documento, dados_inscricao, inscricoes_para, validar_conteudo
+from .pdfcache import servir as servir_pdf
+from .tarefas import enfileirar, estado as estado_tarefa
+from .recursos_pdf import (
+    ESTILOS, TABELAS, TabelaContinua, documento_pdf, ficheiro_pdf_temporario, imagem_logo, rodape_paginas,
+)
+
+# Versões do layout dos PDFs em cache (core.pdfcache): incrementar ao alterar o gerador
+VERSAO_PDF_RECIBO_TERMICO = 1
+VERSAO_PDF_DOCUMENTO = 1
+
+# Linhas lidas da base de dados de cada vez nas listas em PDF
+LISTA_PDF_BLOCO = 500
 
 def gerar_lista_aprovados_pdf(request):
     """Gera uma lista de candidatos aprovados em PDF para um curso específico"""
@@ -590,49 +655,33 @@ def gerar_lista_aprovados_pdf(request):
     
     curso = get_object_or_404(Curso, id=curso_id)
     inscricoes = Inscricao.objects.filter(curso=curso, aprovado=True).order_by('primeiro_nome', 'apelido')
+    primeira = inscricoes.select_related('ano_academico').only('ano_academico').first()
     
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm, leftMargin=2*cm, rightMargin=2*cm)
+    ficheiro = ficheiro_pdf_temporario()
+    doc = documento_pdf(ficheiro, 'lista')
     elements = []
-    styles = getSampleStyleSheet()
-    
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )
-    elements.append(Paragraph(f"Lista de Candidatos Aprovados/Admitidos", title_style))
-    elements.append(Paragraph(f"Curso: {curso.nome}", styles['Heading2']))
-    elements.append(Paragraph(f"Ano Académico: {inscricoes.first().ano_academico if inscricoes.exists() else '-'}", styles['Normal']))
+    
+    elements.append(Paragraph(f"Lista de Candidatos Aprovados/Admitidos", ESTILOS['lista_titulo']))
+    elements.append(Paragraph(f"Curso: {curso.nome}", ESTILOS['titulo2']))
+    elements.append(Paragraph(f"Ano Académico: {primeira.ano_academico if primeira else '-'}", ESTILOS['normal']))
     elements.append(Spacer(1, 0.5*cm))
     
-    data = [['Nº', 'Nome Completo', 'BI', 'Nota']]
-    for i, insc in enumerate(inscricoes, 1):
-        data.append([
-            str(i),
-            f"{insc.primeiro_nome} {insc.nomes_meio} {insc.apelido}".strip(),
-            insc.bilhete_identidade,
-            str(insc.nota_teste) if insc.nota_teste is not None else "-"
-        ])
-    
-    t = Table(data, colWidths=[1*cm, 9*cm, 4*cm, 3*cm])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#059669')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-    ]))
-    elements.append(t)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="aprovados_{curso.codigo}.pdf"'
-    return response
+    # Só as colunas da lista, lidas em blocos à medida que as páginas são desenhadas
+    def linhas():
+        campos = inscricoes.values_list('primeiro_nome', 'nomes_meio', 'apelido', 'bilhete_identidade', 'nota_teste')
+        for i, (primeiro_nome, nomes_meio, apelido, bi, nota) in enumerate(campos.iterator(chunk_size=LISTA_PDF_BLOCO), 1):
+            yield [
+                str(i),
+                f"{primeiro_nome} {nomes_meio} {apelido}".strip(),
+                bi,
+                str(nota) if nota is not None else "-"
+            ]
+    
+    elements.append(TabelaContinua(['Nº', 'Nome Completo', 'BI', 'Nota'], linhas(), [1*cm, 9*cm, 4*cm, 3*cm], TABELAS['aprovados']))
+    
+    doc.build(elements, onFirstPage=rodape_paginas, onLaterPages=rodape_paginas)
+    ficheiro.seek(0)
+    return FileResponse(ficheiro, content_type='application/pdf', filename=f"aprovados_{curso.codigo}.pdf")
 
 def gerar_lista_inscritos_pdf(request):
     """Gera uma lista de inscritos em PDF para um curso específico"""
@@ -643,248 +692,167 @@ def gerar_lista_inscritos_pdf(request):
     
     curso = get_object_or_404(Curso, id=curso_id)
     inscricoes = Inscricao.objects.filter(curso=curso).order_by('primeiro_nome', 'apelido')
-    config = ConfiguracaoEscola.objects.first()
     
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm, leftMargin=2*cm, rightMargin=2*cm)
+    ficheiro = ficheiro_pdf_temporario()
+    doc = documento_pdf(ficheiro, 'lista')
     elements = []
-    styles = getSampleStyleSheet()
     
     # Título
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=16,
-        alignment=TA_CENTER,
-        spaceAfter=20
-    )
-    elements.append(Paragraph(f"Lista de Inscritos - {curso.nome}", title_style))
-    
-    # Tabela de Estudantes
-    data = [['Nº', 'Nome Completo', 'BI', 'Estado']]
-    for i, insc in enumerate(inscricoes, 1):
-        estado = "Aprovado" if insc.aprovado else ("Não Selecionado" if insc.nota_teste is not None else "Sem Nota")
-        data.append([
-            str(i),
-            f"{insc.primeiro_nome} {insc.nomes_meio} {insc.apelido}".strip(),
-            insc.bilhete_identidade,
-            estado
-        ])
-    
-    t = Table(data, colWidths=[1*cm, 9.5*cm, 4*cm, 3.5*cm])
-    t.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3a8a')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-        ('FONTSIZE', (0, 0), (-1, 0), 10),
-        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-        ('FONTSIZE', (0, 1), (-1, -1), 9),
-        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ('LEFTPADDING', (0, 0), (-1, -1), 5),
-        ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-    ]))
-    elements.append(t)
-    
-    doc.build(elements)
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="lista_inscritos_{curso.nome}.pdf"'
-    return response
+    elements.append(Paragraph(f"Lista de Inscritos - {curso.nome}", ESTILOS['lista_titulo']))
+    
+    # Tabela de Estudantes (só as colunas da lista, lidas em blocos à medida que as páginas são desenhadas)
+    def linhas():
+        campos = inscricoes.values_list('primeiro_nome', 'nomes_meio', 'apelido', 'bilhete_identidade', 'aprovado', 'nota_teste')
+        for i, (primeiro_nome, nomes_meio, apelido, bi, aprovado, nota) in enumerate(campos.iterator(chunk_size=LISTA_PDF_BLOCO), 1):
+            estado = "Aprovado" if aprovado else ("Não Selecionado" if nota is not None else "Sem Nota")
+            yield [
+                str(i),
+                f"{primeiro_nome} {nomes_meio} {apelido}".strip(),
+                bi,
+                estado
+            ]
+    
+    elements.append(TabelaContinua(['Nº', 'Nome Completo', 'BI', 'Estado'], linhas(), [1*cm, 9.5*cm, 4*cm, 3.5*cm], TABELAS['inscritos']))
+    
+    doc.build(elements, onFirstPage=rodape_paginas, onLaterPages=rodape_paginas)
+    ficheiro.seek(0)
+    return FileResponse(ficheiro, content_type='application/pdf', filename=f"lista_inscritos_{curso.nome}.pdf")
 
 def gerar_pdf_confirmacao(request, numero):
     inscricao = get_object_or_404(Inscricao, numero_inscricao=numero)
-    config = ConfiguracaoEscola.objects.first()
-    
-    buffer = BytesIO()
-    # Margens reduzidas para caber duas partes
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=1*cm, bottomMargin=1*cm, leftMargin=1.5*cm, rightMargin=1.5*cm)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    def criar_parte(titulo_adicional=""):
-        parte = []
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            textColor='#1a1a1a',
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=12,
-            textColor='#333333',
-            alignment=TA_CENTER
-        )
-        
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=10,
-            textColor='#000000',
-            alignment=TA_LEFT
-        )
+    config = request.academico.config
+    autenticado_por = request.user.get_full_name() or request.user.username
+    dados_pdf = dados_comprovativo(inscricao, config, autenticado_por)
+    
+    return servir_pdf(
+        request, 'comprovativo', VERSAO_PDF_COMPROVATIVO, dados_pdf,
+        lambda ficheiro: desenhar_comprovativo(ficheiro, dados_pdf),
+        f"comprovativo_{inscricao.numero_inscricao}.pdf", anexo=True
+    )
 
-        # Logo
-        logo_path = os.path.join(settings.BASE_DIR, 'core', 'static', 'core', 'images', 'siga-logo.png')
-        if os.path.exists(logo_path):
-            try:
-                img = Image(logo_path, width=3*cm, height=1.2*cm)
-                img.hAlign = 'CENTER'
-                parte.append(img)
-            except: pass
-        
-        escola_nome = config.nome_escola if config else "Sistema Escolar"
-        parte.append(Paragraph(escola_nome.upper(), title_style))
-        parte.append(Paragraph(f"COMPROVATIVO DE INSCRIÇÃO {titulo_adicional}", heading_style))
-        parte.append(Spacer(1, 0.3*cm))
-        
-        # QR Code
-        # Dados: RECIBO, CANDIDATURA, VALOR, ANO LECTIVO
-        valor_inscricao = "5.000,00 Kz" # Valor padrão ou buscar do modelo se existir
-        ano_lectivo = str(inscricao.ano_academico) if hasattr(inscricao, 'ano_academico') else "2025/2026"
-        qr_data = f"RECIBO: {inscricao.numero_inscricao}\nCANDIDATURA: {inscricao.nome_completo}\nVALOR: {valor_inscricao}\nANO: {ano_lectivo}"
-        
-        try:
-            from qrcode.main import QRCode
-            from reportlab.platypus import Table, TableStyle
-            qr = QRCode(version=1, box_size=10, border=1)
-            qr.add_data(qr_data)
-            qr.make(fit=True)
-            img_qr = qr.make_image(fill_color="black", back_color="white")
-            
-            qr_buffer = BytesIO()
-            img_qr.save(qr_buffer, format='PNG')
-            qr_buffer.seek(0)
-            qr_img = Image(qr_buffer, width=3*cm, height=3*cm)
-            qr_img.hAlign = 'RIGHT'
-        except Exception as e:
-            print(f"Erro QR Code: {e}")
-            qr_img = Spacer(3*cm, 3*cm)
-
-        # Tabela de dados
-        dados_tabela = [
-            [Paragraph(f"<b>Candidato:</b> {inscricao.nome_completo}", normal_style), qr_img],
-            [Paragraph(f"<b>Curso:</b> {inscricao.curso.nome}", normal_style), ""],
-            [Paragraph(f"<b>Inscrição Nº:</b> {inscricao.numero_inscricao}", normal_style), ""],
-            [Paragraph(f"<b>Data:</b> {inscricao.data_inscricao.strftime('%d/%m/%Y')}", normal_style), ""],
-            [Paragraph(f"<b>BI:</b> {inscricao.bilhete_identidade}", normal_style), ""],
-            [Paragraph(f"<b>Valor Pago:</b> {valor_inscricao}", normal_style), ""],
-        ]
-        
-        from reportlab.platypus import Table, TableStyle
-        t = Table(dados_tabela, colWidths=[12*cm, 4*cm])
-        t.setStyle(TableStyle([
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('SPAN', (1,0), (1,5)),
-            ('ALIGN', (1,0), (1,5), 'RIGHT'),
-        ]))
-        parte.append(t)
-        
-        parte.append(Spacer(1, 0.5*cm))
-        parte.append(Paragraph("-" * 100, normal_style))
-        parte.append(Paragraph(f"<font size='8'>Autenticado por: {request.user.get_full_name() or request.user.username} em {datetime.now().strftime('%d/%m/%Y %H:%M')}</font>", normal_style))
-        
-        return parte
-
-    # Parte 1: Instituição
-    story.extend(criar_parte("(VIA INSTITUIÇÃO)"))
-    story.append(Spacer(1, 1.5*cm))
-    story.append(Paragraph("-" * 80 + " CORTE AQUI " + "-" * 80, ParagraphStyle('Corte', alignment=TA_CENTER, fontSize=8)))
-    story.append(Spacer(1, 1.5*cm))
-    # Parte 2: Estudante
-    story.extend(criar_parte("(VIA ESTUDANTE)"))
-    
-    doc.build(story)
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="comprovativo_{inscricao.numero_inscricao}.pdf"'
-    return response
+@login_required
+@require_http_methods(["POST"])
+def gerar_comprovativos_lote(request):
+    """Enfileira o ZIP com os comprovativos de todos os inscritos de um curso (opcionalmente de um ano académico)"""
+    curso_id = request.POST.get('curso', '')
+    curso = Curso.objects.filter(id=curso_id).first() if curso_id.isdigit() else None
+    if curso is None:
+        messages.error(request, 'Curso não especificado.')
+        return redirect('lancamento_notas')
+
+    ano_id = request.POST.get('ano', '')
+    ano = None
+    if ano_id:
+        ano = AnoAcademico.objects.filter(id=ano_id).first() if ano_id.isdigit() else None
+        if ano is None:
+            messages.error(request, 'Ano académico inválido.')
+            return redirect(f"{reverse('lancamento_notas')}?curso={curso.id}")
+
+    # A geração (um processo por CPU) corre nos workers de tarefas, nunca no processo web
+    tarefa = enfileirar(
+        'comprovativos_lote', criado_por=request.user, curso=curso.id, ano=ano.id if ano else None,
+        autenticado_por=request.user.get_full_name() or request.user.username,
+    )
+    messages.info(request, f'Geração dos comprovativos de {curso.nome} iniciada. O ZIP fica disponível quando terminar.')
+    return redirect(f"{reverse('lancamento_notas')}?curso={curso.id}&tarefa={tarefa.id}")
+
+@login_required
+def descarregar_comprovativos_lote(request, tarefa_id):
+    """ZIP produzido pela tarefa comprovativos_lote (só para quem a criou ou staff)"""
+    from .comprovativos import diretorio_lotes
+    from .models import Tarefa
+    tarefa = get_object_or_404(Tarefa, id=tarefa_id, tipo='comprovativos_lote', estado='concluida')
+    if tarefa.criado_por_id != request.user.id and not request.user.is_staff:
+        return JsonResponse({'error': 'Acesso negado.'}, status=403)
+    caminho = os.path.join(diretorio_lotes(), os.path.basename(tarefa.resultado['ficheiro']))
+    if not os.path.exists(caminho):
+        messages.error(request, 'O ZIP já expirou. Gere os comprovativos novamente.')
+        return redirect('lancamento_notas')
+    return FileResponse(
+        open(caminho, 'rb'), as_attachment=True, content_type='application/zip',
+        filename=f"comprovativos_{tarefa.resultado['curso']}.zip",
+    )
+
+def _dados_recibo_termico(inscricao, config):
+    """Tudo o que aparece no recibo térmico (chave do cache de PDFs)"""
+    nome_atendente = None
+    if inscricao.criado_por:
+        nome_atendente = inscricao.criado_por.get_full_name() or inscricao.criado_por.username
+    return {
+        'escola': config.nome_escola if config else None,
+        'numero': inscricao.numero_inscricao,
+        'nome': inscricao.nome_completo,
+        'curso': inscricao.curso.nome,
+        'data': inscricao.data_inscricao,
+        'bi': inscricao.bilhete_identidade,
+        'atendente': nome_atendente,
+    }
+
+@login_required
+@require_http_methods(["POST"])
+def imprimir_recibo_termico(request, numero):
+    """Coloca os comandos ESC/POS do recibo térmico no spool da impressora local"""
+    inscricao = get_object_or_404(Inscricao, numero_inscricao=numero)
+    impressora = impressora_spool()
+    if impressora is None:
+        messages.error(request, 'Não há spool de impressão térmica configurado.')
+    else:
+        trabalho = recibo_termico_escpos(_dados_recibo_termico(inscricao, request.academico.config))
+        impressora.imprimir(f"recibo_{inscricao.numero_inscricao}", trabalho)
+        messages.success(request, 'Recibo enviado para a impressora térmica.')
+    return redirect('inscricao_consulta', numero=inscricao.numero_inscricao)
 
 def gerar_recibo_termico(request, numero):
-    """Gera um recibo em formato PDF otimizado para impressoras térmicas (80mm)"""
+    """
+    Gera um recibo em formato PDF otimizado para impressoras térmicas (80mm).
+    Com ?formato=escpos devolve os comandos ESC/POS (.bin); o envio para o
+    spool da impressora local é feito por imprimir_recibo_termico.
+    """
     inscricao = get_object_or_404(Inscricao, numero_inscricao=numero)
-    config = ConfiguracaoEscola.objects.first()
+    dados_pdf = _dados_recibo_termico(inscricao, request.academico.config)
     
-    # Largura de 80mm em pontos (1mm ≈ 2.83 pontos) -> ~226 pontos
-    largura_recibo = 80 * 1.0 * mm 
-    buffer = BytesIO()
-    
-    # Altura dinâmica ou fixa grande o suficiente, margens mínimas
-    doc = SimpleDocTemplate(
-        buffer, 
-        pagesize=(largura_recibo, 150 * mm),
-        rightMargin=2*mm, 
-        leftMargin=2*mm, 
-        topMargin=2*mm, 
-        bottomMargin=2*mm
-    )
+    if request.GET.get('formato') == 'escpos':
+        response = HttpResponse(recibo_termico_escpos(dados_pdf), content_type='application/octet-stream')
+        response['Content-Disposition'] = f'attachment; filename="recibo_{inscricao.numero_inscricao}.bin"'
+        return response
     
-    story = []
-    styles = getSampleStyleSheet()
-    
-    # Estilos específicos para recibo térmico
-    estilo_cabecalho = ParagraphStyle(
-        'TermicoCabecalho',
-        parent=styles['Normal'],
-        fontSize=10,
-        alignment=TA_CENTER,
-        leading=12,
-        fontName='Helvetica-Bold'
-    )
-    
-    estilo_corpo = ParagraphStyle(
-        'TermicoCorpo',
-        parent=styles['Normal'],
-        fontSize=8,
-        alignment=TA_LEFT,
-        leading=10
-    )
+    def gerar(ficheiro):
+        # 80mm de largura, altura fixa grande o suficiente, margens mínimas
+        doc = documento_pdf(ficheiro, 'termico')
+        story = []
+        estilo_cabecalho = ESTILOS['termico_cabecalho']
+        estilo_corpo = ESTILOS['termico_corpo']
 
-    estilo_negrito = ParagraphStyle(
-        'TermicoNegrito',
-        parent=estilo_corpo,
-        fontName='Helvetica-Bold'
-    )
-
-    escola_nome = config.nome_escola if config else "SIGA - GESTÃO ACADÉMICA"
-    story.append(Paragraph(escola_nome.upper(), estilo_cabecalho))
-    story.append(Paragraph("--------------------------------------------------", estilo_cabecalho))
-    story.append(Paragraph("COMPROVATIVO DE INSCRIÇÃO", estilo_cabecalho))
-    story.append(Paragraph(f"Nº: {inscricao.numero_inscricao}", estilo_cabecalho))
-    story.append(Paragraph("--------------------------------------------------", estilo_cabecalho))
-    story.append(Spacer(1, 2*mm))
+        escola_nome = dados_pdf['escola'] or "SIGA - GESTÃO ACADÉMICA"
+        story.append(Paragraph(escola_nome.upper(), estilo_cabecalho))
+        story.append(Paragraph("--------------------------------------------------", estilo_cabecalho))
+        story.append(Paragraph("COMPROVATIVO DE INSCRIÇÃO", estilo_cabecalho))
+        story.append(Paragraph(f"Nº: {dados_pdf['numero']}", estilo_cabecalho))
+        story.append(Paragraph("--------------------------------------------------", estilo_cabecalho))
+        story.append(Spacer(1, 2*mm))
 
-    story.append(Paragraph(f"<b>CANDIDATO:</b> {inscricao.nome_completo.upper()}", estilo_corpo))
-    story.append(Paragraph(f"<b>CURSO:</b> {inscricao.curso.nome}", estilo_corpo))
-    story.append(Paragraph(f"<b>DATA:</b> {inscricao.data_inscricao.strftime('%d/%m/%Y %H:%i')}", estilo_corpo))
-    story.append(Paragraph(f"<b>DOC. ID:</b> {inscricao.bilhete_identidade}", estilo_corpo))
+        story.append(Paragraph(f"<b>CANDIDATO:</b> {dados_pdf['nome'].upper()}", estilo_corpo))
+        story.append(Paragraph(f"<b>CURSO:</b> {dados_pdf['curso']}", estilo_corpo))
+        story.append(Paragraph(f"<b>DATA:</b> {dados_pdf['data'].strftime('%d/%m/%Y %H:%i')}", estilo_corpo))
+        story.append(Paragraph(f"<b>DOC. ID:</b> {dados_pdf['bi']}", estilo_corpo))
     
-    story.append(Spacer(1, 2*mm))
-    story.append(Paragraph("--------------------------------------------------", estilo_cabecalho))
+        story.append(Spacer(1, 2*mm))
+        story.append(Paragraph("--------------------------------------------------", estilo_cabecalho))
     
-    if inscricao.criado_por:
-        nome_atendente = inscricao.criado_por.get_full_name() or inscricao.criado_por.username
-        story.append(Paragraph(f"Atendente: {nome_atendente}", estilo_corpo))
+        if dados_pdf['atendente']:
+            story.append(Paragraph(f"Atendente: {dados_pdf['atendente']}", estilo_corpo))
     
-    story.append(Spacer(1, 5*mm))
-    story.append(Paragraph("OBRIGADO PELA PREFERÊNCIA", estilo_cabecalho))
+        story.append(Spacer(1, 5*mm))
+        story.append(Paragraph("OBRIGADO PELA PREFERÊNCIA", estilo_cabecalho))
     
-    doc.build(story)
-    buffer.seek(0)
+        doc.build(story)
     
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'inline; filename="recibo_{inscricao.numero_inscricao}.pdf"'
-    return response
+    return servir_pdf(request, 'recibo_termico', VERSAO_PDF_RECIBO_TERMICO, dados_pdf, gerar, f"recibo_{inscricao.numero_inscricao}.pdf")
 
 @login_required
 def admissao_estudantes(request):
     cursos = Curso.objects.filter(ativo=True)
-    config = ConfiguracaoEscola.objects.first()
+    config = request.academico.config
     return render(request, 'core/admissao.html', {
         'cursos': cursos,
         'config': config
@@ -920,31 +888,13 @@ def lancamento_notas(request):
     """Área para lançar notas dos testes de admissão"""
     cursos = Curso.objects.filter(ativo=True)
     if request.method == 'POST':
-        # Verificar permissão: Se não for superuser, não pode alterar se já tiver aprovado? 
-        # Ou simplesmente permitir se for superuser.
-        for key, value in request.POST.items():
-            if key.startswith('nota_'):
-                inscricao_id = key.split('_')[1]
-                try:
-                    raw_value = value.strip().replace(',', '.')
-                    if raw_value == '':
-                        # Limpar a nota se o campo estiver vazio
-                        Inscricao.objects.filter(id=inscricao_id).update(nota_teste=None, aprovado=False)
-                    else:
-                        try:
-                            # Converte para float mas mantém a precisão decimal sem arredondamento manual
-                            nota = float(raw_value)
-                            # Validação de segurança no servidor
-                            if 0 <= nota <= 20:
-                                # Usar update() para persistir no banco e garantir que o modelo saiba da mudança
-                                Inscricao.objects.filter(id=inscricao_id).update(nota_teste=nota)
-                                # Também atualizar o objeto se necessário para processamentos imediatos
-                                # mas o update() acima já é suficiente para o banco de dados.
-                            else:
-                                continue
-                        except (ValueError, Inscricao.DoesNotExist): pass
-                except (ValueError, Inscricao.DoesNotExist): pass
-        messages.success(request, 'Notas atualizadas com sucesso!')
+        from .admissao import lancar_notas_teste
+        curso_post = request.POST.get('curso_id')
+        curso = Curso.objects.filter(id=curso_post).first() if curso_post and curso_post.isdigit() else None
+        resumo = lancar_notas_teste(request.POST, curso=curso)
+        messages.success(request, f"Notas atualizadas com sucesso! {resumo['atualizadas']} alteradas, {resumo['limpas']} removidas.")
+        if resumo['rejeitadas']:
+            messages.warning(request, f"{resumo['rejeitadas']} nota(s) rejeitada(s): valores devem estar entre 0 e 20.")
         # Redirecionar mantendo o parâmetro do curso para que a lista seja recarregada com os novos dados
         return redirect(f"{request.path}?curso={request.POST.get('curso_id', '')}")
     
@@ -958,6 +908,7 @@ def lancamento_notas(request):
         'inscricoes': inscricoes,
         'curso_selecionado': curso_id,
         'curso_obj': Curso.objects.get(id=curso_id) if curso_id else None,
+        'tarefa_url': reverse('tarefa_estado', args=[request.GET['tarefa']]) if request.GET.get('tarefa', '').isdigit() else None,
     })
 
 @login_required
@@ -990,57 +941,37 @@ def configuracoes_globais(request):
 
     return render(request, 'core/configuracoes_globais.html', {'config': config})
 
+@login_required
+def tarefa_estado(request, tarefa_id):
+    """Estado de uma tarefa em segundo plano (consultado periodicamente pela interface)"""
+    from .models import Tarefa
+    tarefa = get_object_or_404(Tarefa, id=tarefa_id)
+    if tarefa.criado_por_id != request.user.id and not request.user.is_staff:
+        return JsonResponse({'error': 'Acesso negado.'}, status=403)
+    dados = estado_tarefa(tarefa)
+    if tarefa.tipo == 'comprovativos_lote' and tarefa.estado == 'concluida':
+        dados['descarregar_url'] = reverse('descarregar_comprovativos_lote', args=[tarefa.id])
+    return JsonResponse(dados)
+
 @login_required
 def processar_aprovacao_vagas(request):
     """Lógica de aprovação: Maior nota até preencher as vagas do curso com critério de desempate"""
     if request.method == 'POST':
         curso_id = request.POST.get('curso_id')
+        if curso_id == 'todos':
+            # Classifica todos os cursos ativos numa única passagem, em segundo plano
+            tarefa = enfileirar('processar_aprovacoes', prioridade=10, criado_por=request.user)
+            messages.info(request, 'Processamento de todos os cursos iniciado. Os resultados aparecem quando terminar.')
+            return redirect(f"{reverse('lancamento_notas')}?tarefa={tarefa.id}")
+
         curso = get_object_or_404(Curso, id=curso_id)
-        config = ConfiguracaoAcademica.objects.first()
-        
-        # Resetar aprovações anteriores para este curso
-        Inscricao.objects.filter(curso=curso).update(aprovado=False)
-        
-        # Definir ordenação baseada no critério de desempate
-        order_by = ['-nota_teste']
-        if config:
-            if config.criterio_desempate == 'idade_desc':
-                order_by.append('data_nascimento') # Mais velho (data menor)
-            elif config.criterio_desempate == 'idade_asc':
-                order_by.append('-data_nascimento') # Mais novo (data maior)
-            elif config.criterio_desempate == 'inscricao_asc':
-                order_by.append('data_inscricao') # Ordem cronológica
-            elif config.criterio_desempate == 'sexo_f':
-                order_by.append('sexo') # 'F' vem antes de 'M' alfabeticamente
-            elif config.criterio_desempate == 'sexo_m':
-                order_by.append('-sexo') # 'M' vem antes de 'F' com sinal negativo
-            elif config.criterio_desempate == 'sexo_f_novo':
-                order_by.extend(['sexo', '-data_nascimento']) # 'F' primeiro, depois os mais novos (data maior)
-            elif config.criterio_desempate == 'sexo_f_velho':
-                order_by.extend(['sexo', 'data_nascimento']) # 'F' primeiro, depois os mais velhos (data menor)
-        
-        # Pegar inscritos com nota válida
-        candidatos = Inscricao.objects.filter(
-            curso=curso, 
-            nota_teste__isnull=False,
-            nota_teste__gte=curso.nota_minima
-        ).order_by(*order_by)
-        
-        vagas = curso.vagas
-        aprovados_count = 0
-        
-        for i, cand in enumerate(candidatos):
-            if i < vagas:
-                cand.aprovado = True
-                cand.data_resultado = timezone.now()
-                cand.save()
-                aprovados_count += 1
-        
-        messages.success(request, f'Processamento concluído: {aprovados_count} candidatos aprovados no curso {curso.nome}.')
-        return redirect('lancamento_notas')
+        tarefa = enfileirar('processar_aprovacoes', prioridade=10, criado_por=request.user, cursos=[curso.id])
+
+        messages.info(request, f'Processamento do curso {curso.nome} iniciado. Os resultados aparecem quando terminar.')
+        return redirect(f"{reverse('lancamento_notas')}?curso={curso.id}&tarefa={tarefa.id}")
     return redirect('painel_principal')
     cursos = Curso.objects.filter(ativo=True)
-    config = ConfiguracaoEscola.objects.first()
+    config = request.academico.config
     return render(request, 'core/admissao.html', {
         'cursos': cursos,
         'config': config
@@ -1049,7 +980,7 @@ def processar_aprovacao_vagas(request):
 @login_required
 def admissao_inscricao(request):
     cursos = Curso.objects.filter(ativo=True)
-    config = ConfiguracaoEscola.objects.first()
+    config = request.academico.config
     
     if request.method == 'POST':
         curso_id = request.POST.get('curso_id')
@@ -1212,33 +1143,39 @@ def consultar_aprovacao(request):
     
     return render(request, 'core/consultar_aprovacao.html')
 
+@login_required
 @require_http_methods(["GET"])
 def verificar_existente(request):
+    # Devolve nome e id de candidatos: só para a equipa que gere inscrições
+    perfil = getattr(request.user, 'perfil', None)
+    if not request.user.is_staff and not (perfil and perfil.nivel_acesso in ['admin', 'super_admin', 'secretaria']):
+        return JsonResponse({'erro': 'Acesso negado.'}, status=403)
+
     query = request.GET.get('q', '').strip()
     campo = request.GET.get('campo', '').strip()
     
     if len(query) < 3:
         return JsonResponse({'encontrado': False})
     
-    # Mapeamento de campos para validação universal
-    filtros = {
-        'bilhete_identidade': Q(bilhete_identidade=query),
-        'telefone': Q(telefone=query) | Q(telefone_alternativo=query),
-        'email_recuperacao': Q(email=query) | Q(email_recuperacao=query),
-        'nome_completo': Q(nome_completo__icontains=query)
+    # Campo do formulário -> tipo no registo de identidades (uma consulta indexada).
+    # Só identificadores exatos: a procura por prefixo do nome permitiria listar candidatos.
+    tipos = {
+        'bilhete_identidade': 'bi',
+        'telefone': 'telefone',
+        'email_recuperacao': 'email',
     }
     
-    if campo not in filtros:
+    if campo not in tipos:
         return JsonResponse({'encontrado': False})
         
-    existente = Inscricao.objects.filter(filtros[campo]).first()
+    identidade = procurar_identidade(tipos[campo], query)
         
-    if existente:
+    if identidade:
         return JsonResponse({
             'encontrado': True,
             'valor': query,
-            'nome': existente.nome_completo,
-            'id': existente.id
+            'nome': identidade.inscricao.nome_completo,
+            'id': identidade.inscricao_id
         })
         
     return JsonResponse({'encontrado': False})
@@ -1500,6 +1437,9 @@ def login_view(request):
         user = authenticate(request, username=username, password=password)
         
         if user is not None:
+            # Contas anteriores ao índice de impressões: preenche no primeiro login
+            preencher_impressao(user, password)
+            
             if not hasattr(user, 'perfil'):
                 from .models import PerfilUsuario
                 PerfilUsuario.objects.get_or_create(user=user)
@@ -1547,10 +1487,9 @@ def registro_view(request):
             messages.error(request, 'Este telefone já está sendo usado por outro usuário!')
             return render(request, 'core/registro.html')
         
-        for user in User.objects.all():
-            if user.check_password(password1):
-                messages.error(request, 'Esta senha já está sendo usada por outro usuário. Por favor, escolha uma senha diferente.')
-                return render(request, 'core/registro.html')
+        if senha_em_uso(password1):
+            messages.error(request, MENSAGEM_SENHA_EM_USO)
+            return render(request, 'core/registro.html')
         
         try:
             user = User.objects.create_user(
@@ -1560,6 +1499,7 @@ def registro_view(request):
                 first_name=first_name,
                 last_name=last_name
             )
+            registar_senha(user, password1)
             
             if hasattr(user, 'perfil'):
                 user.perfil.telefone = telefone
@@ -1588,27 +1528,16 @@ def logout_view(request):
 @login_required
 def notificacoes_view(request):
     """View para listar notificações do usuário e estatísticas de inscrições"""
-    notificacoes = Notificacao.objects.filter(
-        Q(global_notificacao=True) | Q(destinatarios=request.user),
-        ativa=True
-    ).distinct().order_by('-data_criacao')
-    
-    nao_lidas = notificacoes.exclude(lida_por=request.user)
+    from .notificacoes import notificacoes_do_utilizador, anotar_leitura, contar_nao_lidas
+    notificacoes = anotar_leitura(notificacoes_do_utilizador(request.user), request.user)
     
     # Estatísticas de inscrições por dia (últimos 30 dias)
-    from django.db.models.functions import TruncDay
-    from django.db.models import Count
     from django.utils import timezone
     from datetime import timedelta
+    from .estatisticas import inscricoes_por_dia
     
-    data_limite = timezone.now() - timedelta(days=30)
-    estatisticas_diarias = Inscricao.objects.filter(
-        data_inscricao__gte=data_limite
-    ).annotate(
-        dia=TruncDay('data_inscricao')
-    ).values('dia').annotate(
-        total=Count('id')
-    ).order_by('-dia')
+    data_limite = timezone.localdate() - timedelta(days=30)
+    estatisticas_diarias = inscricoes_por_dia(data_limite)
 
     # Ao marcar como lida ou voltar, redireciona para o perfil
     if request.GET.get('action') == 'marcar_lida':
@@ -1620,7 +1549,7 @@ def notificacoes_view(request):
 
     context = {
         'notificacoes': notificacoes,
-        'nao_lidas_count': nao_lidas.count(),
+        'nao_lidas_count': contar_nao_lidas(request.user),
         'estatisticas_diarias': estatisticas_diarias,
         'active_tab': 'notificacoes'
     }
@@ -1637,12 +1566,41 @@ def marcar_notificacao_lida(request, notificacao_id):
 @login_required
 def get_notificacoes_count(request):
     """Retorna contagem de notificações não lidas"""
-    count = Notificacao.objects.filter(
-        Q(global_notificacao=True) | Q(destinatarios=request.user),
-        ativa=True
-    ).exclude(lida_por=request.user).distinct().count()
-    
-    return JsonResponse({'count': count})
+    from .notificacoes import contar_nao_lidas
+    return JsonResponse({'count': contar_nao_lidas(request.user)})
+
+def manter_sessao(request):
+    """Heartbeat do temporizador de inatividade: só renova a sessão (sem consultar o utilizador)"""
+    if '_auth_user_id' not in request.session:
+        return JsonResponse({'ativa': False}, status=401)
+    sessao = request.session
+    # Com core.sessoes a sessão só é renovada quando falta pouco para expirar
+    restante = sessao.segundos_restantes() if hasattr(sessao, 'segundos_restantes') else sessao.get_expiry_age()
+    return JsonResponse({'ativa': True, 'expira_em': restante})
+
+async def eventos_stream(request):
+    """Stream SSE com as não lidas e, para staff, os perfis pendentes (apenas em ASGI)"""
+    from django.core.handlers.asgi import ASGIRequest
+    from django.http import StreamingHttpResponse
+    from .eventos import transmitir
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Não autenticado'}, status=401)
+    if not isinstance(request, ASGIRequest):
+        # Em WSGI cada ligação ocuparia um worker: 204 faz o EventSource desistir
+        return HttpResponse(status=204)
+    response = StreamingHttpResponse(transmitir(user.pk, user.is_staff), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+@require_http_methods(["POST"])
+def marcar_todas_notificacoes_lidas(request):
+    """Marcar todas as notificações como lidas"""
+    from .notificacoes import marcar_todas_como_lidas
+    marcar_todas_como_lidas(request.user)
+    return JsonResponse({'success': True})
 
 def pagamento_subscricao_view(request):
     """View para efetuar pagamento de subscrição"""
@@ -1817,10 +1775,9 @@ def validar_otp_view(request):
                 messages.error(request, 'A senha deve ter no mínimo 6 caracteres!')
                 return render(request, 'core/validar_otp.html', {'recuperacao': recuperacao})
             
-            for user_check in User.objects.exclude(id=recuperacao.user.id):
-                if user_check.check_password(nova_senha):
-                    messages.error(request, 'Esta senha já está sendo usada por outro usuário. Por favor, escolha uma senha diferente.')
-                    return render(request, 'core/validar_otp.html', {'recuperacao': recuperacao})
+            if senha_em_uso(nova_senha, excluir_user=recuperacao.user):
+                messages.error(request, MENSAGEM_SENHA_EM_USO)
+                return render(request, 'core/validar_otp.html', {'recuperacao': recuperacao})
             
             user = recuperacao.user
             user.set_password(nova_senha)
@@ -1859,10 +1816,9 @@ def redefinir_senha_email_view(request, token):
                 messages.error(request, 'A senha deve ter no mínimo 6 caracteres!')
                 return render(request, 'core/redefinir_senha_email.html', {'token': token})
             
-            for user_check in User.objects.exclude(id=recuperacao.user.id):
-                if user_check.check_password(nova_senha):
-                    messages.error(request, 'Esta senha já está sendo usada por outro usuário. Por favor, escolha uma senha diferente.')
-                    return render(request, 'core/redefinir_senha_email.html', {'token': token})
+            if senha_em_uso(nova_senha, excluir_user=recuperacao.user):
+                messages.error(request, MENSAGEM_SENHA_EM_USO)
+                return render(request, 'core/redefinir_senha_email.html', {'token': token})
             
             user = recuperacao.user
             user.set_password(nova_senha)
@@ -1901,122 +1857,91 @@ def get_perfis_pendentes_count(request):
 def painel_principal(request):
     """View para o painel principal com menu lateral"""
     from datetime import date
-    from django.db.models import Count, Q
-    from .models import EventoCalendario, AnoAcademico, Curso, Inscricao, Notificacao, Subscricao, PagamentoSubscricao
-    total_inscricoes = Inscricao.objects.count()
-    total_aprovados = Inscricao.objects.filter(aprovado=True).count()
-    total_reprovados = Inscricao.objects.filter(aprovado=False, nota_teste__isnull=False).count()
-    aguardando_nota = Inscricao.objects.filter(nota_teste__isnull=True).count()
+    from django.db.models import Q
+    from .models import EventoCalendario, AnoAcademico, Notificacao, Subscricao
+    from .estatisticas import estatisticas_painel
+    from .notificacoes import contar_nao_lidas, notificacoes_do_utilizador
+
+    # Todas as estatísticas vêm de um número fixo de consultas agregadas
+    estatisticas = estatisticas_painel()
+    totais = estatisticas['totais']
+
+    total_inscricoes = totais['inscritos']
+    total_aprovados = totais['aprovados']
+    total_reprovados = totais['reprovados']
+    aguardando_nota = totais['sem_nota']
     
     anos_academicos = AnoAcademico.objects.all()
-    ano_atual = AnoAcademico.objects.filter(ano_atual=True).first()
+    ano_atual = request.academico.ano_atual
     
-    notificacoes_nao_lidas = Notificacao.objects.filter(
-        Q(global_notificacao=True) | Q(destinatarios=request.user),
-        ativa=True
-    ).exclude(lida_por=request.user).count()
+    notificacoes_nao_lidas = contar_nao_lidas(request.user)
+    notificacoes_recentes = notificacoes_do_utilizador(request.user)[:3]
     
-    notificacoes_recentes = Notificacao.objects.filter(
-        Q(global_notificacao=True) | Q(destinatarios=request.user),
-        ativa=True
-    ).distinct().order_by('-data_criacao')[:3]
-    
-    subscricao = Subscricao.objects.filter(estado__in=['ativo', 'teste']).first()
+    subscricao = request.academico.subscricao
     
     # Estatísticas de inscrições por curso
-    estatisticas_cursos_data = []
-    for curso in Curso.objects.filter(ativo=True):
-        total_inscritos = curso.inscricoes.count()
-        aprovados = curso.inscricoes.filter(aprovado=True).count()
-        estatisticas_cursos_data.append({
-            'curso': curso,
-            'total': total_inscritos,
-            'aprovados': aprovados,
-            'reprovados': curso.inscricoes.filter(aprovado=False, nota_teste__isnull=False).count(),
-            'vagas_restantes': curso.vagas_disponiveis()
-        })
+    cursos = estatisticas['cursos']
+    estatisticas_cursos_data = [{
+        'curso': curso,
+        'total': curso.n_inscritos,
+        'aprovados': curso.n_aprovados,
+        'reprovados': curso.n_reprovados,
+        'vagas_restantes': curso.vagas_disponiveis()
+    } for curso in cursos]
     
     # Dados para gráfico de estado dos estudantes
     stats_estado = {
         'labels': ['Candidatos', 'Admitidos', 'Registros', 'Ativos'],
         'valores': [
-            Inscricao.objects.filter(aprovado=None).count(), # Candidatos (pendentes)
-            Inscricao.objects.filter(aprovado=True).count(), # Admitidos
-            Inscricao.objects.filter(aprovado=True, status='matriculado').count(), # Registros (usando campo status)
-            Inscricao.objects.filter(aprovado=True, status='matriculado', status_inscricao='ativo').count(), # Ativos
+            totais['sem_nota'], # Candidatos (pendentes)
+            totais['aprovados'], # Admitidos
+            totais['matriculados'], # Registros (usando campo status)
+            totais['ativos'], # Ativos
         ]
     }
 
     # Dados para gráfico de evolução de matrículas por ano letivo
-    anos = AnoAcademico.objects.all().order_by('data_inicio')
+    anos = estatisticas['anos']
     evolucao_matriculas = {
         'labels': [f"{a.data_inicio.year if a.data_inicio else ''}/{a.data_fim.year if a.data_fim else ''}" for a in anos],
-        'valores': [
-            Inscricao.objects.filter(ano_academico=a, status='matriculado').count() for a in anos
-        ]
+        'valores': estatisticas['matriculas_por_ano']
     }
 
-    # Dados para gráfico de estudantes por curso
-    cursos_stats = []
-    for curso in Curso.objects.filter(ativo=True):
-        total = Inscricao.objects.filter(curso=curso, status='matriculado').count()
-        cursos_stats.append({'nome': curso.nome, 'total': total})
-    
-    # Ordenar por total para melhor visualização em barras horizontais
-    cursos_stats = sorted(cursos_stats, key=lambda x: x['total'], reverse=True)
-    
+    # Dados para gráfico de estudantes por curso (ordenado para barras horizontais)
+    cursos_stats = sorted(cursos, key=lambda c: c.n_matriculados, reverse=True)
     stats_cursos = {
-        'labels': [c['nome'] for c in cursos_stats],
-        'valores': [c['total'] for c in cursos_stats]
+        'labels': [c.nome for c in cursos_stats],
+        'valores': [c.n_matriculados for c in cursos_stats]
     }
 
     # Dados para gráfico de inscrições por curso
-    inscricoes_stats = []
-    for curso in Curso.objects.filter(ativo=True):
-        total_inscricoes_curso = Inscricao.objects.filter(curso=curso).count()
-        inscricoes_stats.append({'nome': curso.nome, 'total': total_inscricoes_curso})
-    
-    # Ordenar por total para melhor visualização
-    inscricoes_stats = sorted(inscricoes_stats, key=lambda x: x['total'], reverse=True)
-    
+    inscricoes_stats = sorted(cursos, key=lambda c: c.n_inscritos, reverse=True)
     stats_inscricoes_curso = {
-        'labels': [c['nome'] for c in inscricoes_stats],
-        'valores': [c['total'] for c in inscricoes_stats]
+        'labels': [c.nome for c in inscricoes_stats],
+        'valores': [c.n_inscritos for c in inscricoes_stats]
     }
 
     # Dados para gráfico de taxa de aprovação
     stats_taxa_aprovacao = {
         'labels': ['Aprovados', 'Reprovados', 'Em espera'],
         'valores': [
-            Inscricao.objects.filter(aprovado=True).count(),
-            Inscricao.objects.filter(aprovado=False, nota_teste__isnull=False).count(),
-            Inscricao.objects.filter(aprovado=None, nota_teste__isnull=True).count()
+            totais['aprovados'],
+            totais['reprovados'],
+            totais['sem_nota']
         ]
     }
 
-    # Dados para gráfico de indicações (Online vs Presencial)
-    # Assumindo que o campo 'metodo_pagamento' ou similar pode indicar a origem
-    # Se não houver campo específico, vamos simular ou usar um campo existente que faça sentido
-    # Verificando as opções de 'metodo_pagamento' do FieldError anterior: 
-    # Choice for metodo_pagamento? Vamos usar o campo 'status' para algo ou apenas contar
-    # Para o propósito do gráfico, vamos assumir categorias fixas baseadas em lógica de negócio
+    # Dados para gráfico de indicações (Online vs Presencial), com base no metodo_pagamento
     stats_indicacoes = {
         'labels': ['Online', 'Presencialmente'],
         'valores': [
-            Inscricao.objects.filter(metodo_pagamento__icontains='online').count() or 5, # Mock fallback se vazio
-            Inscricao.objects.filter(metodo_pagamento__icontains='presencial').count() or 3
+            estatisticas['indicacoes']['online'] or 5, # Mock fallback se vazio
+            estatisticas['indicacoes']['presencial'] or 3
         ]
     }
 
-    # Dados para gráficos Financeiros
-    pagamentos_aprovados = PagamentoSubscricao.objects.filter(status='aprovado')
-    
     # 🔟 Receitas por ano lectivo (Agrupado por data de pagamento)
-    receitas_anuais = {}
-    for p in pagamentos_aprovados:
-        ano_p = p.data_pagamento.year
-        receitas_anuais[ano_p] = receitas_anuais.get(ano_p, 0) + float(p.valor)
-    
+    receitas_anuais = estatisticas['receitas_por_ano']
     anos_receita = sorted(receitas_anuais.keys())
     stats_receitas = {
         'labels': [str(a) for a in anos_receita],
@@ -2024,13 +1949,10 @@ def painel_principal(request):
     }
 
     # 1️⃣1️⃣ Pagamentos por estado
+    pagamentos_estado = estatisticas['pagamentos_por_estado']
     stats_pagamentos_estado = {
         'labels': ['Aprovado', 'Pendente', 'Rejeitado'],
-        'valores': [
-            PagamentoSubscricao.objects.filter(status='aprovado').count(),
-            PagamentoSubscricao.objects.filter(status='pendente').count(),
-            PagamentoSubscricao.objects.filter(status='rejeitado').count()
-        ]
+        'valores': [pagamentos_estado.get(estado, 0) for estado in ('aprovado', 'pendente', 'rejeitado')]
     }
 
     # Alertas Académicos (Próximos 30 dias)
@@ -2070,7 +1992,7 @@ def painel_principal(request):
 def trocar_ano(request):
     """View para seleção de ano acadêmico"""
     anos_academicos = AnoAcademico.objects.all().order_by('-data_inicio')
-    ano_atual = AnoAcademico.objects.filter(ano_atual=True).first()
+    ano_atual = request.academico.ano_atual
     
     context = {
         'anos_academicos': anos_academicos,
@@ -2593,7 +2515,7 @@ def gestao_eventos_view(request):
         messages.error(request, "Acesso negado.")
         return redirect('painel_principal')
         
-    ano_atual = AnoAcademico.get_atual()
+    ano_atual = request.academico.ano_atual
     eventos = EventoCalendario.objects.all().order_by('-data_inicio')
     anos = AnoAcademico.objects.all()
     
@@ -2661,7 +2583,7 @@ def cronograma_academico(request):
     hoje = timezone.now()
     
     # ERP: Exibir apenas o ciclo atual ou o mais recente para foco estratégico
-    ano_atual = AnoAcademico.objects.filter(ano_atual=True).first()
+    ano_atual = request.academico.ano_atual
     if ano_atual:
         anos = [ano_atual]
     else:
@@ -2720,7 +2642,7 @@ def syllabus(request):
 def admissao(request):
     """View para admissão de estudantes - Controlada pelo Calendário"""
     from .models import AnoAcademico
-    ano_atual = AnoAcademico.objects.filter(ano_atual=True).first()
+    ano_atual = request.academico.ano_atual
     
     if not ano_atual or not ano_atual.inscricoes_abertas():
         messages.error(request, "O sistema de inscrições está fechado no momento conforme o calendário acadêmico.")
@@ -2759,13 +2681,12 @@ def matricula(request):
         insc = get_object_or_404(Inscricao, id=inscricao_id)
         
         if action == 'confirmar_matricula':
-            if insc.curso.vagas_disponiveis() > 0:
-                insc.status = 'Matriculado'
-                # A vaga é reduzida automaticamente porque vagas_disponiveis() 
-                # em models.py conta aprovados que ocupam vaga.
-                insc.save()
+            insc.status = 'Matriculado'
+            try:
+                # O contador de matriculados do curso só é incrementado se ainda houver vagas
+                insc.save(validar_vagas=True)
                 messages.success(request, f'Matrícula de {insc.nome_completo} confirmada com sucesso!')
-            else:
+            except VagasEsgotadas:
                 messages.error(request, f'Não há vagas disponíveis para o curso {insc.curso.nome}.')
         elif action == 'cancelar_matricula':
             insc.status = 'Ativo'
@@ -2893,7 +2814,7 @@ def atribuicao_turmas(request):
             if ano_id:
                 ano_l = get_object_or_404(AnoAcademico, id=ano_id)
             else:
-                ano_l = AnoAcademico.get_atual()
+                ano_l = request.academico.ano_atual
             
             # 1. Criar a Turma
             turma = Turma.objects.create(
@@ -2965,7 +2886,7 @@ def detalhe_turma(request, turma_id):
             return redirect('detalhe_turma', turma_id=turma.id)
 
     from .models import ConfiguracaoEscola
-    config = ConfiguracaoEscola.objects.first()
+    config = request.academico.config
 
     context = {
         'turma': turma,
@@ -3035,18 +2956,17 @@ def enviar_mensagem_inscritos(request):
         mensagem = request.POST.get('mensagem')
         tipo = request.POST.get('tipo', 'INFO')
         
-        # Obter usuários estudantes/inscritos
-        usuarios_inscritos = User.objects.filter(perfil__nivel_acesso='estudante')
-        
+        # Dirigida a todos os estudantes: o público é resolvido na leitura
         notificacao = Notificacao.objects.create(
             titulo=titulo,
             mensagem=mensagem,
             tipo=tipo,
-            global_notificacao=False
+            global_notificacao=False,
+            publico_nivel_acesso='estudante',
+            publico_grupo='todos'
         )
-        notificacao.destinatarios.set(usuarios_inscritos)
         
-        messages.success(request, f"Mensagem enviada para {usuarios_inscritos.count()} inscritos.")
+        messages.success(request, f"Mensagem enviada para {utilizadores_do_publico(notificacao).count()} inscritos.")
         return redirect('gestao_eventos')
     
     return redirect('gestao_eventos')
@@ -3060,25 +2980,35 @@ def enviar_mensagem_geral(request):
         tipo_aviso = request.POST.get('tipo', 'INFO')
         destinatario_grupo = request.POST.get('destinatario_grupo')
         
-        usuarios = User.objects.none()
-        if destinatario_grupo == 'inscritos':
-            usuarios = User.objects.filter(perfil__nivel_acesso='estudante', inscricoes__status_inscricao__in=['submetida', 'pendente'])
-        elif destinatario_grupo == 'admitidos':
-            usuarios = User.objects.filter(perfil__nivel_acesso='estudante', inscricoes__aprovado=True)
-        elif destinatario_grupo == 'estudantes_antigos':
-            usuarios = User.objects.filter(perfil__nivel_acesso='estudante', inscricoes__status_inscricao='ativo')
-        elif destinatario_grupo == 'todos':
-            usuarios = User.objects.filter(perfil__nivel_acesso='estudante')
+        if destinatario_grupo not in dict(Notificacao.PUBLICO_GRUPO_CHOICES):
+            messages.error(request, "Grupo de destinatários inválido.")
+            return redirect('gestao_eventos')
+
+        # Filtros opcionais por curso/turma: só ids de registos existentes
+        from .models import Turma
+        filtros = {}
+        for campo, modelo in (('curso_id', Curso), ('turma_id', Turma)):
+            valor = request.POST.get(campo, '').strip()
+            if not valor:
+                continue
+            filtros[campo] = modelo.objects.filter(id=valor).first() if valor.isdigit() else None
+            if filtros[campo] is None:
+                messages.error(request, "Curso ou turma de destino inválido.")
+                return redirect('gestao_eventos')
             
+        # O público é guardado como regra e resolvido na leitura, sem uma linha por destinatário
         notificacao = Notificacao.objects.create(
             titulo=titulo,
             mensagem=mensagem,
             tipo=tipo_aviso,
-            global_notificacao=False
+            global_notificacao=False,
+            publico_nivel_acesso='estudante',
+            publico_grupo=destinatario_grupo,
+            publico_curso=filtros.get('curso_id'),
+            publico_turma=filtros.get('turma_id'),
         )
-        notificacao.destinatarios.set(usuarios)
         
-        messages.success(request, f"Mensagem enviada para {usuarios.count()} destinatários.")
+        messages.success(request, f"Mensagem enviada para {utilizadores_do_publico(notificacao).count()} destinatários.")
         return redirect('gestao_eventos')
     return redirect('gestao_eventos')
 
@@ -3098,7 +3028,7 @@ def gestao_eventos(request):
                 if ano_id:
                     ano = AnoAcademico.objects.filter(id=ano_id).first()
                 else:
-                    ano = AnoAcademico.get_atual()
+                    ano = request.academico.ano_atual
 
                 if not ano:
                     # Tenta pegar qualquer ano ativo se o padrão falhar
@@ -3276,11 +3206,19 @@ def documento_criar(request):
             ativo='ativo' in request.POST,
             criado_por=request.user
         )
-        documento.save()
-        messages.success(request, f'Documento "{documento.titulo}" criado com sucesso!')
-        return redirect('gestao_documentos')
+        try:
+            validar_conteudo(documento.conteudo)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+        else:
+            documento.save()
+            messages.success(request, f'Documento "{documento.titulo}" criado com sucesso!')
+            return redirect('gestao_documentos')
+    else:
+        documento = None
     
     return render(request, 'core/documento_form.html', {
+        'documento': documento,
         'secoes': Documento.SECAO_CHOICES,
         'status_choices': Documento.STATUS_CHOICES,
         'variaveis': Documento.obter_variaveis_disponiveis(None)
@@ -3299,9 +3237,14 @@ def documento_editar(request, documento_id):
         documento.conteudo = request.POST.get('conteudo')
         documento.descricao = request.POST.get('descricao', '')
         documento.ativo = 'ativo' in request.POST
-        documento.save()
-        messages.success(request, f'Documento "{documento.titulo}" atualizado com sucesso!')
-        return redirect('gestao_documentos')
+        try:
+            validar_conteudo(documento.conteudo)
+        except ValidationError as e:
+            messages.error(request, e.messages[0])
+        else:
+            documento.save()
+            messages.success(request, f'Documento "{documento.titulo}" atualizado com sucesso!')
+            return redirect('gestao_documentos')
     
     return render(request, 'core/documento_form.html', {
         'documento': documento,
@@ -3326,21 +3269,22 @@ def documento_visualizar(request, documento_id):
     
     # Dados de exemplo para preview
     dados_exemplo = {
-        'nome': 'João Silva Santos',
+        'nome_completo': 'João Silva Santos',
+        'primeiro_nome': 'João',
+        'apelido': 'Santos',
         'bilhete_identidade': '1234567890123',
-        'email': 'joao@example.com',
-        'telefone': '244999999999',
-        'data_nascimento': '1990-05-15',
-        'curso': 'Engenharia de Software',
+        'email_estudante': 'joao@example.com',
+        'telefone_estudante': '244999999999',
+        'data_nascimento': '15/05/1990',
+        'curso_nome': 'Engenharia de Software',
         'numero_inscricao': 'INS-000001',
-        'data_inscricao': date.today().strftime('%d/%m/%Y'),
-        'data_hoje': date.today().strftime('%d/%m/%Y'),
-        'nome_escola': 'Instituto Superior Técnico',
-        'endereco': 'Rua Principal, 123',
+        'data_atual': date.today().strftime('%d/%m/%Y'),
+        'escola_nome': 'Instituto Superior Técnico',
+        'endereco_estudante': 'Rua Principal, 123',
         'sexo': 'Masculino',
         'estado_civil': 'Solteiro',
         'nacionalidade': 'Angolano',
-        'local_nascimento': 'Luanda',
+        'naturalidade': 'Luanda',
     }
     
     conteudo_renderizado = documento.renderizar(dados_exemplo)
@@ -3356,98 +3300,51 @@ def gerar_pdf_documento(request, documento_id, inscricao_id=None):
     documento = get_object_or_404(Documento, id=documento_id)
     
     if inscricao_id:
-        inscricao = get_object_or_404(Inscricao, id=inscricao_id)
-        config = ConfiguracaoEscola.objects.first()
-        
-        # Preparar dados abrangentes ERP
-        dados = {
-            # Geral
-            'escola_nome': config.nome_escola if config else 'SIGA',
-            'escola_decreto': config.decreto_legalidade if config else '',
-            'escola_endereco': config.endereco if config else '',
-            'escola_telefone': config.telefone if config else '',
-            'escola_email': config.email if config else '',
-            'data_atual': date.today().strftime('%d/%m/%Y'),
-            'usuario_logado': request.user.get_full_name() or request.user.username,
-            
-            # Estudante
-            'nome_completo': inscricao.nome_completo,
-            'primeiro_nome': inscricao.primeiro_nome,
-            'apelido': inscricao.apelido,
-            'numero_inscricao': inscricao.numero_inscricao,
-            'numero_processo': getattr(inscricao, 'numero_processo', '---'),
-            'bilhete_identidade': inscricao.bilhete_identidade,
-            'nacionalidade': inscricao.nacionalidade,
-            'naturalidade': inscricao.local_nascimento,
-            'data_nascimento': inscricao.data_nascimento.strftime('%d/%m/%Y') if inscricao.data_nascimento else '',
-            'sexo': inscricao.get_sexo_display() if hasattr(inscricao, 'get_sexo_display') else '',
-            'endereco_estudante': inscricao.endereco,
-            'telefone_estudante': inscricao.telefone,
-            'email_estudante': inscricao.email,
-            
-            # Académico
-            'curso_nome': inscricao.curso.nome,
-            'curso_codigo': inscricao.curso.codigo,
-            'grau_academico': inscricao.curso.grau.nome,
-            'turma_nome': getattr(inscricao, 'turma_nome', '---'),
-            'ano_academico': str(inscricao.ano_academico),
-            'semestre_atual': '---',
-            'status_academico': 'Ativo' if inscricao.aprovado else 'Pendente',
-            
-            # Assinaturas
-            'diretor_geral': config.nome_responsavel_visto if config else '',
-            'diretor_academico': config.nome_responsavel_assinatura if config else '',
-        }
+        # Só as variáveis usadas pelo modelo, com as relações de que precisam numa única consulta
+        modelo = compilar_documento(documento)
+        inscricao = get_object_or_404(inscricoes_para(modelo), id=inscricao_id)
+        dados = dados_inscricao(modelo, inscricao, ContextoDocumento(request.user))
     else:
         # Dados de exemplo se não houver inscrição
         dados = {
-            'nome': 'Exemplo de Nome',
+            'nome_completo': 'Exemplo de Nome',
             'bilhete_identidade': '0000000000000',
-            'email': 'exemplo@example.com',
-            'telefone': '244999999999',
+            'email_estudante': 'exemplo@example.com',
+            'telefone_estudante': '244999999999',
             'data_nascimento': date.today().strftime('%d/%m/%Y'),
-            'curso': 'Curso de Exemplo',
+            'curso_nome': 'Curso de Exemplo',
             'numero_inscricao': 'INS-000000',
-            'data_inscricao': date.today().strftime('%d/%m/%Y'),
-            'data_hoje': date.today().strftime('%d/%m/%Y'),
-            'nome_escola': 'SIGE',
-            'endereco': 'Endereço de Exemplo',
+            'data_atual': date.today().strftime('%d/%m/%Y'),
+            'escola_nome': 'SIGE',
+            'endereco_estudante': 'Endereço de Exemplo',
             'sexo': 'M',
             'estado_civil': 'S',
             'nacionalidade': 'Angolana',
-            'local_nascimento': 'Luanda',
+            'naturalidade': 'Luanda',
         }
     
     # Gerar PDF
-    buffer = BytesIO()
-    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=2*cm, bottomMargin=2*cm)
-    story = []
-    styles = getSampleStyleSheet()
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=11,
-        textColor='#000000',
-        spaceAfter=8,
-        alignment=TA_LEFT
-    )
-    
-    conteudo_renderizado = documento.renderizar(dados)
-    
-    for linha in conteudo_renderizado.split('\n'):
-        if linha.strip():
-            story.append(Paragraph(linha, normal_style))
-    
-    story.append(Spacer(1, 1*cm))
-    
-    doc.build(story)
-    
-    buffer.seek(0)
-    response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="{documento.titulo.replace(" ", "_")}.pdf"'
+    def gerar(ficheiro):
+        doc = documento_pdf(ficheiro, 'documento')
+        story = []
+        normal_style = ESTILOS['documento_normal']
+        
+        conteudo_renderizado = documento.renderizar(dados)
+        
+        for linha in conteudo_renderizado.split('\n'):
+            if linha.strip():
+                story.append(Paragraph(linha, normal_style))
+        
+        story.append(Spacer(1, 1*cm))
+        
+        doc.build(story)
     
-    return response
+    # O modelo (conteúdo e data de atualização) e os dados definem o PDF em cache
+    dados_pdf = {'documento': documento.id, 'conteudo': documento.conteudo, 'atualizado': documento.data_atualizacao, 'dados': dados}
+    return servir_pdf(
+        request, 'documento', VERSAO_PDF_DOCUMENTO, dados_pdf, gerar,
+        f'{documento.titulo.replace(" ", "_")}.pdf', anexo=True
+    )
 
 # ============= GESTÃO DE CURSOS =============
 
@@ -3687,6 +3584,7 @@ def criar_utilizador(request):
                 is_staff=(nivel_acesso in ['admin', 'super_admin']),
                 is_superuser=(nivel_acesso == 'super_admin')
             )
+            registar_senha(user, password)
             
             # Criar/atualizar perfil
             perfil, _ = PerfilUsuario.objects.get_or_create(user=user)
@@ -3940,7 +3838,7 @@ def registrar_horario(request):
     if ano_id:
         ano_sessao = get_object_or_404(AnoAcademico, id=ano_id)
     else:
-        ano_sessao = AnoAcademico.get_atual()
+        ano_sessao = request.academico.ano_atual
 
     periodo_ativo = PeriodoLectivo.objects.filter(ano_lectivo=ano_sessao, ativo=True).first()
     periodos = PeriodoLectivo.objects.filter(ano_lectivo=ano_sessao)
@@ -4041,7 +3939,7 @@ def visualizar_grade(request):
     if ano_id:
         ano_sessao = get_object_or_404(AnoAcademico, id=ano_id)
     else:
-        ano_sessao = AnoAcademico.get_atual()
+        ano_sessao = request.academico.ano_atual
         
     turma_id = request.GET.get('turma')
     horarios = []
@@ -4074,7 +3972,7 @@ def visualizar_grade(request):
         periodo_atual = PeriodoLectivo.objects.filter(ano_lectivo=ano_sessao, ativo=True).first()
     
     turmas = Turma.objects.filter(ano_lectivo=ano_sessao)
-    instituicao = ConfiguracaoEscola.objects.first()
+    instituicao = request.academico.config
     
     dias = [
         (1, 'Segunda'),
@@ -4105,7 +4003,7 @@ def listar_horarios(request):
     if ano_id:
         ano_sessao = get_object_or_404(AnoAcademico, id=ano_id)
     else:
-        ano_sessao = AnoAcademico.get_atual()
+        ano_sessao = request.academico.ano_atual
         
     horarios = TurmaDisciplina.objects.filter(
         turma__ano_lectivo=ano_sessao,
@@ -4134,7 +4032,7 @@ def editar_horario(request, pk):
     if ano_id:
         ano_sessao = get_object_or_404(AnoAcademico, id=ano_id)
     else:
-        ano_sessao = AnoAcademico.get_atual()
+        ano_sessao = request.academico.ano_atual
         
     if request.method == 'POST':
         try:
@@ -4246,7 +4144,7 @@ def registrar_horario(request):
     professores = Professor.objects.all()
     disciplinas = Disciplina.objects.all()
     turmas = Turma.objects.all()
-    ano_sessao = AnoAcademico.objects.filter(ano_atual=True).first()
+    ano_sessao = request.academico.ano_atual
     periodos = PeriodoLectivo.objects.filter(ano_lectivo=ano_sessao)
     
     horarios = HorarioAula.objects.all().select_related('professor', 'disciplina').order_by('professor', 'dia_semana', 'hora_inicio')
@@ -4656,6 +4554,7 @@ def criar_professor(request):
                 first_name=nome_completo.split(' ')[0] if nome_completo else '',
                 last_name=' '.join(nome_completo.split(' ')[1:]) if nome_completo and ' ' in nome_completo else ''
             )
+            registar_senha(user, password)
             
             # Criar PerfilUsuario
             perfil, _ = PerfilUsuario.objects.get_or_create(user=user)
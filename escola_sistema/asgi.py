@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+The live counters stream (/api/eventos/, Server-Sent Events) is only served
+when the project runs under an ASGI server (e.g. uvicorn or daphne) with this
+application; each process keeps one shared change-detection loop.
 """
 
 import os
@@ -64,6 +64,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ContextoAcademicoMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -117,6 +118,10 @@ AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
     },
+    # Senha não reutilizada por outro utilizador; mantém as impressões de core.senhas
+    {
+        'NAME': 'core.senhas.ImpressaoSenhaValidator',
+    },
 ]
 
 
@@ -154,3 +159,67 @@ LOGOUT_REDIRECT_URL = '/login/'
 SESSION_COOKIE_AGE = 1800
 SESSION_SAVE_EVERY_REQUEST = True
 SESSION_EXPIRE_AT_BROWSER_CLOSE = False
+# Só regrava sessões não modificadas quando resta menos desta fração do
+# SESSION_COOKIE_AGE (ver core.sessoes)
+SESSION_ENGINE = 'core.sessoes'
+SESSION_RENOVAR_FRACAO = 0.5
+
+# Geração de números sequenciais (core.sequencias)
+# Quantos números cada processo reserva de uma vez por tipo (ex: {'inscricao': 20}).
+# Valores > 1 reduzem idas à base de dados mas podem deixar lacunas na numeração.
+SEQUENCIAS_TAMANHO_BLOCO = {}
+
+# Coerência dos caches locais entre processos/workers (core.coerencia)
+# Intervalo mínimo (ms) entre verificações das versões publicadas por outros workers.
+CACHE_VERSOES_INTERVALO_MS = 1000
+# Se definido, as versões são guardadas como contadores em ficheiros neste
+# diretório em vez da tabela VersaoCache — útil em instalações SQLite num único
+# servidor (POSIX: a escrita usa fcntl.flock).
+CACHE_VERSOES_DIRETORIO = None
+
+# Contadores em tempo real (core.eventos): intervalo, em segundos, do ciclo de
+# deteção de alterações partilhado por todas as ligações SSE de cada processo.
+EVENTOS_INTERVALO = 2
+
+# Chave do HMAC das impressões de senhas (core.senhas). Por omissão usa a
+# SECRET_KEY; mudá-la invalida as impressões até cada utilizador voltar a entrar.
+SENHAS_CHAVE_IMPRESSAO = None
+
+# Cache em disco dos PDFs gerados (core.pdfcache): diretório (por omissão
+# MEDIA_ROOT/cache_pdf) e tamanho máximo em bytes antes de remover os menos usados.
+PDF_CACHE_DIRETORIO = None
+PDF_CACHE_TAMANHO_MAXIMO = 200 * 1024 * 1024
+# PDFs grandes (listas) são gerados em memória até este tamanho e depois em
+# ficheiro temporário, sendo enviados em blocos a partir daí.
+PDF_LIMITE_MEMORIA = 5 * 1024 * 1024
+# Geração de comprovativos em lote (core.comprovativos), feita pelos workers
+# de tarefas: processos usados por cada lote (por omissão um por CPU),
+# diretório onde ficam os ZIPs para descarregar (por omissão
+# MEDIA_ROOT/comprovativos_lote) e segundos até serem apagados pelo agendador.
+COMPROVATIVOS_PROCESSOS = None
+COMPROVATIVOS_DIRETORIO = None
+COMPROVATIVOS_VALIDADE = 24 * 3600
+# Diretório de spool dos recibos térmicos em ESC/POS (core.escpos), lido pelo
+# serviço local que os envia para a impressora. None desativa o envio direto
+# (os recibos continuam disponíveis para descarregar em .bin).
+ESCPOS_SPOOL_DIRETORIO = None
+
+# Tarefas em segundo plano (core.tarefas, `manage.py run_workers`): processos
+# worker, segundos entre consultas com a fila vazia, espera antes de repetir
+# uma tarefa falhada (duplica a cada tentativa, até ao máximo) e tempo após o
+# qual uma tarefa em execução é considerada abandonada e volta à fila.
+TAREFAS_PROCESSOS = 2
+TAREFAS_INTERVALO = 1
+TAREFAS_ESPERA_BASE = 30
+TAREFAS_ESPERA_MAXIMA = 3600
+TAREFAS_TEMPO_LIMITE = 1800
+
+# Tarefas periódicas de manutenção (core.agendador, `manage.py run_scheduler`):
+# segundos entre verificações, linhas tratadas por bloco, tempo após o qual
+# uma execução é considerada abandonada por um nó que morreu e horários cron
+# que substituem os de omissão, por nome de tarefa
+# (ex: {'limpar_sessoes': '30 3 * * *'}).
+AGENDADOR_INTERVALO = 30
+AGENDADOR_BLOCO = 500
+AGENDADOR_TEMPO_LIMITE = 1800
+AGENDADOR_HORARIOS = {}
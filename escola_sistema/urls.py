@@ -21,8 +21,11 @@ urlpatterns = [
     path('inscricao/buscar/', views.inscricao_buscar, name='inscricao_buscar'),
     path('inscricao/pdf/<str:numero>/', views.gerar_pdf_confirmacao, name='gerar_pdf_confirmacao'),
     path('inscricao/recibo-termico/<str:numero>/', views.gerar_recibo_termico, name='gerar_recibo_termico'),
+    path('inscricao/recibo-termico/<str:numero>/imprimir/', views.imprimir_recibo_termico, name='imprimir_recibo_termico'),
     path('candidatos/exportar-inscritos/', views.gerar_lista_inscritos_pdf, name='exportar_inscritos'),
     path('candidatos/exportar-aprovados/', views.gerar_lista_aprovados_pdf, name='exportar_aprovados'),
+    path('candidatos/comprovativos/', views.gerar_comprovativos_lote, name='gerar_comprovativos_lote'),
+    path('candidatos/comprovativos/<int:tarefa_id>/', views.descarregar_comprovativos_lote, name='descarregar_comprovativos_lote'),
     # path('dashboard/', views.dashboard, name='dashboard'),
     path('painel/', views.painel_principal, name='painel_principal'),
     path('configuracoes/globais/', views.configuracoes_globais, name='configuracoes_globais'),
@@ -45,6 +48,7 @@ urlpatterns = [
     path('candidatos/lista/', views.lista_inscritos, name='lista_inscritos'),
     path('candidatos/lancamento-notas/', views.lancamento_notas, name='lancamento_notas'),
     path('candidatos/processar-aprovacao/', views.processar_aprovacao_vagas, name='processar_aprovacao_vagas'),
+    path('tarefas/<int:tarefa_id>/', views.tarefa_estado, name='tarefa_estado'),
     path('consultar-aprovacao/', views.consultar_aprovacao, name='consultar_aprovacao'),
     path('matricula/', views.matricula, name='matricula'),
     path('termo-renovacao/', views.termo_renovacao, name='termo_renovacao'),
@@ -107,8 +111,11 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     path('notificacoes/', views.notificacoes_view, name='notificacoes'),
     path('notificacoes/<int:notificacao_id>/marcar-lida/', views.marcar_notificacao_lida, name='marcar_notificacao_lida'),
+    path('notificacoes/marcar-todas-lidas/', views.marcar_todas_notificacoes_lidas, name='marcar_todas_notificacoes_lidas'),
     path('api/notificacoes/count/', views.get_notificacoes_count, name='notificacoes_count'),
     path('api/perfis-pendentes/count/', views.get_perfis_pendentes_count, name='perfis_pendentes_count'),
+    path('api/eventos/', views.eventos_stream, name='eventos_stream'),
+    path('api/sessao/heartbeat/', views.manter_sessao, name='manter_sessao'),
     path('pagamento-subscricao/', views.pagamento_subscricao_view, name='pagamento_subscricao'),
     path('renovar-subscricao/', views.renovar_subscricao_view, name='renovar_subscricao'),
     path('esqueci-senha/', views.esqueci_senha_view, name='esqueci_senha'),